@@ -30,19 +30,36 @@ from main import (
     RankingKmProporcionalProcessor,
     TurnosIntegracaoProcessor,
     ResumoMotoristaClienteProcessor,
-    normalize_matricula
+    normalize_matricula,
+    get_ingest_cache,
+    set_xlsx_reader_engine,
+    get_xlsx_reader_engine,
+    XLSX_READER_ENGINES,
+    InputPrefetcher,
+    PREFETCH_DEPTH,
+    set_block_read_thresholds,
+    BLOCK_READ_MIN_ROWS,
+    BLOCK_READ_MIN_BYTES
 )
 
 class BatchProcessor:
     """Processador em batch para todos os relatorios"""
     
-    def __init__(self, base_dir: str, output_dir: str, version_suffix: str = ""):
+    def __init__(self, base_dir: str, output_dir: str, version_suffix: str = "",
+                 legacy_distribution: bool = False, incremental: bool = True,
+                 fleet_mode: bool = False, compact_dtypes: bool = False,
+                 prefetch_depth: int = PREFETCH_DEPTH):
         self.base_dir = base_dir
         self.output_dir = output_dir
         self.version_suffix = version_suffix
+        self.fleet_mode = fleet_mode
+        self.prefetch_depth = prefetch_depth
         
         # Inicializar processadores
-        self.company_processor = CompanyProcessor(base_dir, output_dir, version_suffix)
+        self.company_processor = CompanyProcessor(base_dir, output_dir, version_suffix,
+                                                  legacy_distribution=legacy_distribution,
+                                                  incremental=incremental,
+                                                  compact_dtypes=compact_dtypes)
         self.ranking_processor = RankingProcessor(base_dir, output_dir, version_suffix)
         self.ranking_integracao_processor = RankingIntegracaoProcessor(base_dir, output_dir, version_suffix)
         self.ranking_ouro_mediano_processor = RankingOuroMedianoProcessor(base_dir, output_dir, version_suffix)
@@ -92,6 +109,42 @@ class BatchProcessor:
             logging.error(f"[Abst_Mot_Por_empresa] Erro {company} - {period}: {str(e)}")
             return False
     
+    def process_abst_mot_todos_periodos(self, company: str, periods: list) -> dict:
+        """Processa Abst_Mot_Por_empresa de varios periodos de uma empresa em uma unica passada"""
+        try:
+            logging.info(f"[Abst_Mot_Por_empresa] Processando {company} - {len(periods)} periodo(s)")
+            
+            results = self.company_processor.process_company_all_periods(company, periods)
+            
+            for period in periods:
+                if results.get(period):
+                    logging.info(f"[Abst_Mot_Por_empresa] Sucesso: {company} - {period}")
+                else:
+                    logging.error(f"[Abst_Mot_Por_empresa] Falha: {company} - {period}")
+            return results
+            
+        except Exception as e:
+            logging.error(f"[Abst_Mot_Por_empresa] Erro {company}: {str(e)}")
+            return {}
+    
+    def process_abst_mot_frota(self, period: str, companies: list) -> dict:
+        """Processa Abst_Mot_Por_empresa de todas as empresas de um periodo em um unico frame"""
+        try:
+            logging.info(f"[Abst_Mot_Por_empresa] Modo frota: {len(companies)} empresa(s) - {period}")
+            
+            results = self.company_processor.process_fleet_period(period, companies)
+            
+            for company in companies:
+                if results.get(company):
+                    logging.info(f"[Abst_Mot_Por_empresa] Sucesso: {company} - {period}")
+                else:
+                    logging.error(f"[Abst_Mot_Por_empresa] Falha: {company} - {period}")
+            return results
+            
+        except Exception as e:
+            logging.error(f"[Abst_Mot_Por_empresa] Erro frota {period}: {str(e)}")
+            return {}
+    
     def process_ranking_por_empresa(self, company: str, period: str) -> bool:
         """Processa Ranking_Por_Empresa para uma empresa e periodo"""
         try:
@@ -235,8 +288,11 @@ class BatchProcessor:
         logging.info(f"Empresas disponiveis: {len(companies_abst)}")
         
         abst_processed = []
+        pending_by_company = {}
+        pending_by_period = {}
         for company in companies_abst:
             files = self.company_processor.get_company_files(company)
+            pending = []
             for f in files:
                 period = f['month_year']
                 self.stats['total'] += 1
@@ -246,7 +302,44 @@ class BatchProcessor:
                     self.stats['skipped'] += 1
                     abst_processed.append((company, period))
                 else:
-                    if self.process_abst_mot_por_empresa(company, period):
+                    pending.append(period)
+            
+            if not pending:
+                continue
+            
+            if self.fleet_mode:
+                # Modo frota: agrupa por periodo e processa todas as empresas juntas abaixo
+                for period in dict.fromkeys(pending):
+                    pending_by_period.setdefault(period, []).append(company)
+                continue
+            pending_by_company[company] = pending
+        
+        # Entradas da proxima empresa (ou periodo, no modo frota) sao lidas enquanto a atual e processada
+        with InputPrefetcher(self.output_dir, self.prefetch_depth) as prefetcher:
+            companies_pending = prefetcher.iterate(
+                pending_by_company,
+                lambda company: [f for period in pending_by_company[company]
+                                 for f in self.company_processor.get_input_files(company, period)])
+            for company in companies_pending:
+                pending = pending_by_company[company]
+                # Todos os periodos pendentes da empresa em uma unica passada
+                results = self.process_abst_mot_todos_periodos(company, pending)
+                for period in pending:
+                    if results.get(period):
+                        self.stats['success'] += 1
+                        abst_processed.append((company, period))
+                    else:
+                        self.stats['failed'] += 1
+            
+            periods_pending = prefetcher.iterate(
+                pending_by_period,
+                lambda period: [f for company in pending_by_period[period]
+                                for f in self.company_processor.get_input_files(company, period)])
+            for period in periods_pending:
+                companies = pending_by_period[period]
+                results = self.process_abst_mot_frota(period, companies)
+                for company in companies:
+                    if results.get(company):
                         self.stats['success'] += 1
                         abst_processed.append((company, period))
                     else:
@@ -261,6 +354,7 @@ class BatchProcessor:
         logging.info(f"Empresas disponiveis para Ranking: {len(companies_ranking)}")
         
         ranking_processed = []
+        ranking_pending = []
         for company in companies_ranking:
             periods = self.ranking_processor.find_available_periods(company)
             for period in periods:
@@ -271,11 +365,15 @@ class BatchProcessor:
                     self.stats['skipped'] += 1
                     ranking_processed.append((company, period))
                 else:
-                    if self.process_ranking_por_empresa(company, period):
-                        self.stats['success'] += 1
-                        ranking_processed.append((company, period))
-                    else:
-                        self.stats['failed'] += 1
+                    ranking_pending.append((company, period))
+        
+        with InputPrefetcher(self.output_dir, self.prefetch_depth) as prefetcher:
+            for company, period in prefetcher.iterate(ranking_pending, lambda task: self.ranking_processor.get_input_files(*task)):
+                if self.process_ranking_por_empresa(company, period):
+                    self.stats['success'] += 1
+                    ranking_processed.append((company, period))
+                else:
+                    self.stats['failed'] += 1
         
         # FASE 3: Processar Ranking_Integracao (precisa de Ranking, Turnos_128 e Abst_Mot)
         logging.info("\n" + "=" * 80)
@@ -285,6 +383,7 @@ class BatchProcessor:
         companies_integracao = self.ranking_integracao_processor.find_available_companies()
         logging.info(f"Empresas disponiveis para Ranking_Integracao: {len(companies_integracao)}")
         
+        integracao_pending = []
         for company in companies_integracao:
             periods = self.ranking_integracao_processor.find_available_periods(company)
             for period in periods:
@@ -292,7 +391,10 @@ class BatchProcessor:
                 if not self.check_abst_mot_exists(company, period):
                     logging.warning(f"[SKIP] Ranking_Integracao {company} - {period}: Abst_Mot nao existe")
                     continue
-                
+                integracao_pending.append((company, period))
+        
+        with InputPrefetcher(self.output_dir, self.prefetch_depth) as prefetcher:
+            for company, period in prefetcher.iterate(integracao_pending, lambda task: self.ranking_integracao_processor.get_input_files(*task)):
                 self.stats['total'] += 1
                 if self.process_ranking_integracao(company, period):
                     self.stats['success'] += 1
@@ -307,6 +409,7 @@ class BatchProcessor:
         companies_km_prop = self.ranking_km_proporcional_processor.find_available_companies()
         logging.info(f"Empresas disponiveis para Ranking_Km_Proporcional: {len(companies_km_prop)}")
         
+        km_prop_pending = []
         for company in companies_km_prop:
             periods = self.ranking_km_proporcional_processor.find_available_periods(company)
             for period in periods:
@@ -314,7 +417,10 @@ class BatchProcessor:
                 if not self.check_abst_mot_exists(company, period):
                     logging.warning(f"[SKIP] Ranking_Km_Proporcional {company} - {period}: Abst_Mot nao existe")
                     continue
-                
+                km_prop_pending.append((company, period))
+        
+        with InputPrefetcher(self.output_dir, self.prefetch_depth) as prefetcher:
+            for company, period in prefetcher.iterate(km_prop_pending, lambda task: self.ranking_km_proporcional_processor.get_input_files(*task)):
                 self.stats['total'] += 1
                 if self.process_ranking_km_proporcional(company, period):
                     self.stats['success'] += 1
@@ -382,6 +488,24 @@ def main():
                         help='Diretorio de saida')
     parser.add_argument('--versao', '-v', type=str, default="",
                         help='Sufixo de versao (ex: _1.0)')
+    parser.add_argument('--distribuicao-legada', action='store_true',
+                        help='Usa o loop legado por placa/data no Abst_Mot_Por_empresa (comparacao)')
+    parser.add_argument('--recalculo-completo', action='store_true',
+                        help='Ignora o estado incremental e recalcula todos os grupos placa/data')
+    parser.add_argument('--modo-frota', action='store_true',
+                        help='Processa o Abst_Mot_Por_empresa de todas as empresas de cada periodo em um unico frame')
+    parser.add_argument('--tipos-compactos', action='store_true',
+                        help='Usa categoricos, datetime64 e float32 nos frames do Abst_Mot_Por_empresa (menos memoria)')
+    parser.add_argument('--leitor', choices=XLSX_READER_ENGINES, default='auto',
+                        help='Leitor de .xlsx: auto (calamine se instalado), calamine ou openpyxl')
+    parser.add_argument('--antecipar', type=int, default=PREFETCH_DEPTH,
+                        help='Quantos periodos a frente tem as entradas lidas em segundo plano (0 desativa)')
+    parser.add_argument('--blocos-linhas', type=int, default=BLOCK_READ_MIN_ROWS,
+                        help='Turnos_128 com pelo menos esse numero de linhas e lido em blocos reduzidos (so o Turnos_128)')
+    parser.add_argument('--blocos-mb', type=int, default=BLOCK_READ_MIN_BYTES // (1024 * 1024),
+                        help='Turnos_128 com pelo menos esse tamanho (MB) e lido em blocos reduzidos (so o Turnos_128)')
+    parser.add_argument('--limpar-cache', action='store_true',
+                        help='Apaga o cache de entradas em disco (<saida>/_cache/entradas) e sai')
     
     args = parser.parse_args()
     
@@ -397,11 +521,35 @@ def main():
         print(f"[ERRO] Diretorio de saida nao encontrado: {args.saida}")
         return
     
+    if args.limpar_cache:
+        ingest_cache = get_ingest_cache(args.saida)
+        removed = ingest_cache.purge()
+        print(f"[CACHE] {removed} copia(s) removida(s) de {ingest_cache.cache_dir}")
+        return
+    
     print(f"[ENTRADA] {args.entrada}")
     print(f"[SAIDA] {args.saida}")
     print(f"[VERSAO] {args.versao if args.versao else '(sem sufixo)'}")
+    set_xlsx_reader_engine(args.leitor)
+    print(f"[LEITOR] {args.leitor} (em uso: {get_xlsx_reader_engine()})")
+    set_block_read_thresholds(min_rows=args.blocos_linhas, min_bytes=args.blocos_mb * 1024 * 1024)
+    print(f"[BLOCOS] Turnos_128 lido em blocos a partir de {args.blocos_linhas} linhas ou {args.blocos_mb} MB")
+    if args.distribuicao_legada:
+        print("[DISTRIBUICAO] loop legado por placa/data")
+    if args.recalculo_completo:
+        print("[INCREMENTAL] desativado (recalculo completo)")
+    if args.modo_frota:
+        print("[FROTA] Abst_Mot_Por_empresa de todas as empresas por periodo")
+    if args.tipos_compactos:
+        print("[MEMORIA] tipos compactos no Abst_Mot_Por_empresa")
+    print(f"[ANTECIPACAO] {args.antecipar} periodo(s) a frente" if args.antecipar > 0 else "[ANTECIPACAO] desativada")
     
-    processor = BatchProcessor(args.entrada, args.saida, args.versao)
+    processor = BatchProcessor(args.entrada, args.saida, args.versao,
+                               legacy_distribution=args.distribuicao_legada,
+                               incremental=not args.recalculo_completo,
+                               fleet_mode=args.modo_frota,
+                               compact_dtypes=args.tipos_compactos,
+                               prefetch_depth=args.antecipar)
     processor.run_all()
     
     print("\n[LOG] Log completo salvo em: batch_processing.log")
@@ -2,11 +2,17 @@ import pandas as pd
 import os
 import sys
 import logging
-from datetime import datetime, time as dtime
+from datetime import datetime, date, time as dtime
 import time as tm
 import re
 import numpy as np
 import unicodedata
+import json
+import hashlib
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 # Importação do tkinter com tratamento de erro
 try:
@@ -44,8 +50,11 @@ Erro detalhado: {0}
     logging.error(f"tkinter não está disponível: {str(e)}")
     sys.exit(1)
 from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Border, Side
+from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.utils.dataframe import dataframe_to_rows
+from openpyxl.utils import get_column_letter
+from openpyxl.formatting.rule import FormulaRule
 import traceback
 from openpyxl import load_workbook
 import shutil
@@ -57,6 +66,20 @@ from reportlab.lib.units import inch
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER  # TA_LEFT e TA_RIGHT não utilizados, removidos
 
+# Parquet para o cache de entradas em disco é opcional (sem pyarrow o cache usa pickle)
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+# Leitor rápido de .xlsx (python-calamine) é opcional; sem ele as leituras usam openpyxl
+try:
+    import python_calamine  # noqa: F401
+    CALAMINE_AVAILABLE = True
+except ImportError:
+    CALAMINE_AVAILABLE = False
+
 # Configure logging to both file and console
 logging.basicConfig(
     level=logging.INFO,
@@ -67,27 +90,22 @@ logging.basicConfig(
     ]
 )
 
-def check_excel_files_in_use(output_dir):
-    """Verifica se há arquivos Excel em uso no diretório de saída"""
+def check_files_in_use(file_paths, max_workers=8):
+    """Verifica, em paralelo, quais dos arquivos que serão gravados estão em uso (abertos no Excel)"""
     try:
-        excel_files = []
-        for root, dirs, files in os.walk(output_dir):
-            for file in files:
-                if file.endswith('.xlsx'):
-                    file_path = os.path.join(root, file)
-                    try:
-                        with open(file_path, 'r+b') as f:
-                            pass
-                    except PermissionError:
-                        excel_files.append(file_path)
+        existing_files = sorted({path for path in file_paths if os.path.exists(path)})
+        if not existing_files:
+            return []
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(existing_files))) as executor:
+            in_use = list(executor.map(is_file_in_use, existing_files))
+        excel_files = [path for path, busy in zip(existing_files, in_use) if busy]
         
         if excel_files:
             logging.warning("Arquivos Excel em uso encontrados:")
             for file_path in excel_files:
                 logging.warning(f"  - {file_path}")
             logging.warning("Por favor, feche estes arquivos no Excel antes de continuar.")
-            return excel_files
-        return []
+        return excel_files
     except Exception as e:
         logging.error(f"Erro ao verificar arquivos em uso: {e}")
         return []
@@ -113,21 +131,1085 @@ def get_alternative_filename(original_path, attempt=1):
     timestamp = tm.strftime("%Y%m%d_%H%M%S")
     return f"{base_name}_{timestamp}_{attempt}.xlsx"
 
+class AtomicOutputFile:
+    """
+    Gravação atômica de um relatório: o conteúdo vai para um arquivo temporário na mesma pasta
+    (temp_path) e, ao sair do bloco sem erro, os.replace o coloca no lugar do destino.
+    Só quando a troca falha (destino aberto no Excel) o relatório fica com um nome alternativo;
+    o caminho final fica em path.
+    """
+    
+    def __init__(self, output_file):
+        self.path = output_file
+        folder, filename = os.path.split(output_file)
+        self.temp_path = os.path.join(folder, f".~{filename}")
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        if exc_type is not None:
+            if os.path.exists(self.temp_path):
+                os.remove(self.temp_path)
+            return False
+        try:
+            os.replace(self.temp_path, self.path)
+        except PermissionError:
+            alternative_file = get_alternative_filename(self.path)
+            logging.warning(f"Arquivo {self.path} está em uso. Relatório salvo como: {alternative_file}")
+            os.replace(self.temp_path, alternative_file)
+            self.path = alternative_file
+        return False
+
 # --- Funções auxiliares otimizadas ---
 
 def normalize_matricula(series):
     """Otimizado: normaliza matrícula de forma vetorizada"""
     return series.astype(str).str.strip().str.zfill(6)
 
+def allocate_cents(weights, totals, groups=None):
+    """
+    Otimizado: distribui o total de cada grupo entre suas linhas, proporcional aos pesos,
+    com soma exata ao centavo (método dos maiores restos), para todos os grupos de uma vez.
+    totals pode ser um escalar ou uma Series alinhada às linhas (mesmo total em todo o grupo);
+    groups identifica o grupo de cada linha (None = um único grupo).
+    Grupos cuja soma de pesos é zero dividem o total igualmente.
+    """
+    w = weights.fillna(0).to_numpy(dtype=float)
+    if groups is None:
+        codes = np.zeros(len(w), dtype=np.int64)
+    else:
+        codes = pd.factorize(np.asarray(groups))[0]
+    total_cents = np.round(np.broadcast_to(np.asarray(totals, dtype=float), w.shape) * 100)
+    
+    weight_sums = np.bincount(codes, weights=w)[codes]
+    row_counts = np.bincount(codes)[codes]
+    shares = np.divide(w, weight_sums, out=1.0 / row_counts, where=weight_sums != 0)
+    
+    exact = shares * total_cents
+    cents = np.floor(exact)
+    group_totals = np.bincount(codes, weights=total_cents / row_counts)
+    leftover = np.round(group_totals - np.bincount(codes, weights=cents))[codes]
+    
+    # Os centavos que sobram vão para as linhas com maior parte fracionária (empate: ordem original)
+    remainder_rank = pd.Series(exact - cents).groupby(codes).rank(method='first', ascending=False).to_numpy()
+    cents += remainder_rank <= leftover
+    return pd.Series(cents / 100, index=weights.index)
+
+def get_cache_dir(output_base_dir):
+    """Diretório dos caches persistentes do processador (dentro da pasta de saída)"""
+    return os.path.join(output_base_dir, '_cache')
+
+# --- Perfis persistentes de formato de horário ---
+
+class TimeFormatProfileStore:
+    """Guarda, por empresa e coluna (pegada/largada), o formato vencedor e sua taxa de acerto"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.profiles = None
+    
+    def _load(self):
+        if self.profiles is None:
+            self.profiles = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        self.profiles = json.load(f)
+                except Exception as e:
+                    logging.warning(f"Could not read time format profiles from {self.path}: {e}")
+        return self.profiles
+    
+    def get(self, company, column):
+        return self._load().get(company, {}).get(column)
+    
+    def update(self, company, column, time_format, success_rate):
+        profile = {'format': time_format, 'success_rate': round(success_rate, 4)}
+        company_profiles = self._load().setdefault(company, {})
+        if {k: company_profiles.get(column, {}).get(k) for k in profile} == profile:
+            return
+        
+        profile['updated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        company_profiles[column] = profile
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(self.profiles, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            logging.warning(f"Could not save time format profiles to {self.path}: {e}")
+
+# --- Leitor de planilhas (.xlsx) ---
+
+XLSX_READER_ENGINES = ['auto', 'calamine', 'openpyxl']
+xlsx_reader_engine = 'auto'
+timed_reader_engines = set()
+
+def set_xlsx_reader_engine(engine):
+    """Define o leitor de todas as leituras de .xlsx: 'auto' (calamine se instalado), 'calamine' ou 'openpyxl'"""
+    global xlsx_reader_engine
+    if engine not in XLSX_READER_ENGINES:
+        raise ValueError(f"Leitor XLSX desconhecido: {engine} (opções: {', '.join(XLSX_READER_ENGINES)})")
+    if engine == 'calamine' and not CALAMINE_AVAILABLE:
+        logging.warning("python-calamine não está instalado; as leituras continuam com openpyxl")
+    xlsx_reader_engine = engine
+
+def get_xlsx_reader_engine():
+    """Engine do pandas efetivamente usado com a configuração atual"""
+    if xlsx_reader_engine in ('auto', 'calamine') and CALAMINE_AVAILABLE:
+        return 'calamine'
+    return 'openpyxl'
+
+def read_excel_file(path, **read_kwargs):
+    """
+    pd.read_excel com o leitor configurado. Na primeira leitura de cada engine o tempo é registrado
+    ao lado do openpyxl no mesmo arquivo, para comparação.
+    """
+    engine = get_xlsx_reader_engine()
+    if engine in timed_reader_engines:
+        return pd.read_excel(path, engine=engine, **read_kwargs)
+    timed_reader_engines.add(engine)
+    
+    start_time = tm.perf_counter()
+    df = pd.read_excel(path, engine=engine, **read_kwargs)
+    elapsed = tm.perf_counter() - start_time
+    if engine == 'openpyxl':
+        logging.info(f"Leitor XLSX openpyxl: {elapsed:.3f}s ({os.path.basename(path)})")
+    else:
+        start_time = tm.perf_counter()
+        pd.read_excel(path, engine='openpyxl', **read_kwargs)
+        openpyxl_elapsed = tm.perf_counter() - start_time
+        logging.info(f"Leitor XLSX {engine}: {elapsed:.3f}s vs openpyxl: {openpyxl_elapsed:.3f}s ({os.path.basename(path)})")
+    return df
+
+# --- Leitura em blocos de planilhas grandes ---
+
+# Acima de qualquer um dos limites, entradas com redução por bloco (hoje só o Turnos_128, via 'block_sum')
+# são lidas em blocos de BLOCK_READ_ROWS linhas. As demais (Motorista incluído) são consumidas linha a linha,
+# não têm o que reduzir e continuam com a leitura normal: em blocos não gastariam menos memória.
+BLOCK_READ_MIN_ROWS = 300000
+BLOCK_READ_MIN_BYTES = 30 * 1024 * 1024
+BLOCK_READ_ROWS = 50000
+
+def set_block_read_thresholds(min_rows=None, min_bytes=None):
+    """Altera os limites (linhas e/ou bytes) a partir dos quais as entradas com redução são lidas em blocos"""
+    global BLOCK_READ_MIN_ROWS, BLOCK_READ_MIN_BYTES
+    if min_rows is not None:
+        BLOCK_READ_MIN_ROWS = min_rows
+    if min_bytes is not None:
+        BLOCK_READ_MIN_BYTES = min_bytes
+
+def count_sheet_rows(path):
+    """
+    Linhas da primeira aba segundo a dimensão gravada no .xlsx, sem carregar a planilha nem as
+    strings compartilhadas. Retorna None quando o arquivo não informa a dimensão.
+    """
+    try:
+        with zipfile.ZipFile(path) as archive:
+            workbook_xml = archive.read('xl/workbook.xml').decode('utf-8', errors='ignore')
+            rels_xml = archive.read('xl/_rels/workbook.xml.rels').decode('utf-8', errors='ignore')
+            first_sheet = re.search(r'<(?:\w+:)?sheet\b[^>]*\br:id="([^"]+)"', workbook_xml)
+            if first_sheet is None:
+                return None
+            target = None
+            for rel in re.finditer(r'<Relationship\b[^>]*>', rels_xml):
+                if f'Id="{first_sheet.group(1)}"' in rel.group(0):
+                    target = re.search(r'Target="([^"]+)"', rel.group(0)).group(1)
+                    break
+            if target is None:
+                return None
+            sheet_name = target.lstrip('/') if target.startswith('/') else f"xl/{target}"
+            with archive.open(sheet_name) as sheet:
+                head = sheet.read(4096).decode('utf-8', errors='ignore')
+        dimension = re.search(r'<(?:\w+:)?dimension\s+ref="[A-Z]+\d+:[A-Z]+(\d+)"', head)
+        return int(dimension.group(1)) if dimension else None
+    except (OSError, KeyError, zipfile.BadZipFile):
+        return None
+
+def should_read_in_blocks(path):
+    """Indica se a planilha passa de BLOCK_READ_MIN_BYTES ou BLOCK_READ_MIN_ROWS"""
+    if os.path.getsize(path) >= BLOCK_READ_MIN_BYTES:
+        return True
+    rows = count_sheet_rows(path)
+    return rows is not None and rows >= BLOCK_READ_MIN_ROWS
+
+def convert_sheet_cell(cell):
+    """Converte uma célula do openpyxl como o leitor do pandas (vazia vira "", inteiros exatos viram int)"""
+    if cell.value is None:
+        return ""
+    if cell.data_type == 'e':
+        return np.nan
+    if cell.data_type == 'n':
+        value = int(cell.value)
+        return value if value == cell.value else float(cell.value)
+    return cell.value
+
+def parse_sheet_block(header, rows, **read_kwargs):
+    """Monta um DataFrame de um bloco de linhas com o mesmo parser que o pd.read_excel usa"""
+    width = max([len(header)] + [len(row) for row in rows])
+    data = [header + [""] * (width - len(header))]
+    data += [row + [""] * (width - len(row)) for row in rows]
+    return pd.io.parsers.TextParser(data, header=0, skip_blank_lines=False, **read_kwargs).read()
+
+def read_excel_in_blocks(path, reduce_block=None, block_rows=None, **read_kwargs):
+    """
+    Lê a primeira aba em modo read-only, BLOCK_READ_ROWS linhas por vez, com os mesmos nomes de
+    colunas, tipos e conversores do pd.read_excel. Com reduce_block, cada bloco é reduzido a
+    agregados parciais e o resultado concatenado é reduzido de novo no final; sem ele, os blocos
+    já convertidos são concatenados (a lista de linhas da planilha inteira nunca fica em memória).
+    """
+    block_rows = block_rows or BLOCK_READ_ROWS
+    reduce_block = reduce_block or (lambda df: df)
+    start_time = tm.perf_counter()
+    
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].rows
+        header = None
+        block, blank_rows, partials = [], [], []
+        total_rows = 0
+        for row in rows:
+            values = [convert_sheet_cell(cell) for cell in row]
+            while values and values[-1] == "":
+                values.pop()
+            if header is None:
+                header = values
+                continue
+            if not values:
+                # Linhas vazias só entram se houver dados depois delas (como no pd.read_excel)
+                blank_rows.append(values)
+                continue
+            block.extend(blank_rows)
+            blank_rows = []
+            block.append(values)
+            if len(block) >= block_rows:
+                partials.append(reduce_block(parse_sheet_block(header, block, **read_kwargs)))
+                total_rows += len(block)
+                block = []
+        if header is not None and (block or not partials):
+            partials.append(reduce_block(parse_sheet_block(header, block, **read_kwargs)))
+            total_rows += len(block)
+    finally:
+        workbook.close()
+    
+    if not partials:
+        return pd.DataFrame()
+    df = partials[0] if len(partials) == 1 else reduce_block(pd.concat(partials, ignore_index=True).infer_objects())
+    logging.info(f"Leitura em blocos: {total_rows} linhas em {len(partials)} bloco(s) -> {len(df)} linhas "
+                 f"em {tm.perf_counter() - start_time:.2f}s ({os.path.basename(path)})")
+    return df
+
+def sum_by_group(df, value_column):
+    """Soma value_column por todas as demais colunas (chaves vazias mantidas); usado como reduce_block"""
+    keys = [col for col in df.columns if col != value_column]
+    if not keys or value_column not in df.columns:
+        return df
+    return df.groupby(keys, dropna=False, sort=False)[value_column].sum().reset_index()
+
+# --- Formatação condicional (.xlsx) ---
+
+def excel_number_formula(ref):
+    """
+    Fórmula do Excel com o valor numérico de ref como o float(str(valor).replace(',', '.')) do Python:
+    números passam direto, texto com vírgula ou ponto decimal é convertido e o resto vira texto vazio.
+    """
+    return (f'IF(ISNUMBER({ref}), {ref}, '
+            f'IFERROR(_xlfn.NUMBERVALUE(SUBSTITUTE({ref}, ",", "."), ".", ","), ""))')
+
+def excel_number_condition(ref, test):
+    """
+    Condição de formatação condicional: test ('{} >= 8', com {} no lugar do número) só vale para células
+    não vazias cujo valor é numérico segundo excel_number_formula, como nos laços que ignoravam o resto.
+    """
+    number = excel_number_formula(ref)
+    return f'IF(AND({ref} <> "", ISNUMBER({number})), {test.format(number)}, FALSE)'
+
+# --- Escrita de planilhas em streaming (.xlsx) ---
+
+STREAMING_CHUNK_ROWS = 5000
+
+def write_excel_streaming(df, path, sheet_name='Sheet1', chunk_size=STREAMING_CHUNK_ROWS):
+    """
+    Grava o DataFrame em um workbook write_only do openpyxl, convertendo chunk_size linhas por vez.
+    As linhas vão direto para o arquivo temporário do openpyxl, então o uso de memória não cresce
+    com o tamanho da planilha. Mesmo layout do df.to_excel(index=False): cabeçalho em negrito,
+    células vazias para NaN/NaT e datas nos formatos do pandas.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    
+    thin = Side(style='thin')
+    header = []
+    for col in df.columns:
+        cell = WriteOnlyCell(ws, value=str(col))
+        cell.font = Font(bold=True)
+        cell.border = Border(left=thin, right=thin, top=thin, bottom=thin)
+        cell.alignment = Alignment(horizontal='center', vertical='top')
+        header.append(cell)
+    ws.append(header)
+    
+    # Só colunas de data/objeto podem conter datas, que precisam de number_format
+    date_columns = [i for i, dtype in enumerate(df.dtypes)
+                    if pd.api.types.is_datetime64_any_dtype(dtype) or dtype == object]
+    
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size].astype(object)
+        rows = chunk.where(chunk.notna(), None).to_numpy().tolist()
+        for row in rows:
+            for i in date_columns:
+                value = row[i]
+                if isinstance(value, datetime):
+                    cell = WriteOnlyCell(ws, value=value.to_pydatetime() if isinstance(value, pd.Timestamp) else value)
+                    cell.number_format = 'YYYY-MM-DD HH:MM:SS'
+                    row[i] = cell
+                elif isinstance(value, date):
+                    cell = WriteOnlyCell(ws, value=value)
+                    cell.number_format = 'YYYY-MM-DD'
+                    row[i] = cell
+            ws.append(row)
+    
+    wb.save(path)
+
+# --- Cópia tipada do Detalhado ---
+
+DETALHADO_TIME_FORMAT = '%d/%m/%Y %H:%M'
+DETALHADO_TIME_COLUMNS = ['pegada', 'largada']
+
+def detalhado_times(series):
+    """pegada/largada como datetime64 com a precisão do texto do Detalhado (minuto); o que não é data vira NaT"""
+    if not pd.api.types.is_datetime64_any_dtype(series):
+        series = pd.to_datetime(series.where(series.map(lambda x: isinstance(x, datetime))), errors='coerce')
+    return series.dt.floor('min')
+
+def write_detalhado_sidecar(df, detailed_filepath):
+    """
+    Grava ao lado do Detalhado .xlsx uma cópia colunar com tipos nativos (Parquet com pyarrow, senão pickle),
+    lida pelos relatórios seguintes no lugar do .xlsx. df deve ter pegada/largada como datetime.
+    """
+    base_path = os.path.splitext(detailed_filepath)[0]
+    sidecar = df.copy()
+    if 'Date' in sidecar.columns:
+        sidecar['Date'] = pd.to_datetime(sidecar['Date'], errors='coerce')
+    try:
+        if PARQUET_AVAILABLE:
+            try:
+                sidecar.to_parquet(base_path + '.parquet', index=False)
+                if os.path.exists(base_path + '.pkl'):
+                    os.remove(base_path + '.pkl')
+                return
+            except Exception as e:
+                logging.debug(f"Parquet sidecar not possible for {detailed_filepath}, using pickle: {e}")
+                if os.path.exists(base_path + '.parquet'):
+                    os.remove(base_path + '.parquet')
+        sidecar.to_pickle(base_path + '.pkl')
+    except Exception as e:
+        logging.warning(f"Could not write typed copy of {detailed_filepath}: {e}")
+
+def read_detalhado(detailed_filepath):
+    """
+    Lê o Detalhado pela cópia tipada quando ela existe e não é mais antiga que o .xlsx (um .xlsx editado
+    depois invalida a cópia); senão lê o .xlsx e converte pegada/largada.
+    Nos dois casos pegada/largada voltam como datetime64 (NaT quando vazios ou inválidos).
+    """
+    base_path = os.path.splitext(detailed_filepath)[0]
+    xlsx_mtime = os.stat(detailed_filepath).st_mtime_ns
+    for sidecar_path in (base_path + '.parquet', base_path + '.pkl'):
+        if os.path.exists(sidecar_path) and os.stat(sidecar_path).st_mtime_ns >= xlsx_mtime:
+            try:
+                if sidecar_path.endswith('.parquet'):
+                    return pd.read_parquet(sidecar_path)
+                return pd.read_pickle(sidecar_path)
+            except Exception as e:
+                logging.warning(f"Cópia tipada ilegível ({sidecar_path}), lendo o .xlsx: {e}")
+    
+    df = read_excel_file(detailed_filepath)
+    for col in DETALHADO_TIME_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], format=DETALHADO_TIME_FORMAT, errors='coerce')
+    return df
+
+def write_detalhado(df, detailed_filepath):
+    """Grava o Detalhado .xlsx (pegada/largada como texto dd/mm/aaaa hh:mm) e a cópia tipada ao lado"""
+    df_excel = df.copy()
+    for col in DETALHADO_TIME_COLUMNS:
+        if col in df_excel.columns:
+            df_excel[col] = df_excel[col].dt.strftime(DETALHADO_TIME_FORMAT)
+    write_excel_streaming(df_excel, detailed_filepath)
+    write_detalhado_sidecar(df, detailed_filepath)
+
+# --- Cache de entradas carregadas (sessão) ---
+
+class LoadedInputCache:
+    """
+    Cache de DataFrames já lidos, válido para todo o processo.
+    A chave é (caminho, mtime, tamanho): um arquivo alterado em disco nunca é servido do cache.
+    As entradas menos usadas são descartadas quando o orçamento de memória é ultrapassado.
+    """
+    
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.current_bytes = 0
+        self.lock = threading.Lock()
+        self.loading = {}
+    
+    def get(self, path, loader, kind='default'):
+        """
+        Retorna uma cópia do DataFrame em cache ou lê o arquivo com loader(path).
+        Se outra thread (leitura antecipada) já está lendo o mesmo arquivo, espera por ela em vez de ler de novo.
+        """
+        stat = os.stat(path)
+        path = os.path.abspath(path)
+        key = (path, kind, stat.st_mtime_ns, stat.st_size)
+        
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key][0].copy()
+            pending = self.loading.get(key)
+            if pending is None:
+                self.loading[key] = threading.Event()
+        
+        if pending is not None:
+            pending.wait()
+            return self.get(path, loader, kind)
+        
+        try:
+            df = loader(path)
+            self._store(key, df)
+        finally:
+            with self.lock:
+                self.loading.pop(key).set()
+        
+        return df.copy()
+    
+    def put(self, path, df, kind='default'):
+        """Guarda um DataFrame que acabou de ser gravado em path, para a próxima leitura não abrir o arquivo"""
+        stat = os.stat(path)
+        self._store((os.path.abspath(path), kind, stat.st_mtime_ns, stat.st_size), df.copy())
+    
+    def _store(self, key, df):
+        size = int(df.memory_usage(deep=True).sum())
+        with self.lock:
+            # Versões antigas do mesmo arquivo não serão mais usadas
+            for old_key in [k for k in self.entries if k[:2] == key[:2]]:
+                self.current_bytes -= self.entries.pop(old_key)[1]
+            
+            if size <= self.max_bytes:
+                self.entries[key] = (df, size)
+                self.current_bytes += size
+                while self.current_bytes > self.max_bytes:
+                    _, (_, evicted_size) = self.entries.popitem(last=False)
+                    self.current_bytes -= evicted_size
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.current_bytes = 0
+
+INPUT_CACHE = LoadedInputCache()
+
+# --- Consolidados por período (Abst_Mot_Por_empresa e Consolidado do Ranking_Km_Proporcional) ---
+
+# O caminho identifica empresa, período e versão; os frames são pequenos (uma linha por motorista)
+PERIOD_ARTIFACTS = LoadedInputCache(max_bytes=64 * 1024 * 1024)
+
+def load_period_artifact(path):
+    """
+    Consolidado de um período com a matricula já normalizada. Vem da cópia guardada quando o arquivo
+    foi gravado nesta execução ou é lido uma única vez, e fica compartilhado entre os relatórios de ranking.
+    """
+    def load(artifact_path):
+        df = read_excel_file(artifact_path)
+        df['matricula'] = normalize_matricula(df['matricula'])
+        return df
+    
+    return PERIOD_ARTIFACTS.get(path, load, kind='consolidado')
+
+def as_read_from_excel(df):
+    """
+    df com os tipos que o read_excel devolve depois de um to_excel(index=False): o .xlsx não guarda se o
+    número era float, então colunas float só com inteiros (sem vazios) voltam int64 e floats inteiros em
+    colunas object voltam int. Sem isso, matrícula 123.0 viraria '0123.0' em vez de '000123'.
+    """
+    df = df.reset_index(drop=True)
+    for col in df.columns:
+        values = df[col]
+        if pd.api.types.is_float_dtype(values):
+            if len(values) and values.notna().all() and np.isfinite(values).all() and (values == np.floor(values)).all():
+                df[col] = values.astype('int64')
+        elif values.dtype == object:
+            df[col] = values.map(lambda v: int(v) if isinstance(v, float) and v.is_integer() else v)
+    return df
+
+def store_period_artifact(path, df):
+    """Guarda o consolidado recém-gravado em path, como se fosse relido do arquivo, para load_period_artifact"""
+    df = as_read_from_excel(df)
+    df['matricula'] = normalize_matricula(df['matricula'])
+    PERIOD_ARTIFACTS.put(path, df, kind='consolidado')
+
+# --- Cache de entradas em disco (entre execuções) ---
+
+class IngestCache:
+    """
+    Cópia colunar de cada planilha de entrada em <saída>/_cache/entradas (Parquet com pyarrow, senão pickle).
+    A chave é (caminho, tipo de leitura, tamanho, mtime, sha1 do conteúdo): com tamanho e mtime iguais a cópia
+    é usada direto; se só o mtime mudou, o sha1 decide se o arquivo foi mesmo alterado.
+    O total em disco é limitado a max_bytes, descartando as cópias usadas há mais tempo.
+    Acertos não regravam o índice; ele vai para o disco quando uma cópia é gravada ou descartada.
+    """
+    
+    INDEX_FILENAME = 'indice.json'
+    
+    def __init__(self, cache_dir, max_bytes=2 * 1024 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, self.INDEX_FILENAME)
+        self.index = None
+        self.lock = threading.Lock()
+    
+    def _load_index(self):
+        if self.index is None:
+            self.index = {}
+            if os.path.exists(self.index_path):
+                try:
+                    with open(self.index_path, 'r', encoding='utf-8') as f:
+                        self.index = json.load(f)
+                except Exception as e:
+                    logging.warning(f"Could not read ingest cache index {self.index_path}: {e}")
+        return self.index
+    
+    def _save_index(self):
+        """Grava o índice (chamado com self.lock) por troca atômica de um temporário exclusivo desta thread"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_path = f"{self.index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.index, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.index_path)
+        except Exception as e:
+            logging.warning(f"Could not save ingest cache index {self.index_path}: {e}")
+    
+    @staticmethod
+    def file_sha1(path):
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def _read_copy(self, entry):
+        copy_path = os.path.join(self.cache_dir, entry['file'])
+        if entry['file'].endswith('.parquet'):
+            return pd.read_parquet(copy_path)
+        return pd.read_pickle(copy_path)
+    
+    def _write_copy(self, entry_id, df):
+        """Grava a cópia em Parquet quando possível (colunas mistas caem para pickle); retorna o nome do arquivo"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if PARQUET_AVAILABLE:
+            parquet_path = os.path.join(self.cache_dir, entry_id + '.parquet')
+            try:
+                df.to_parquet(parquet_path, index=False)
+                return entry_id + '.parquet'
+            except Exception as e:
+                logging.debug(f"Parquet copy not possible for {entry_id}, using pickle: {e}")
+                if os.path.exists(parquet_path):
+                    os.remove(parquet_path)
+        filename = entry_id + '.pkl'
+        df.to_pickle(os.path.join(self.cache_dir, filename))
+        return filename
+    
+    def _remove_copy(self, entry):
+        copy_path = os.path.join(self.cache_dir, entry['file'])
+        if os.path.exists(copy_path):
+            os.remove(copy_path)
+    
+    def load(self, path, loader, kind='default'):
+        """Retorna a cópia em cache do arquivo ou lê com loader(path) e grava a cópia"""
+        stat = os.stat(path)
+        path = os.path.abspath(path)
+        entry_id = hashlib.sha1(f"{path}|{kind}".encode('utf-8')).hexdigest()[:20]
+        
+        with self.lock:
+            entry = self._load_index().get(entry_id)
+        
+        content_sha1 = None
+        if entry is not None and entry['size'] == stat.st_size:
+            if entry['mtime_ns'] != stat.st_mtime_ns:
+                content_sha1 = self.file_sha1(path)
+            if content_sha1 is None or content_sha1 == entry['sha1']:
+                try:
+                    df = self._read_copy(entry)
+                    with self.lock:
+                        # Acerto só em memória: o índice vai para o disco na próxima gravação ou descarte.
+                        # A exceção é o mtime novo de um arquivo com o mesmo conteúdo, para não recalcular o sha1
+                        entry['last_used'] = tm.time()
+                        if entry['mtime_ns'] != stat.st_mtime_ns:
+                            entry['mtime_ns'] = stat.st_mtime_ns
+                            self._save_index()
+                    return df
+                except Exception as e:
+                    logging.warning(f"Could not read ingest cache copy of {path}: {e}")
+        
+        df = loader(path)
+        try:
+            filename = self._write_copy(entry_id, df)
+            with self.lock:
+                index = self._load_index()
+                old_entry = index.get(entry_id)
+                if old_entry is not None and old_entry['file'] != filename:
+                    self._remove_copy(old_entry)
+                index[entry_id] = {
+                    'path': path,
+                    'kind': kind,
+                    'size': stat.st_size,
+                    'mtime_ns': stat.st_mtime_ns,
+                    'sha1': content_sha1 or self.file_sha1(path),
+                    'file': filename,
+                    'bytes': os.path.getsize(os.path.join(self.cache_dir, filename)),
+                    'last_used': tm.time()
+                }
+                self._evict(keep=entry_id)
+                self._save_index()
+        except Exception as e:
+            logging.warning(f"Could not store ingest cache copy of {path}: {e}")
+        return df
+    
+    def _evict(self, keep=None):
+        total_bytes = sum(entry['bytes'] for entry in self.index.values())
+        for entry_id, entry in sorted(self.index.items(), key=lambda item: item[1]['last_used']):
+            if total_bytes <= self.max_bytes:
+                break
+            if entry_id == keep:
+                continue
+            self._remove_copy(entry)
+            del self.index[entry_id]
+            total_bytes -= entry['bytes']
+    
+    def purge(self):
+        """Apaga todas as cópias e o índice; retorna quantas cópias foram removidas"""
+        with self.lock:
+            index = self._load_index()
+            removed = 0
+            for entry in index.values():
+                self._remove_copy(entry)
+                removed += 1
+            self.index = {}
+            if os.path.exists(self.index_path):
+                os.remove(self.index_path)
+        return removed
+
+INGEST_CACHES = {}
+
+def get_ingest_cache(output_base_dir):
+    """Cache de entradas em disco associado a uma pasta de saída (uma instância por pasta)"""
+    cache_dir = os.path.join(get_cache_dir(output_base_dir), 'entradas')
+    if cache_dir not in INGEST_CACHES:
+        INGEST_CACHES[cache_dir] = IngestCache(cache_dir)
+    return INGEST_CACHES[cache_dir]
+
+def read_input_workbook(path, output_base_dir=None, kind='default', reduce_block=None, session_cache=True,
+                        **read_kwargs):
+    """
+    Lê uma planilha de entrada com read_excel_file(**read_kwargs), passando pelo cache de sessão e,
+    quando a pasta de saída é informada, pelo cache colunar em disco.
+    kind deve identificar a forma de leitura (ex.: 'ranking' com dtype=str); o leitor entra na chave.
+    Com reduce_block, planilhas acima dos limites de leitura em blocos são lidas com
+    read_excel_in_blocks(reduce_block), reduzindo cada bloco a agregados parciais; o frame reduzido
+    fica nos caches com um tipo de leitura próprio, sem nunca ser servido a uma leitura completa.
+    session_cache=False lê sem passar pelo cache de sessão (o cache em disco continua valendo).
+    """
+    in_blocks = reduce_block is not None and should_read_in_blocks(path)
+    
+    def read_workbook(workbook_path):
+        if in_blocks:
+            return read_excel_in_blocks(workbook_path, reduce_block, **read_kwargs)
+        return read_excel_file(workbook_path, **read_kwargs)
+    
+    kind = f"{kind}:{get_xlsx_reader_engine()}" + (":blocos" if in_blocks else "")
+    if output_base_dir is None:
+        loader = read_workbook
+    else:
+        ingest_cache = get_ingest_cache(output_base_dir)
+        loader = lambda workbook_path: ingest_cache.load(workbook_path, read_workbook, kind)
+    if not session_cache:
+        return loader(path)
+    return INPUT_CACHE.get(path, loader, kind=kind)
+
+def read_supply_file(supply_file, output_base_dir=None):
+    """Lê um Abastecimento_{empresa}_{periodo}.xlsx uma única vez por execução (cache de sessão e em disco)"""
+    return read_input_workbook(supply_file, output_base_dir, kind='supply')
+
+# --- Esquemas das planilhas de entrada ---
+
+def converter_numeros_brasileiros(df, columns):
+    """
+    Colunas lidas como texto (dtype=str) viram números como nos scripts originais: ' , ' vira ponto
+    decimal e o que não é número vira NaN. Colunas que já são numéricas ficam como estão.
+    """
+    for col in columns:
+        if col in df.columns and not pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col].astype(str).str.replace(' , ', '.'), errors='coerce')
+    return df
+
+# Mudar quando um esquema mudar, para não reaproveitar cópias do cache de entradas lidas com o esquema antigo
+INPUT_SCHEMAS_VERSION = 2
+
+# Por tipo de arquivo: colunas lidas (None = todas), obrigatórias, alternativas (ao menos uma), tipos na leitura
+# e colunas numéricas ('numeric', convertidas por converter_numeros_brasileiros depois da leitura com dtype=str).
+# 'block_sum': na leitura em blocos, cada bloco é reduzido à soma dessa coluna pelas demais (só para
+# arquivos consumidos por somas agrupadas; o frame lido passa a ter uma linha por combinação de chaves).
+# A coluna somada deve estar em 'numeric': os blocos são convertidos antes da soma
+INPUT_SCHEMAS = {
+    'ranking': {
+        'columns': None,
+        'required': ['matricula'],
+        'dtype': str,
+        'numeric': ['km/l', 'ponto acumulado', 'km'],
+    },
+    'turnos': {
+        'columns': ['matricula', 'turno', 'placa', 'km', 'linha', 'nm_linha', 'nome_linha', 'linha_nome'],
+        'required': ['matricula', 'turno', 'placa', 'km'],
+        'required_any': [['linha', 'nm_linha', 'nome_linha', 'linha_nome']],
+        'dtype': str,
+        'numeric': ['km'],
+        'block_sum': 'km',
+    },
+    'resumo': {
+        'columns': ['matricula', 'nome', 'fase', 'placa', 'linha', 'inicio', 'fim',
+                    'km', 'lts', 'km/l', 'giro', 'freio', 'pedal', 'h/e', 'dia', 'app', 'dias'],
+        'required': ['placa', 'inicio', 'fim'],
+    },
+}
+
+def read_input_with_schema(path, output_base_dir, schema_name, session_cache=True):
+    """
+    Lê uma planilha de entrada conforme INPUT_SCHEMAS[schema_name]: só as colunas usadas (usecols),
+    tipos aplicados na leitura e colunas numéricas convertidas. Colunas obrigatórias ausentes geram ValueError.
+    session_cache=False não guarda o frame lido no cache de sessão (quem só precisa de um resumo dele).
+    """
+    schema = INPUT_SCHEMAS[schema_name]
+    read_kwargs = {}
+    if schema.get('columns') is not None:
+        columns = set(schema['columns'])
+        read_kwargs['usecols'] = lambda col: col in columns
+    if 'dtype' in schema:
+        read_kwargs['dtype'] = schema['dtype']
+    if 'block_sum' in schema:
+        # Os blocos também chegam como texto: números convertidos antes de somar
+        read_kwargs['reduce_block'] = lambda block: sum_by_group(
+            converter_numeros_brasileiros(block, schema.get('numeric', [])), schema['block_sum'])
+    
+    df = read_input_workbook(path, output_base_dir, kind=f"{schema_name}@{INPUT_SCHEMAS_VERSION}",
+                             session_cache=session_cache, **read_kwargs)
+    df = converter_numeros_brasileiros(df, schema.get('numeric', []))
+    
+    missing = [col for col in schema.get('required', []) if col not in df.columns]
+    missing += [' ou '.join(options) for options in schema.get('required_any', [])
+                if not any(col in df.columns for col in options)]
+    if missing:
+        raise ValueError(f"Colunas obrigatórias ausentes em {os.path.basename(path)}: {', '.join(missing)}")
+    return df
+
+# --- Resumo "mais rodou" do Turnos_128 (Ranking e Ranking_Integração) ---
+
+# Dimensões do resumo: turno, veículo e todas as colunas de linha aceitas pelo esquema 'turnos'
+MOST_DRIVEN_DIMENSIONS = ['turno', 'placa', 'linha', 'nm_linha', 'nome_linha', 'linha_nome']
+MOST_DRIVEN_KIND = 'mais_rodou'
+
+def most_driven_by(df, dimensions, key='matricula', value='km'):
+    """
+    Para cada dimensão, o valor com a maior soma de value por key (no empate, o primeiro em ordem, como o idxmax).
+    O frame é reduzido uma única vez por (key, dimensões); cada dimensão sai dessa redução ordenada por
+    (key, soma decrescente), ficando a primeira linha de cada key.
+    Retorna formato longo com as colunas dimensao, key, valor e value; attrs['dimensions'] lista as
+    dimensões presentes no frame (mesmo as que ficaram sem nenhuma linha).
+    """
+    dimensions = [dim for dim in dimensions if dim in df.columns]
+    # value sempre numérico: somado como texto (dtype=str), o groupby concatenaria os valores
+    df = converter_numeros_brasileiros(df[[key] + dimensions + [value]].copy(), [value])
+    reduced = df.groupby([key] + dimensions, dropna=False, sort=False)[value].sum().reset_index()
+    parts = []
+    for dim in dimensions:
+        sums = reduced.groupby([key, dim])[value].sum().reset_index()
+        best = sums.sort_values([key, value], ascending=[True, False], kind='mergesort').drop_duplicates(key)
+        parts.append(best.rename(columns={dim: 'valor'}).assign(dimensao=dim))
+    if parts:
+        summary = pd.concat(parts, ignore_index=True)[['dimensao', key, 'valor', value]]
+    else:
+        summary = pd.DataFrame(columns=['dimensao', key, 'valor', value])
+    summary.attrs['dimensions'] = dimensions
+    return summary
+
+def get_most_driven(turnos_path, output_base_dir):
+    """
+    Resumo most_driven_by do Turnos_128 por matrícula (normalizada), calculado uma vez por arquivo no
+    cache de sessão: Ranking e Ranking_Integração do mesmo período reduzem os turnos uma única vez.
+    Só o resumo fica no cache de sessão; os turnos lidos para calculá-lo não.
+    """
+    def summarize(path):
+        df_turnos = read_input_with_schema(path, output_base_dir, 'turnos', session_cache=False)
+        df_turnos['matricula'] = normalize_matricula(df_turnos['matricula'])
+        return most_driven_by(df_turnos, MOST_DRIVEN_DIMENSIONS)
+    
+    return INPUT_CACHE.get(turnos_path, summarize, kind=f"{MOST_DRIVEN_KIND}@{INPUT_SCHEMAS_VERSION}")
+
+def select_most_driven(summary, dimension, value_name, km_name=None):
+    """Colunas matricula e value_name (mais km km_name, se informado) de uma dimensão do resumo"""
+    columns = ['matricula', 'valor'] + (['km'] if km_name else [])
+    selected = summary.loc[summary['dimensao'] == dimension, columns].reset_index(drop=True)
+    selected.columns = ['matricula', value_name] + ([km_name] if km_name else [])
+    return selected
+
+# --- Leitura antecipada de entradas ---
+
+PREFETCH_DEPTH = 1
+
+def load_input_file(path, output_base_dir, kind):
+    """
+    Lê uma entrada pelo mesmo caminho de cache dos processadores: kind é um esquema (INPUT_SCHEMAS),
+    MOST_DRIVEN_KIND (resumo do Turnos_128) ou o tipo de leitura
+    """
+    if kind == MOST_DRIVEN_KIND:
+        return get_most_driven(path, output_base_dir)
+    if kind in INPUT_SCHEMAS:
+        return read_input_with_schema(path, output_base_dir, kind)
+    return read_input_workbook(path, output_base_dir, kind=kind)
+
+class InputPrefetcher:
+    """
+    Lê em segundo plano (uma thread) as entradas dos próximos depth itens para o cache de sessão,
+    enquanto o item atual é calculado e gravado. Para de antecipar quando o cache de sessão passa de
+    memory_budget bytes (padrão: metade do limite do cache), para não expulsar o que ainda será usado.
+    depth=0 desativa a leitura antecipada.
+    """
+    
+    def __init__(self, output_base_dir, depth=PREFETCH_DEPTH, memory_budget=None):
+        self.output_base_dir = output_base_dir
+        self.depth = max(0, int(depth))
+        self.memory_budget = memory_budget if memory_budget is not None else INPUT_CACHE.max_bytes // 2
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='prefetch') if self.depth else None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+        return False
+    
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+    
+    def schedule(self, input_files):
+        """Agenda a leitura de [(caminho, kind), ...]"""
+        if self.executor is not None and input_files:
+            self.executor.submit(self._load, list(input_files))
+    
+    def _load(self, input_files):
+        for path, kind in input_files:
+            if INPUT_CACHE.current_bytes >= self.memory_budget:
+                logging.debug(f"Prefetch paused: session cache at {INPUT_CACHE.current_bytes} bytes")
+                return
+            if not os.path.exists(path):
+                continue
+            try:
+                load_input_file(path, self.output_base_dir, kind)
+            except Exception as e:
+                # A leitura em primeiro plano vai repetir e registrar o erro
+                logging.debug(f"Prefetch of {path} failed: {e}")
+    
+    def iterate(self, items, get_input_files):
+        """Percorre items agendando, a cada passo, a leitura das entradas (get_input_files(item)) de depth itens adiante"""
+        items = list(items)
+        for index, item in enumerate(items):
+            first_ahead = index + 1 if index == 0 else index + self.depth
+            for ahead in items[first_ahead:index + self.depth + 1]:
+                try:
+                    self.schedule(get_input_files(ahead))
+                except Exception as e:
+                    logging.debug(f"Could not plan prefetch for {ahead}: {e}")
+            yield item
+
+# --- Catálogo de arquivos de entrada e saída ---
+
+def parse_report_filename(filename, prefix):
+    """
+    Interpreta '{prefixo}_{empresa}_{mês}_{ano}[_{versão}].xlsx'.
+    Retorna dict com company, month, year, version e consolidated (Ranking_Consolidado_...) ou None.
+    """
+    if not filename.startswith(prefix + '_') or not filename.endswith('.xlsx'):
+        return None
+    parts = filename[len(prefix) + 1:-len('.xlsx')].split('_')
+    consolidated = prefix == 'Ranking' and parts[0] == 'Consolidado' and len(parts) > 1
+    if consolidated:
+        parts = parts[1:]
+    if len(parts) < 2 or not parts[0]:
+        return None
+    return {
+        'company': parts[0],
+        'month': parts[1],
+        'year': parts[2] if len(parts) > 2 else None,
+        'version': '_'.join(parts[3:]),
+        'consolidated': consolidated
+    }
+
+class FileCatalog:
+    """
+    Índice único das planilhas de entrada (base_dir) e das saídas usadas como entrada por outros relatórios.
+    Cada origem é varrida uma vez; o índice fica em memória e em <saída>/_cache/catalogo_arquivos.json,
+    e só é refeito quando o mtime de alguma pasta da origem muda (arquivo criado, removido ou renomeado).
+    """
+    
+    SNAPSHOT_VERSION = 1
+    
+    # origem -> (raiz: 'entrada' ou 'saida', prefixo dos arquivos, profundidade dos arquivos abaixo da raiz)
+    # As saídas seguem {empresa}/{ano}/{mês}/arquivo.xlsx
+    SOURCES = {
+        'Integração_Abast': ('entrada', 'Abastecimento', 0),
+        'Integração_Mot': ('entrada', 'Motorista', 0),
+        'Ranking': ('entrada', 'Ranking', 0),
+        'Turnos_128': ('entrada', 'Turnos_128', 0),
+        'Resumo_Motorista_Cliente': ('entrada', 'RMC', 0),
+        'Abst_Mot_Por_empresa': ('saida', 'Detalhado', 3),
+        'Ranking_Por_Empresa': ('saida', 'Ranking_Por_Empresa', 3),
+    }
+    
+    def __init__(self, base_dir, output_base_dir):
+        self.roots = {'entrada': base_dir, 'saida': output_base_dir}
+        self.snapshot_path = os.path.join(get_cache_dir(output_base_dir), 'catalogo_arquivos.json')
+        self.sources = None
+        self.lock = threading.Lock()
+    
+    def _load_snapshot(self):
+        if self.sources is None:
+            self.sources = {}
+            if os.path.exists(self.snapshot_path):
+                try:
+                    with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                        snapshot = json.load(f)
+                    if snapshot.get('version') == self.SNAPSHOT_VERSION and snapshot.get('roots') == self.roots:
+                        self.sources = snapshot['sources']
+                except Exception as e:
+                    logging.warning(f"Could not read file catalog {self.snapshot_path}: {e}")
+        return self.sources
+    
+    def _save_snapshot(self):
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_path), exist_ok=True)
+            temp_path = self.snapshot_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': self.SNAPSHOT_VERSION, 'roots': self.roots, 'sources': self.sources},
+                          f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.snapshot_path)
+        except Exception as e:
+            logging.warning(f"Could not save file catalog {self.snapshot_path}: {e}")
+    
+    def source_dir(self, source):
+        root, _, _ = self.SOURCES[source]
+        return os.path.join(self.roots[root], source)
+    
+    def _is_current(self, entry):
+        for rel_dir, mtime_ns in entry['dirs'].items():
+            try:
+                if os.stat(entry['root'] if rel_dir == '.' else os.path.join(entry['root'], rel_dir)).st_mtime_ns != mtime_ns:
+                    return False
+            except OSError:
+                return False
+        return True
+    
+    def _scan(self, source):
+        """Varre a pasta da origem até a profundidade dos arquivos, guardando o mtime de cada pasta visitada"""
+        depth = self.SOURCES[source][2]
+        root = self.source_dir(source)
+        entry = {'root': root, 'dirs': {}, 'files': []}
+        if not os.path.isdir(root):
+            return entry
+        
+        pending = [('.', 0)]
+        while pending:
+            rel_dir, level = pending.pop()
+            full_dir = root if rel_dir == '.' else os.path.join(root, rel_dir)
+            entry['dirs'][rel_dir] = os.stat(full_dir).st_mtime_ns
+            for item in os.scandir(full_dir):
+                rel_item = item.name if rel_dir == '.' else os.path.join(rel_dir, item.name)
+                if level < depth and item.is_dir():
+                    pending.append((rel_item, level + 1))
+                elif level == depth and item.is_file() and item.name.endswith('.xlsx'):
+                    entry['files'].append(rel_item)
+        entry['files'].sort()
+        return entry
+    
+    def records(self, source):
+        """
+        Planilhas da origem como dicts: filename, path, folder (1ª pasta abaixo da raiz, nas saídas) e,
+        quando o nome segue o padrão do prefixo, company/month/year/version/consolidated.
+        """
+        with self.lock:
+            sources = self._load_snapshot()
+            entry = sources.get(source)
+            if entry is None or entry.get('root') != self.source_dir(source) or not self._is_current(entry):
+                entry = self._scan(source)
+                sources[source] = entry
+                self._save_snapshot()
+            files = list(entry['files'])
+            root = entry['root']
+        
+        _, prefix, _ = self.SOURCES[source]
+        records = []
+        for rel_path in files:
+            filename = os.path.basename(rel_path)
+            record = parse_report_filename(filename, prefix) or {}
+            record.update({
+                'source': source,
+                'filename': filename,
+                'path': os.path.join(root, rel_path),
+                'folder': rel_path.split(os.sep)[0] if os.sep in rel_path else None
+            })
+            records.append(record)
+        return records
+
+FILE_CATALOGS = {}
+
+def get_file_catalog(base_dir, output_base_dir):
+    """Catálogo compartilhado por todos os processadores do mesmo par entrada/saída"""
+    key = (os.path.abspath(base_dir), os.path.abspath(output_base_dir))
+    if key not in FILE_CATALOGS:
+        FILE_CATALOGS[key] = FileCatalog(base_dir, output_base_dir)
+    return FILE_CATALOGS[key]
+
 # --- Classes dos scripts originais (adaptadas) ---
 
 class CompanyProcessor:
-    def __init__(self, base_dir, output_base_dir, version_suffix=""):
+    # Formatos que já trazem a data completa (não usam o 'dia' como base)
+    DATETIME_FORMATS = [' %m-%d-%Y %H:%M:%S', ' %d/%m/%Y %H:%M:%S', ' %d/%m/%Y %H:%M',
+                        ' %Y-%m-%d %H:%M:%S', ' %Y-%m-%d %H:%M']
+    FALLBACK_TIME_FORMATS = [
+        ' %H:%M:%S', ' %H:%M', ' %m-%d-%Y %H:%M:%S', ' %d/%m/%Y %H:%M:%S',
+        ' %d/%m/%Y %H:%M', ' %Y-%m-%d %H:%M:%S', ' %Y-%m-%d %H:%M',
+        ' %I:%M %p', ' %I:%M:%S %p', ' %H%M', ' %H%M%S'
+    ]
+    
+    # Versão do estado salvo ao lado do Detalhado; mudar quando a regra de distribuição mudar
+    INCREMENTAL_STATE_VERSION = 1
+    
+    # Colunas de texto repetitivas que viram códigos categóricos no layout compacto
+    COMPACT_CATEGORY_COLUMNS = ['placa', 'motorista', 'matricula']
+    
+    def __init__(self, base_dir, output_base_dir, version_suffix="", legacy_distribution=False, incremental=True,
+                 compact_dtypes=False):
         self.BASE_DIR = base_dir
         self.SUPPLY_FOLDER = os.path.join(base_dir, 'Integração_Abast')
         self.DRIVER_FOLDER = os.path.join(base_dir, 'Integração_Mot')
         self.OUTPUT_BASE_DIR = output_base_dir # Novo diretório base para saída
         self.version_suffix = version_suffix
+        self.legacy_distribution = legacy_distribution # Usa o loop legado por (placa, Date) em vez do motor vetorizado
+        self.incremental = incremental # Recalcula apenas os grupos (placa, Date) cujas entradas mudaram
+        self.compact_dtypes = compact_dtypes # Categóricos, datetime64 e float32 nos frames de trabalho
+        self.time_format_profiles = TimeFormatProfileStore(
+            os.path.join(get_cache_dir(output_base_dir), 'perfis_formato_horario.json'))
+        self.catalog = get_file_catalog(base_dir, output_base_dir)
         
     def find_available_companies(self):
         logging.info("Searching for available companies for Abst_Mot_Por_empresa...")
@@ -138,52 +1220,51 @@ class CompanyProcessor:
         if not os.path.exists(self.DRIVER_FOLDER):
             logging.error(f"Driver folder not found: {self.DRIVER_FOLDER}")
             return []
-
-        supply_files = [f for f in os.listdir(self.SUPPLY_FOLDER) if f.startswith('Abastecimento_') and f.endswith('.xlsx')]
-        driver_files = [f for f in os.listdir(self.DRIVER_FOLDER) if f.startswith('Motorista_') and f.endswith('.xlsx')]
         
-        companies = set()
-        
-        for driver_file in driver_files:
-            parts = driver_file.split('_')
-            if len(parts) < 4:
-                continue
-                
-            company = parts[1]
-            month_year = '_'.join(parts[2:4]).replace('.xlsx', '')
-            supply_file = f"Abastecimento_{company}_{month_year}.xlsx"
-            
-            if supply_file in supply_files:
-                companies.add(company)
-        
-        return sorted(list(companies))
+        return sorted({company for company, _ in self._file_pairs()})
     
     def get_company_files(self, company):
-        supply_files = [f for f in os.listdir(self.SUPPLY_FOLDER) if f.startswith(f'Abastecimento_{company}_') and f.endswith('.xlsx')]
-        driver_files = [f for f in os.listdir(self.DRIVER_FOLDER) if f.startswith(f'Motorista_{company}_') and f.endswith('.xlsx')]
-        
+        return [{
+            'supply': supply_path,
+            'drivers': driver_path,
+            'month_year': month_year
+        } for pair_company, (month_year, supply_path, driver_path) in self._file_pairs() if pair_company == company]
+    
+    def _file_pairs(self):
+        """Pares (empresa, (período, abastecimento, motorista)) a partir do catálogo de arquivos"""
+        supply_files = {(record['company'], f"{record['month']}_{record['year']}"): record['path']
+                        for record in self.catalog.records('Integração_Abast')
+                        if record.get('year') and not record['version']}
         pairs = []
-        
-        for driver_file in driver_files:
-            parts = driver_file.split('_')
-            if len(parts) < 4:
+        for record in self.catalog.records('Integração_Mot'):
+            if not record.get('year'):
                 continue
-            month_year = '_'.join(parts[2:4]).replace('.xlsx', '')
-            supply_file = f"Abastecimento_{company}_{month_year}.xlsx"
-            
-            if supply_file in supply_files:
-                pairs.append({
-                    'supply': os.path.join(self.SUPPLY_FOLDER, supply_file),
-                    'drivers': os.path.join(self.DRIVER_FOLDER, driver_file),
-                    'month_year': month_year
-                })
-        
+            month_year = f"{record['month']}_{record['year']}"
+            supply_path = supply_files.get((record['company'], month_year))
+            if supply_path:
+                pairs.append((record['company'], (month_year, supply_path, record['path'])))
         return pairs
     
     def normalize_column_name(self, col):
         return ''.join(c for c in unicodedata.normalize('NFD', str(col)) if unicodedata.category(c) != 'Mn').replace(' ', '').lower()
     
-    def detect_time_format(self, series):
+    def format_success_rate(self, sample, time_format):
+        """Fração da amostra que o formato (ou o regex de fallback) consegue interpretar"""
+        successes = 0
+        for value in sample:
+            value_str = str(value).strip()
+            if time_format == 'regex':
+                if re.search(r'(\d{1,2}):(\d{2})(?::(\d{2}))?', value_str):
+                    successes += 1
+                continue
+            try:
+                datetime.strptime(value_str, time_format)
+                successes += 1
+            except:
+                continue
+        return successes / len(sample)
+    
+    def detect_time_format(self, series, company=None, column=None):
         valid_values = series.dropna()
         valid_values = valid_values[valid_values.astype(str).str.strip() != '']
         valid_values = valid_values[~valid_values.astype(str).str.strip().isin(['-----', '0m', 'nan', 'NaT'])]
@@ -191,6 +1272,17 @@ class CompanyProcessor:
         if len(valid_values) == 0:
             return None
         
+        sample = valid_values.head(min(10, len(valid_values)))
+        
+        # Otimizado: o layout de cada empresa não muda, então testa primeiro o formato do perfil salvo
+        profile = self.time_format_profiles.get(company, column) if company and column else None
+        if profile:
+            success_rate = self.format_success_rate(sample, profile['format'])
+            if success_rate > 0 and success_rate >= profile.get('success_rate', 0):
+                logging.debug(f"Using cached format for {company}/{column}: {profile['format']} (success rate: {success_rate:.2%})")
+                return profile['format']
+            logging.info(f"Cached format {profile['format']} for {company}/{column} failed on sample, detecting again...")
+        
         test_formats = [
             ' %H:%M:%S', ' %H:%M', ' %m-%d-%Y %H:%M:%S', ' %d/%m/%Y %H:%M:%S',
             ' %d/%m/%Y %H:%M', ' %Y-%m-%d %H:%M:%S', ' %Y-%m-%d %H:%M',
@@ -198,27 +1290,22 @@ class CompanyProcessor:
         ]
         
         format_scores = {}
-        sample = valid_values.head(min(10, len(valid_values)))
         
         for fmt in test_formats:
-            successes = 0
-            for value in sample:
-                try:
-                    datetime.strptime(str(value).strip(), fmt)
-                    successes += 1
-                except:
-                    continue
-            
-            if successes > 0:
-                format_scores[fmt] = successes / len(sample)
+            success_rate = self.format_success_rate(sample, fmt)
+            if success_rate > 0:
+                format_scores[fmt] = success_rate
         
         if format_scores:
             best_format = max(format_scores.items(), key=lambda x: x[1])
             logging.info(f"Detected format: {best_format[0]} (success rate: {best_format[1]:.2%})")
-            return best_format[0]
+        else:
+            logging.warning("Using regex detection as fallback.")
+            best_format = ('regex', self.format_success_rate(sample, 'regex'))
         
-        logging.warning("Using regex detection as fallback.")
-        return 'regex'
+        if company and column:
+            self.time_format_profiles.update(company, column, *best_format)
+        return best_format[0]
     
     def normalize_time_smart(self, value, detected_format=None, base_date=None):
         if pd.isnull(value) or value == '' or str(value).strip() in ['-----', '0m', 'nan', 'NaT']:
@@ -230,8 +1317,7 @@ class CompanyProcessor:
             try:
                 dt_parsed = datetime.strptime(value_str, detected_format)
                 
-                if detected_format in [' %m-%d-%Y %H:%M:%S', ' %d/%m/%Y %H:%M:%S', ' %d/%m/%Y %H:%M', 
-                                     ' %Y-%m-%d %H:%M:%S', ' %Y-%m-%d %H:%M']:
+                if detected_format in self.DATETIME_FORMATS:
                     return dt_parsed
                 
                 elif base_date is not None:
@@ -249,18 +1335,11 @@ class CompanyProcessor:
             except Exception as e:
                 logging.debug(f"Error using detected format {detected_format} for value '{value_str}': {e}")
         
-        fallback_formats = [
-            ' %H:%M:%S', ' %H:%M', ' %m-%d-%Y %H:%M:%S', ' %d/%m/%Y %H:%M:%S',
-            ' %d/%m/%Y %H:%M', ' %Y-%m-%d %H:%M:%S', ' %Y-%m-%d %H:%M',
-            ' %I:%M %p', ' %I:%M:%S %p', ' %H%M', ' %H%M%S'
-        ]
-        
-        for fmt in fallback_formats:
+        for fmt in self.FALLBACK_TIME_FORMATS:
             try:
                 dt_parsed = datetime.strptime(value_str, fmt)
                 
-                if fmt in [' %m-%d-%Y %H:%M:%S', ' %d/%m/%Y %H:%M:%S', ' %d/%m/%Y %H:%M', 
-                          ' %Y-%m-%d %H:%M:%S', ' %Y-%m-%d %H:%M']:
+                if fmt in self.DATETIME_FORMATS:
                     return dt_parsed
                 
                 elif base_date is not None:
@@ -303,6 +1382,85 @@ class CompanyProcessor:
         logging.warning(f"Could not normalize time: '{value_str}'")
         return np.nan
     
+    def parse_base_dates(self, base_dates):
+        """Otimizado: converte a coluna 'dia' em datas base, avaliando apenas os valores distintos"""
+        codes, uniques = pd.factorize(base_dates)
+        parsed = pd.Series(pd.NaT, index=range(len(uniques)), dtype='datetime64[ns]')
+        if len(uniques):
+            uniques = pd.Series(uniques, dtype=object)
+            is_text = uniques.map(lambda v: isinstance(v, str))
+            is_datetime = uniques.map(lambda v: isinstance(v, datetime))
+            parsed[is_text] = pd.to_datetime(uniques[is_text], format='%d/%m/%Y', errors='coerce')
+            if is_datetime.any():
+                parsed[is_datetime] = pd.to_datetime(uniques[is_datetime], errors='coerce').dt.normalize()
+        return pd.Series(parsed.reindex(codes).to_numpy(), index=base_dates.index)
+    
+    def normalize_time_column(self, series, detected_format=None, base_dates=None):
+        """
+        Otimizado: equivalente colunar do normalize_time_smart.
+        Cada valor distinto é convertido uma vez: primeiro com o formato detectado, depois
+        com os formatos de fallback e o regex apenas nos valores ainda pendentes.
+        """
+        codes, uniques = pd.factorize(series)
+        values = pd.Series(uniques, dtype=object).map(str).str.strip()
+        pending = ~values.isin(['', '-----', '0m', 'nan', 'NaT'])
+        
+        # Forma do valor (dígitos trocados por '1'): só valores cuja forma é compatível
+        # com o formato são de fato convertidos, o que evita varrer a coluna a cada fallback
+        shape_codes, shapes = pd.factorize(values.str.translate(str.maketrans('0123456789', '1111111111')))
+        shapes = pd.Series(shapes, dtype=object)
+        
+        full_datetimes = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+        times_of_day = pd.Series(pd.NaT, index=values.index, dtype='timedelta64[ns]')
+        
+        formats = [detected_format] if detected_format and detected_format != 'regex' else []
+        formats += [fmt for fmt in self.FALLBACK_TIME_FORMATS if fmt not in formats]
+        
+        for fmt in formats:
+            if not pending.any():
+                break
+            compatible = pd.to_datetime(shapes, format=fmt, errors='coerce').notna()
+            candidates = pending & np.isin(shape_codes, compatible.index[compatible])
+            if not candidates.any():
+                continue
+            parsed = pd.to_datetime(values[candidates], format=fmt, errors='coerce')
+            parsed = parsed[parsed.notna()]
+            if fmt in self.DATETIME_FORMATS:
+                full_datetimes[parsed.index] = parsed
+            else:
+                times_of_day[parsed.index] = parsed - parsed.dt.normalize()
+            pending[parsed.index] = False
+        
+        # Regex: a posição do primeiro 'hh:mm[:ss]' depende só da forma do valor
+        for shape_code in np.unique(shape_codes[pending.to_numpy()]):
+            match = re.search(r'(\d{1,2}):(\d{2})(?::(\d{2}))?', shapes[shape_code])
+            if not match:
+                continue
+            members = values[pending & (shape_codes == shape_code)]
+            width = len(shapes[shape_code])
+            digits = members.to_numpy(dtype=f'<U{width}').view(np.uint32).reshape(-1, width).astype(np.int64) - ord('0')
+            
+            def read_number(group):
+                start, end = match.span(group)
+                return digits[:, start:end] @ (10 ** np.arange(end - start - 1, -1, -1)) if start >= 0 else 0
+            
+            hours, minutes, seconds = read_number(1), read_number(2), read_number(3)
+            matched = (hours < 24) & (minutes < 60) & (seconds < 60)
+            times_of_day[members.index[matched]] = pd.to_timedelta(
+                (hours * 3600 + minutes * 60 + seconds)[matched], unit='s')
+            pending[members.index[matched]] = False
+        
+        if pending.any():
+            failed_rows = np.isin(codes, pending.index[pending]).sum()
+            examples = values[pending].head(5).tolist()
+            logging.warning(f"Could not normalize {failed_rows} time values (e.g. {examples})")
+        
+        result = pd.Series(full_datetimes.reindex(codes).to_numpy(), index=series.index)
+        if base_dates is not None:
+            row_times = pd.Series(times_of_day.reindex(codes).to_numpy(), index=series.index)
+            result = result.fillna(self.parse_base_dates(base_dates) + row_times)
+        return result
+    
     def identify_time_columns(self, df):
         normalized_columns = {self.normalize_column_name(col): col for col in df.columns}
         
@@ -331,245 +1489,659 @@ class CompanyProcessor:
         
         try:
             # Otimizado: usar engine explícito e otimizações de leitura
-            df_supply = pd.read_excel(supply_file, engine='openpyxl')
-            df_drivers = pd.read_excel(driver_file, engine='openpyxl')
-            
-            logging.debug(f"Supply file columns: {df_supply.columns.tolist()}")
-            logging.debug(f"Driver file columns: {df_drivers.columns.tolist()}")
+            df_supply = read_supply_file(supply_file, self.OUTPUT_BASE_DIR)
+            df_drivers = read_input_workbook(driver_file, self.OUTPUT_BASE_DIR, kind='drivers')
             
-            start_col_original, end_col_original = self.identify_time_columns(df_drivers)
-            
-            if not start_col_original or not end_col_original:
-                logging.error("ERROR: Could not identify start and/or end time columns!")
-                logging.error(f"Available columns: {df_drivers.columns.tolist()}")
+            frames = self.prepare_company_frames(df_supply, df_drivers)
+            if frames is None:
                 return False
+            df_supply, df_drivers = frames
+            df_unmatched = self.abastecimento_sem_motorista(df_supply, df_drivers)
             
-            logging.info(f"Detecting format for column '{start_col_original}'...")
-            start_format = self.detect_time_format(df_drivers[start_col_original])
+            logging.debug("Detecting format for column 'pegada'...")
+            start_format = self.detect_time_format(df_drivers['pegada'], company, 'pegada')
             
-            logging.info(f"Detecting format for column '{end_col_original}'...")
-            end_format = self.detect_time_format(df_drivers[end_col_original])
+            logging.debug("Detecting format for column 'largada'...")
+            end_format = self.detect_time_format(df_drivers['largada'], company, 'largada')
             
-            df_supply.columns = [self.normalize_column_name(col) for col in df_supply.columns]
-            df_drivers.columns = [self.normalize_column_name(col) for col in df_drivers.columns]
+            # Otimizado: reprocessamento incremental, só os grupos (placa, Date) cujas linhas mudaram
+            df_drivers, incremental_run = self.start_incremental_run(df_drivers, df_supply, company, month_year,
+                                                                     (start_format, end_format))
+            if self.compact_dtypes:
+                df_supply, df_drivers = self.compact_company_frames(df_supply, df_drivers)
             
-            if 'placa' in df_supply.columns:
-                df_supply['placa'] = df_supply['placa'].astype(str)
-            else:
-                logging.warning("Column 'placa' not found in supply file. Skipping conversion.")
-                df_supply['placa'] = '' 
+            df_drivers = self.normalize_driver_times(df_drivers, start_format, end_format)
             
-            if 'placa' in df_drivers.columns:
-                df_drivers['placa'] = df_drivers['placa'].astype(str)
+            # Otimizado: motor vetorizado por (placa, Date); o loop legado fica disponível para comparação
+            if self.legacy_distribution:
+                df_final = self.distribuir_por_placa_data_legado(df_drivers, df_supply)
             else:
-                logging.warning("Column 'placa' not found in driver file. Skipping conversion.")
-                df_drivers['placa'] = '' 
-            
-            for df in [df_supply, df_drivers]:
-                for col in df.columns:
-                    if col in ['matricula', 'matrícula', 'matricula.', 'matricula_']:
-                        df.rename(columns={col: 'matricula'}, inplace=True)
+                df_final = self.distribuir_por_placa_data(df_drivers, df_supply)
             
-            start_col_norm = self.normalize_column_name(start_col_original)
-            end_col_norm = self.normalize_column_name(end_col_original)
+            if self.compact_dtypes and df_final is not None:
+                df_final = self.expand_company_frame(df_final)
             
-            if start_col_norm in df_drivers.columns:
-                df_drivers.rename(columns={start_col_norm: 'pegada'}, inplace=True)
-            if end_col_norm in df_drivers.columns:
-                df_drivers.rename(columns={end_col_norm: 'largada'}, inplace=True)
-            
-            if 'dia' in df_supply.columns:
-                df_supply['Date'] = pd.to_datetime(df_supply['dia'], format='%d/%m/%Y', errors='coerce').dt.date
-            else:
-                logging.warning("Column 'dia' not found in supply file. Skipping date conversion.")
-                df_supply['Date'] = pd.NaT 
+            if incremental_run is not None:
+                df_final = self.finish_incremental_run(df_final, incremental_run)
             
-            if 'dia' in df_drivers.columns:
-                df_drivers['Date'] = pd.to_datetime(df_drivers['dia'], format='%d/%m/%Y', errors='coerce').dt.date
-            else:
-                logging.warning("Column 'dia' not found in driver file. Skipping date conversion.")
-                df_drivers['Date'] = pd.NaT 
+            if df_final is None or df_final.empty:
+                logging.warning(f"[LOG] No valid results for {company}!")
+                return False
             
-            logging.info("Normalizing start times...")
-            df_drivers['pegada_dt'] = df_drivers.apply(
-                lambda row: self.normalize_time_smart(row['pegada'], start_format, row['dia']) if 'pegada' in row and 'dia' in row else np.nan, 
-                axis=1
-            )
+            self.write_company_outputs(df_final, supply_file, company, month_year, df_unmatched)
             
-            logging.info("Normalizing end times...")
-            df_drivers['largada_dt'] = df_drivers.apply(
-                lambda row: self.normalize_time_smart(row['largada'], end_format, row['dia']) if 'largada' in row and 'dia' in row else np.nan, 
-                axis=1
-            )
+            total_time = tm.time() - start_time
+            logging.info(f"Processing finished in {total_time:.2f} seconds")
             
-            total_rows = len(df_drivers)
-            valid_starts = df_drivers['pegada_dt'].notna().sum()
-            valid_ends = df_drivers['largada_dt'].notna().sum()
-            
-            logging.info(f"\nConversion statistics:")
-            logging.info(f"Total rows: {total_rows}")
-            logging.info(f"Valid starts: {valid_starts} ({valid_starts/total_rows:.1%})" if total_rows > 0 else "Valid starts: 0 (0.0%)")
-            logging.info(f"Valid ends: {valid_ends} ({valid_ends/total_rows:.1%})" if total_rows > 0 else "Valid ends: 0 (0.0%)")
-            
-            invalid_dates = df_drivers[df_drivers['Date'].isna()]
-            if not invalid_dates.empty:
-                logging.warning("\nATTENTION: Invalid dates found:")
-                cols_to_display = [col for col in ['motorista', 'matricula', 'placa', 'dia'] if col in invalid_dates.columns]
-                if cols_to_display:
-                    logging.warning(invalid_dates[cols_to_display].to_string())
-                else:
-                    logging.warning("No relevant columns to display for invalid dates.")
+            return True
             
-            combinations = df_drivers[['placa', 'Date']].drop_duplicates()
-            results = []
-            total_combinations = len(combinations)
-            logging.info(f"Processing {total_combinations} combinations...")
-
-            for idx, row in combinations.iterrows():
-                plate = row['placa']
-                date = row['Date']
-
-                driver_group = df_drivers[(df_drivers['placa'] == plate) & (df_drivers['Date'] == date)].copy()
-                supply_group = df_supply[(df_supply['placa'] == plate) & (df_supply['Date'] == date)]
-
+        except Exception as e:
+            logging.error(f"Error processing files for {company}: {str(e)}")
+            return False
+    
+    def process_company_all_periods(self, company, periods=None):
+        """
+        Otimizado: processa todos os meses de uma empresa em uma única passada.
+        A detecção de formato, a normalização de horários e a distribuição rodam uma vez
+        sobre o frame combinado e o resultado é separado no fim em Detalhado/consolidado por mês.
+        Retorna {month_year: sucesso}.
+        """
+        pairs = self.get_company_files(company)
+        if periods is not None:
+            pairs = [pair for pair in pairs if pair['month_year'] in periods]
+        if not pairs:
+            return {}
+        
+        logging.info(f"\nProcessing company: {company} for {len(pairs)} periods")
+        results = self.process_combined_pairs([(company, pair) for pair in pairs])
+        return {month_year: success for (_, month_year), success in results.items()}
+    
+    def process_fleet_period(self, month_year, companies=None):
+        """
+        Otimizado: modo frota, processa um período de todas as empresas em um único frame
+        marcado por empresa e grava as saídas na estrutura Abst_Mot_Por_empresa/{empresa}/{ano}/{mês}.
+        Retorna {empresa: sucesso}.
+        """
+        if companies is None:
+            companies = self.find_available_companies()
+        jobs = [(company, pair) for company in companies
+                for pair in self.get_company_files(company) if pair['month_year'] == month_year]
+        if not jobs:
+            return {}
+        
+        logging.info(f"\nProcessing fleet: {len({company for company, _ in jobs})} companies for {month_year}")
+        results = self.process_combined_pairs(jobs)
+        return {company: success for (company, _), success in results.items()}
+    
+    def process_combined_pairs(self, jobs):
+        """
+        Processa vários pares (empresa, arquivos do período) sobre um frame combinado.
+        Cada par recebe um número de lote, que entra na chave de distribuição junto com (placa, Date);
+        formatos de horário e normalização continuam por empresa.
+        Retorna {(empresa, month_year): sucesso}.
+        """
+        # O loop legado agrupa só por (placa, Date); nesse modo cada par é processado separadamente
+        if self.legacy_distribution or len(jobs) == 1:
+            return {(company, pair['month_year']): self.process_company_files(pair['supply'], pair['drivers'], company, pair['month_year'])
+                    for company, pair in jobs}
+        
+        start_time = tm.time()
+        results = {}
+        
+        try:
+            # Leitura e preparo por par, como no processamento de um par por vez: um mês ou empresa com
+            # arquivo ilegível fica de fora sem impedir os demais
+            loaded = []
+            for company, pair in jobs:
                 try:
-                    driver_group['pegada'] = driver_group['pegada_dt']
-                    driver_group['largada'] = driver_group['largada_dt']
-                    
-                    # Otimizado: verificação mais eficiente de tipos datetime
-                    valid_times = driver_group['pegada'].notna() & driver_group['largada'].notna()
-                    # Verificar se são datetime apenas se necessário (mais eficiente que apply em todos)
-                    if not valid_times.all():
-                        valid_times = valid_times & (driver_group['pegada'].apply(lambda x: isinstance(x, datetime))) & \
-                                      (driver_group['largada'].apply(lambda x: isinstance(x, datetime)))
+                    df_supply = read_supply_file(pair['supply'], self.OUTPUT_BASE_DIR)
+                    df_drivers = read_input_workbook(pair['drivers'], self.OUTPUT_BASE_DIR, kind='drivers')
+                    frames = self.prepare_company_frames(df_supply, df_drivers)
+                except Exception as e:
+                    logging.error(f"Error processing files for {company} {pair['month_year']}: {str(e)}")
+                    frames = None
+                if frames is None:
+                    results[(company, pair['month_year'])] = False
+                    continue
+                loaded.append((company, pair, frames[0], frames[1]))
+            
+            if not loaded:
+                return results
+            
+            # Formato detectado uma vez por empresa, sobre todos os seus pares
+            time_formats = {}
+            for company in dict.fromkeys(company for company, _, _, _ in loaded):
+                company_drivers = [df_drivers for c, _, _, df_drivers in loaded if c == company]
+                time_formats[company] = (
+                    self.detect_time_format(pd.concat([df['pegada'] for df in company_drivers], ignore_index=True), company, 'pegada'),
+                    self.detect_time_format(pd.concat([df['largada'] for df in company_drivers], ignore_index=True), company, 'largada'))
+            
+            # Marca cada linha com o índice do par (dois arquivos do mesmo mês não se misturam)
+            supply_frames, driver_frames, jobs_info = [], [], []
+            for company, pair, df_supply, df_drivers in loaded:
+                try:
+                    month_columns = list(df_drivers.columns)
+                    month_dtypes = df_drivers.dtypes
+                    df_unmatched = self.abastecimento_sem_motorista(df_supply, df_drivers)
+                    df_drivers, incremental_run = self.start_incremental_run(df_drivers, df_supply, company, pair['month_year'],
+                                                                             time_formats[company])
+                except Exception as e:
+                    logging.error(f"Error processing files for {company} {pair['month_year']}: {str(e)}")
+                    results[(company, pair['month_year'])] = False
+                    continue
+                batch_index = len(jobs_info)
+                supply_frames.append(df_supply.assign(_lote=batch_index))
+                driver_frames.append((company, df_drivers.assign(_lote=batch_index)))
+                jobs_info.append((company, pair, month_columns, month_dtypes, incremental_run, df_unmatched))
+            
+            if not jobs_info:
+                return results
+            
+            df_supply = pd.concat(supply_frames, ignore_index=True)
+            df_drivers = pd.concat([
+                self.normalize_driver_times(pd.concat([df for c, df in driver_frames if c == company], ignore_index=True),
+                                            *time_formats[company])
+                for company in dict.fromkeys(c for c, _ in driver_frames)], ignore_index=True)
+            if self.compact_dtypes:
+                df_supply, df_drivers = self.compact_company_frames(df_supply, df_drivers)
+            
+            df_result = self.distribuir_por_placa_data(df_drivers, df_supply, keys=['_lote', 'placa', 'Date'])
+            if self.compact_dtypes:
+                df_result = self.expand_company_frame(df_result)
+            
+            result_columns = ['pegada_dt', 'largada_dt', 'duration', 'km_distributed', 'liters_distributed']
+            for batch_index, (company, pair, month_columns, month_dtypes, incremental_run, df_unmatched) in enumerate(jobs_info):
+                month_year = pair['month_year']
+                # Cada par termina e grava separado: um par que falha (ex.: saída aberta no Excel) não derruba os demais
+                try:
+                    df_final = df_result[df_result['_lote'] == batch_index] if not df_result.empty else df_result
+                    df_final = df_final.reindex(columns=month_columns + result_columns).reset_index(drop=True)
+                    df_final = self.restore_batch_dtypes(df_final, month_dtypes)
                     
-                    if not valid_times.all():
-                        invalid_rows = driver_group[~valid_times]
-                        if not invalid_rows.empty:
-                            logging.debug(f"\n[LOG] Rows ignored due to invalid times for plate {plate} on {date}:")
-                            cols_to_display = [col for col in ['motorista', 'matricula', 'placa', 'dia', 'pegada', 'largada'] if col in invalid_rows.columns]
-                            if cols_to_display:
-                                logging.debug(invalid_rows[cols_to_display].to_string())
-                        driver_group = driver_group[valid_times]
+                    if incremental_run is not None:
+                        df_final = self.finish_incremental_run(df_final, incremental_run)
                     
-                    if driver_group.empty:
+                    if df_final is None or df_final.empty:
+                        logging.warning(f"[LOG] No valid results for {company} {month_year}!")
+                        results[(company, month_year)] = False
                         continue
                     
-                    next_day_mask = driver_group['largada'] < driver_group['pegada']
-                    driver_group.loc[next_day_mask, 'largada'] = \
-                        driver_group.loc[next_day_mask, 'largada'] + pd.Timedelta(days=1)
-                    
-                    driver_group['duration'] = (driver_group['largada'] - driver_group['pegada']).dt.total_seconds() / 60
-                    total_duration = driver_group['duration'].sum()
-                    
-                    invalid_durations = driver_group[driver_group['duration'] < 0]
-                    if not invalid_durations.empty:
-                        logging.warning(f"\nATTENTION: Negative durations found for plate {plate} on {date}:")
-                        cols_to_display = [col for col in ['motorista', 'matricula', 'placa', 'Date', 'pegada', 'largada'] if col in invalid_durations.columns]
+                    self.write_company_outputs(df_final, pair['supply'], company, month_year, df_unmatched)
+                    results[(company, month_year)] = True
+                except Exception as e:
+                    logging.error(f"Error processing files for {company} {month_year}: {str(e)}")
+                    results[(company, month_year)] = False
+            
+            total_time = tm.time() - start_time
+            logging.info(f"Processing of {len(loaded)} file pairs finished in {total_time:.2f} seconds")
+            
+        except Exception as e:
+            logging.error(f"Error processing combined files: {str(e)}")
+            for company, pair in jobs:
+                results.setdefault((company, pair['month_year']), False)
+        
+        return results
+    
+    def restore_batch_dtypes(self, df, dtypes):
+        """
+        Desfaz no resultado de um par o upcast do frame combinado: colunas int/bool do par viram float/object
+        quando outro par não tem a coluna (preenchida com NaN). Sem isso a matrícula 123 sairia 123.0.
+        """
+        for col, dtype in dtypes.items():
+            if col in df.columns and df[col].dtype != dtype and \
+                    (pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_bool_dtype(dtype)) and df[col].notna().all():
+                df[col] = df[col].astype(dtype)
+        return df
+    
+    def prepare_company_frames(self, df_supply, df_drivers):
+        """Normaliza colunas de um par Abastecimento/Motorista: placa, matricula, pegada/largada e Date"""
+        logging.debug(f"Supply file columns: {df_supply.columns.tolist()}")
+        logging.debug(f"Driver file columns: {df_drivers.columns.tolist()}")
+        
+        start_col_original, end_col_original = self.identify_time_columns(df_drivers)
+        
+        if not start_col_original or not end_col_original:
+            logging.error("ERROR: Could not identify start and/or end time columns!")
+            logging.error(f"Available columns: {df_drivers.columns.tolist()}")
+            return None
+        
+        df_supply.columns = [self.normalize_column_name(col) for col in df_supply.columns]
+        df_drivers.columns = [self.normalize_column_name(col) for col in df_drivers.columns]
+        
+        if 'placa' in df_supply.columns:
+            df_supply['placa'] = df_supply['placa'].astype(str)
+        else:
+            logging.warning("Column 'placa' not found in supply file. Skipping conversion.")
+            df_supply['placa'] = '' 
+        
+        if 'placa' in df_drivers.columns:
+            df_drivers['placa'] = df_drivers['placa'].astype(str)
+        else:
+            logging.warning("Column 'placa' not found in driver file. Skipping conversion.")
+            df_drivers['placa'] = '' 
+        
+        for df in [df_supply, df_drivers]:
+            for col in df.columns:
+                if col in ['matricula', 'matrícula', 'matricula.', 'matricula_']:
+                    df.rename(columns={col: 'matricula'}, inplace=True)
+        
+        start_col_norm = self.normalize_column_name(start_col_original)
+        end_col_norm = self.normalize_column_name(end_col_original)
+        
+        if start_col_norm in df_drivers.columns:
+            df_drivers.rename(columns={start_col_norm: 'pegada'}, inplace=True)
+        if end_col_norm in df_drivers.columns:
+            df_drivers.rename(columns={end_col_norm: 'largada'}, inplace=True)
+        
+        if 'dia' in df_supply.columns:
+            df_supply['Date'] = pd.to_datetime(df_supply['dia'], format='%d/%m/%Y', errors='coerce').dt.date
+        else:
+            logging.warning("Column 'dia' not found in supply file. Skipping date conversion.")
+            df_supply['Date'] = pd.NaT 
+        
+        if 'dia' in df_drivers.columns:
+            df_drivers['Date'] = pd.to_datetime(df_drivers['dia'], format='%d/%m/%Y', errors='coerce').dt.date
+        else:
+            logging.warning("Column 'dia' not found in driver file. Skipping date conversion.")
+            df_drivers['Date'] = pd.NaT 
+        
+        return df_supply, df_drivers
+    
+    def compact_company_frames(self, df_supply, df_drivers):
+        """
+        Otimizado: layout compacto dos frames de trabalho. Placa, motorista e matrícula viram categóricos
+        (placa com as mesmas categorias nos dois frames, para o join), Date vira datetime64 e km/litros
+        do abastecimento viram float32 quando todos os valores voltam exatos ao centavo.
+        """
+        plates = pd.concat([df_supply['placa'], df_drivers['placa']], ignore_index=True).dropna().unique()
+        plate_dtype = pd.CategoricalDtype(plates)
+        df_supply = df_supply.assign(placa=df_supply['placa'].astype(plate_dtype))
+        df_drivers = df_drivers.assign(placa=df_drivers['placa'].astype(plate_dtype))
+        for col in self.COMPACT_CATEGORY_COLUMNS[1:]:
+            if col in df_drivers.columns:
+                df_drivers[col] = df_drivers[col].astype('category')
+        
+        df_supply['Date'] = pd.to_datetime(df_supply['Date'])
+        df_drivers['Date'] = pd.to_datetime(df_drivers['Date'])
+        
+        for col in ['km', 'litros']:
+            if col in df_supply.columns and df_supply[col].dtype == np.float64:
+                values = df_supply[col].to_numpy()
+                values_32 = values.astype(np.float32)
+                if np.array_equal(np.round(values_32.astype(np.float64), 2), values, equal_nan=True):
+                    df_supply[col] = values_32
+        
+        return df_supply, df_drivers
+    
+    def expand_company_frame(self, df):
+        """Desfaz o layout compacto no resultado: texto nas colunas categóricas e Date como datetime.date"""
+        df = df.copy()
+        for col in self.COMPACT_CATEGORY_COLUMNS:
+            if col in df.columns and isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype(df[col].cat.categories.dtype)
+        if 'Date' in df.columns and pd.api.types.is_datetime64_any_dtype(df['Date']):
+            df['Date'] = df['Date'].dt.date
+        return df
+    
+    def normalize_driver_times(self, df_drivers, start_format, end_format):
+        """Cria pegada_dt/largada_dt a partir dos horários e do dia base, registrando as estatísticas"""
+        # Otimizado: conversão colunar em vez de apply linha a linha
+        base_dates = df_drivers['dia'] if 'dia' in df_drivers.columns else None
+        
+        logging.info("Normalizing start times...")
+        if 'pegada' in df_drivers.columns and base_dates is not None:
+            df_drivers['pegada_dt'] = self.normalize_time_column(df_drivers['pegada'], start_format, base_dates)
+        else:
+            df_drivers['pegada_dt'] = pd.NaT
+        
+        logging.info("Normalizing end times...")
+        if 'largada' in df_drivers.columns and base_dates is not None:
+            df_drivers['largada_dt'] = self.normalize_time_column(df_drivers['largada'], end_format, base_dates)
+        else:
+            df_drivers['largada_dt'] = pd.NaT
+        
+        total_rows = len(df_drivers)
+        valid_starts = df_drivers['pegada_dt'].notna().sum()
+        valid_ends = df_drivers['largada_dt'].notna().sum()
+        
+        logging.info(f"\nConversion statistics:")
+        logging.info(f"Total rows: {total_rows}")
+        logging.info(f"Valid starts: {valid_starts} ({valid_starts/total_rows:.1%})" if total_rows > 0 else "Valid starts: 0 (0.0%)")
+        logging.info(f"Valid ends: {valid_ends} ({valid_ends/total_rows:.1%})" if total_rows > 0 else "Valid ends: 0 (0.0%)")
+        
+        invalid_dates = df_drivers[df_drivers['Date'].isna()]
+        if not invalid_dates.empty:
+            logging.warning("\nATTENTION: Invalid dates found:")
+            cols_to_display = [col for col in ['motorista', 'matricula', 'placa', 'dia'] if col in invalid_dates.columns]
+            if cols_to_display:
+                logging.warning(invalid_dates[cols_to_display].to_string())
+            else:
+                logging.warning("No relevant columns to display for invalid dates.")
+        
+        return df_drivers
+    
+    def get_output_files(self, company, month_year):
+        """Arquivos que o processamento de um período grava (usado na checagem de arquivos em uso)"""
+        month, year = month_year.split('_')
+        output_folder_path = os.path.join(self.OUTPUT_BASE_DIR, 'Abst_Mot_Por_empresa', company, year, month.zfill(2))
+        return [os.path.join(output_folder_path, filename) for filename in [
+            f"Detalhado_{company}_{month_year}{self.version_suffix}.xlsx",
+            f"Abst_Mot_Por_empresa_{company}_{month_year}{self.version_suffix}.xlsx",
+            f"Abastecimento_Sem_Motorista_{company}_{month_year}{self.version_suffix}.xlsx"
+        ]]
+    
+    def get_input_files(self, company, month_year):
+        """Entradas lidas no processamento de um período, como (caminho, tipo de leitura) para a leitura antecipada"""
+        pair = next((p for p in self.get_company_files(company) if p['month_year'] == month_year), None)
+        if pair is None:
+            return []
+        return [(pair['supply'], 'supply'), (pair['drivers'], 'drivers')]
+    
+    def write_company_outputs(self, df_final, supply_file, company, month_year, df_unmatched=None):
+        """
+        Formata pegada/largada, confere os totais e grava o Detalhado e o consolidado do período.
+        Abastecimentos sem motorista (df_unmatched) vão para um relatório à parte quando existirem.
+        """
+        # Horários tipados para a cópia colunar, antes de virarem texto no .xlsx
+        typed_times = {col: detalhado_times(df_final[col]) for col in DETALHADO_TIME_COLUMNS if col in df_final.columns}
+        for col in ['pegada', 'largada']:
+            if col in df_final.columns:
+                df_final[col] = df_final[col].apply(
+                    lambda x: x.strftime('%d/%m/%Y %H:%M') if isinstance(x, datetime) and pd.notna(x) else str(x) if pd.notna(x) else '')
+        
+        # Extrai mês e ano do month_year para uso no caminho de saída
+        month, year = month_year.split('_')
+        # Define o diretório de saída com base na empresa, ano e mês
+        output_folder_path = os.path.join(self.OUTPUT_BASE_DIR, 'Abst_Mot_Por_empresa', company, year, month.zfill(2))
+        os.makedirs(output_folder_path, exist_ok=True)
+
+        detailed_filename = f"Detalhado_{company}_{month_year}{self.version_suffix}.xlsx"
+        consolidated_filename = f"Abst_Mot_Por_empresa_{company}_{month_year}{self.version_suffix}.xlsx"
+        
+        detailed_filepath = os.path.join(output_folder_path, detailed_filename)
+        
+        # Verificar e corrigir distribuição antes de salvar
+        logging.info(f"🔍 Verificando qualidade da distribuição para {company} {month_year}...")
+        self.verificar_e_corrigir_distribuicao(df_final, supply_file, detailed_filepath)
+        
+        # Gravação em streaming: o Detalhado é o maior arquivo da execução
+        write_excel_streaming(df_final, detailed_filepath)
+        write_detalhado_sidecar(df_final.assign(**typed_times), detailed_filepath)
+        
+        self.create_consolidated_file(df_final, consolidated_filename, output_folder_path)
+        
+        logging.info(f"Files generated:")
+        logging.info(f"- {detailed_filepath}")
+        logging.info(f"- {os.path.join(output_folder_path, consolidated_filename)}")
+        
+        unmatched_filepath = os.path.join(output_folder_path, f"Abastecimento_Sem_Motorista_{company}_{month_year}{self.version_suffix}.xlsx")
+        if df_unmatched is not None and not df_unmatched.empty:
+            km_unmatched = df_unmatched['km'].sum() if 'km' in df_unmatched.columns else 0
+            liters_unmatched = df_unmatched['litros'].sum() if 'litros' in df_unmatched.columns else 0
+            logging.warning(f"⚠️ {len(df_unmatched)} supply rows without a matching driver group "
+                            f"(km: {km_unmatched:.2f}, litros: {liters_unmatched:.2f})")
+            write_excel_streaming(df_unmatched.drop(columns=['Date']), unmatched_filepath)
+            logging.info(f"- {unmatched_filepath}")
+        elif os.path.exists(unmatched_filepath):
+            # Relatório de uma execução anterior que não vale mais
+            os.remove(unmatched_filepath)
+        
+        return detailed_filepath
+    
+    def start_incremental_run(self, df_drivers, df_supply, company, month_year, time_formats):
+        """
+        Separa os grupos (placa, Date) inalterados desde a última execução do período.
+        Retorna (df_drivers só com os grupos a recalcular, contexto) ou (df_drivers, None) sem incremental.
+        """
+        if not self.incremental or self.legacy_distribution:
+            return df_drivers, None
+        
+        incremental_run = {
+            'state_path': self.incremental_state_path(company, month_year),
+            'time_formats': time_formats,
+            'driver_columns': list(df_drivers.columns),
+            'fingerprints': self.group_fingerprints(df_drivers, df_supply),
+            'previous_result': None,
+            'group_order': None
+        }
+        previous_state = self.load_incremental_state(incremental_run['state_path'], time_formats, incremental_run['driver_columns'])
+        if previous_state is not None:
+            fingerprints = incremental_run['fingerprints']
+            previous_fingerprints = previous_state['fingerprints']
+            unchanged = pd.MultiIndex.from_tuples(
+                [key for key, fingerprint in fingerprints.items() if previous_fingerprints.get(key) == fingerprint],
+                names=['placa', 'Date'])
+            logging.info(f"Incremental run: {len(fingerprints) - len(unchanged)} of {len(fingerprints)} plate/date groups changed")
+            
+            previous_result = previous_state['result']
+            incremental_run['previous_result'] = previous_result[pd.MultiIndex.from_frame(previous_result[['placa', 'Date']]).isin(unchanged)]
+            current_groups = df_drivers.loc[df_drivers['Date'].notna(), ['placa', 'Date']].drop_duplicates()
+            incremental_run['group_order'] = pd.Series(range(len(current_groups)), index=pd.MultiIndex.from_frame(current_groups))
+            df_drivers = df_drivers[~pd.MultiIndex.from_frame(df_drivers[['placa', 'Date']]).isin(unchanged)]
+        
+        return df_drivers, incremental_run
+    
+    def finish_incremental_run(self, df_final, incremental_run):
+        """Junta os grupos recalculados aos inalterados e grava o novo estado do período"""
+        previous_result = incremental_run['previous_result']
+        if previous_result is not None:
+            # Junta os grupos recalculados aos inalterados, na ordem de aparição do arquivo atual
+            df_final = pd.concat([previous_result, df_final], ignore_index=True) if df_final is not None and not df_final.empty else previous_result
+            order = incremental_run['group_order'].reindex(pd.MultiIndex.from_frame(df_final[['placa', 'Date']])).to_numpy()
+            df_final = df_final.iloc[np.argsort(order, kind='stable')].reset_index(drop=True)
+        
+        if df_final is None or df_final.empty:
+            return df_final
+        
+        self.save_incremental_state(incremental_run['state_path'], incremental_run['time_formats'],
+                                    incremental_run['driver_columns'], incremental_run['fingerprints'], df_final)
+        return df_final.copy()
+    
+    def group_fingerprints(self, df_drivers, df_supply):
+        """Hash das linhas de entrada de cada grupo (placa, Date), usado no reprocessamento incremental"""
+        keys = ['placa', 'Date']
+        supply_columns = keys + [col for col in ['km', 'litros'] if col in df_supply.columns]
+        parts = []
+        for df in [df_drivers, df_supply[supply_columns]]:
+            df = df[df['Date'].notna()]
+            row_hashes = df[keys].assign(_hash=pd.util.hash_pandas_object(df, index=False).to_numpy())
+            parts.append(row_hashes.groupby(keys, sort=False)['_hash'].agg(
+                lambda h: hashlib.blake2b(h.to_numpy().tobytes(), digest_size=8).hexdigest()))
+        driver_hashes, supply_hashes = parts
+        fingerprints = driver_hashes + ':' + supply_hashes.reindex(driver_hashes.index).fillna('')
+        return fingerprints.to_dict()
+    
+    def incremental_state_path(self, company, month_year):
+        month, year = month_year.split('_')
+        return os.path.join(self.OUTPUT_BASE_DIR, 'Abst_Mot_Por_empresa', company, year, month.zfill(2),
+                            f"Detalhado_{company}_{month_year}{self.version_suffix}.grupos.pkl")
+    
+    def load_incremental_state(self, state_path, time_formats, driver_columns):
+        """Carrega o resultado anterior por grupo, se ainda for compatível com a execução atual"""
+        if not os.path.exists(state_path):
+            return None
+        try:
+            state = pd.read_pickle(state_path)
+        except Exception as e:
+            logging.warning(f"Could not read incremental state {state_path}: {e}")
+            return None
+        if (state.get('version') != self.INCREMENTAL_STATE_VERSION or state.get('time_formats') != time_formats
+                or state.get('driver_columns') != driver_columns):
+            logging.info("Incremental state is outdated, recomputing all groups")
+            return None
+        return state
+    
+    def save_incremental_state(self, state_path, time_formats, driver_columns, fingerprints, df_result):
+        try:
+            os.makedirs(os.path.dirname(state_path), exist_ok=True)
+            pd.to_pickle({
+                'version': self.INCREMENTAL_STATE_VERSION,
+                'time_formats': time_formats,
+                'driver_columns': driver_columns,
+                'fingerprints': fingerprints,
+                'result': df_result
+            }, state_path)
+        except Exception as e:
+            logging.warning(f"Could not save incremental state {state_path}: {e}")
+    
+    def distribuir_por_placa_data(self, df_drivers, df_supply, keys=None):
+        """Otimizado: distribui km e litros de todos os grupos (placa, Date) em passes colunares"""
+        keys = keys or ['placa', 'Date']
+        df = df_drivers[df_drivers['Date'].notna()].copy()
+        if df.empty:
+            return df
+        
+        # Ordem dos grupos = primeira aparição no arquivo, igual ao drop_duplicates do loop legado
+        df['_group_order'] = df.groupby(keys, sort=False, observed=True).ngroup()
+        logging.info(f"Processing {df['_group_order'].nunique()} combinations...")
+        
+        df['pegada'] = df['pegada_dt']
+        df['largada'] = df['largada_dt']
+        valid_times = df['pegada'].notna() & df['largada'].notna()
+        if df['pegada'].dtype == object or df['largada'].dtype == object:
+            valid_times &= df['pegada'].map(lambda x: isinstance(x, datetime)) & \
+                           df['largada'].map(lambda x: isinstance(x, datetime))
+        
+        if not valid_times.all():
+            invalid_rows = df[~valid_times]
+            logging.debug(f"\n[LOG] Rows ignored due to invalid times: {len(invalid_rows)}")
+            cols_to_display = [col for col in ['motorista', 'matricula', 'placa', 'dia', 'pegada', 'largada'] if col in invalid_rows.columns]
+            if cols_to_display:
+                logging.debug(invalid_rows[cols_to_display].to_string())
+            df = df[valid_times].copy()
+            if df.empty:
+                return df
+        
+        df['pegada'] = pd.to_datetime(df['pegada'])
+        df['largada'] = pd.to_datetime(df['largada'])
+        next_day_mask = df['largada'] < df['pegada']
+        df.loc[next_day_mask, 'largada'] = df.loc[next_day_mask, 'largada'] + pd.Timedelta(days=1)
+        
+        df['duration'] = (df['largada'] - df['pegada']).dt.total_seconds() / 60
+        total_duration = df.groupby(keys, sort=False, observed=True)['duration'].transform('sum')
+        
+        invalid_durations = df[df['duration'] < 0]
+        if not invalid_durations.empty:
+            logging.warning("\nATTENTION: Negative durations found:")
+            cols_to_display = [col for col in ['motorista', 'matricula', 'placa', 'Date', 'pegada', 'largada'] if col in invalid_durations.columns]
+            if cols_to_display:
+                logging.warning(invalid_durations[cols_to_display].to_string())
+        
+        # Totais de abastecimento por (placa, Date) calculados uma única vez
+        df = df.join(self.agregar_abastecimento(df_supply, keys), on=keys)
+        
+        # Distribuição proporcional à duração, exata ao centavo em cada grupo
+        has_supply = df['_supply_rows'].notna() & (total_duration > 0)
+        groups = df.loc[has_supply, '_group_order']
+        df['km_distributed'] = 0.0
+        df['liters_distributed'] = 0.0
+        df.loc[has_supply, 'km_distributed'] = allocate_cents(df.loc[has_supply, 'duration'], df.loc[has_supply, '_total_km'], groups)
+        df.loc[has_supply, 'liters_distributed'] = allocate_cents(df.loc[has_supply, 'duration'], df.loc[has_supply, '_total_liters'], groups)
+        
+        df = df.sort_values('_group_order', kind='stable')
+        df = df.drop(columns=['_group_order', '_total_km', '_total_liters', '_supply_rows'])
+        return df.reset_index(drop=True)
+    
+    def agregar_abastecimento(self, df_supply, keys=None):
+        """Tabela de totais de abastecimento indexada pela chave do grupo (por padrão placa, Date)"""
+        keys = keys or ['placa', 'Date']
+        supply = df_supply[keys].copy()
+        supply['km'] = df_supply['km'] if 'km' in df_supply.columns else 0
+        supply['litros'] = df_supply['litros'] if 'litros' in df_supply.columns else 0
+        for col in ['km', 'litros']:
+            if supply[col].dtype == np.float32:
+                # Layout compacto: volta a float64 (exato ao centavo) antes de somar
+                supply[col] = supply[col].astype(np.float64).round(2)
+        return supply.groupby(keys, sort=False, observed=True).agg(
+            _total_km=('km', 'sum'),
+            _total_liters=('litros', 'sum'),
+            _supply_rows=('km', 'size')
+        )
+    
+    def abastecimento_sem_motorista(self, df_supply, df_drivers, keys=None):
+        """Linhas de abastecimento cujo grupo (placa, Date) não tem nenhum motorista (anti-join dos totais)"""
+        keys = keys or ['placa', 'Date']
+        supply_totals = self.agregar_abastecimento(df_supply, keys)
+        driver_groups = pd.MultiIndex.from_frame(df_drivers.loc[df_drivers['Date'].notna(), keys])
+        unmatched = supply_totals.index.difference(driver_groups)
+        if unmatched.empty:
+            return df_supply.iloc[0:0]
+        return df_supply[pd.MultiIndex.from_frame(df_supply[keys]).isin(unmatched)]
+    
+    def distribuir_por_placa_data_legado(self, df_drivers, df_supply):
+        """Distribuição original, grupo a grupo; mantida para comparação com o motor vetorizado"""
+        combinations = df_drivers[['placa', 'Date']].drop_duplicates()
+        # Otimizado: totais de abastecimento agregados uma vez, consulta em tempo constante por grupo
+        supply_totals = self.agregar_abastecimento(df_supply).to_dict('index')
+        results = []
+        total_combinations = len(combinations)
+        logging.info(f"Processing {total_combinations} combinations...")
+
+        for idx, row in combinations.iterrows():
+            plate = row['placa']
+            date = row['Date']
+
+            driver_group = df_drivers[(df_drivers['placa'] == plate) & (df_drivers['Date'] == date)].copy()
+            supply_totals_group = supply_totals.get((plate, date))
+
+            try:
+                driver_group['pegada'] = driver_group['pegada_dt']
+                driver_group['largada'] = driver_group['largada_dt']
+                
+                # Otimizado: verificação mais eficiente de tipos datetime
+                valid_times = driver_group['pegada'].notna() & driver_group['largada'].notna()
+                # Verificar se são datetime apenas se necessário (mais eficiente que apply em todos)
+                if not valid_times.all():
+                    valid_times = valid_times & (driver_group['pegada'].apply(lambda x: isinstance(x, datetime))) & \
+                                  (driver_group['largada'].apply(lambda x: isinstance(x, datetime)))
+                
+                if not valid_times.all():
+                    invalid_rows = driver_group[~valid_times]
+                    if not invalid_rows.empty:
+                        logging.debug(f"\n[LOG] Rows ignored due to invalid times for plate {plate} on {date}:")
+                        cols_to_display = [col for col in ['motorista', 'matricula', 'placa', 'dia', 'pegada', 'largada'] if col in invalid_rows.columns]
                         if cols_to_display:
-                            logging.warning(invalid_durations[cols_to_display].to_string())
-                        
-                except Exception as e:
-                    logging.error(f"\nError processing times for plate {plate} on {date}: {str(e)}")
+                            logging.debug(invalid_rows[cols_to_display].to_string())
+                    driver_group = driver_group[valid_times]
+                
+                if driver_group.empty:
                     continue
                 
-                total_km = supply_group['km'].sum() if 'km' in supply_group.columns else 0
-                total_liters = supply_group['litros'].sum() if 'litros' in supply_group.columns else 0
-
-                if not supply_group.empty and total_duration > 0:
-                    # Distribuição proporcional baseada na duração
-                    driver_group['km_distributed'] = (driver_group['duration'] / total_duration) * total_km
-                    driver_group['liters_distributed'] = (driver_group['duration'] / total_duration) * total_liters
-                    
-                    # Ajuste final para garantir que a soma bata exatamente com os totais
-                    km_distributed_sum = driver_group['km_distributed'].sum()
-                    liters_distributed_sum = driver_group['liters_distributed'].sum()
-                    
-                    # Ajuste km_distributed
-                    if abs(total_km - km_distributed_sum) > 0.01:
-                        diff_km = total_km - km_distributed_sum
-                        if km_distributed_sum > 0:
-                            # Ajuste proporcional
-                            proporcoes_km = driver_group['km_distributed'] / km_distributed_sum
-                            ajuste_km = proporcoes_km * diff_km
-                            driver_group['km_distributed'] += ajuste_km
-                            driver_group['km_distributed'] = driver_group['km_distributed'].round(2)
-                            
-                            # Ajuste final para garantir soma exata
-                            diff_final_km = total_km - driver_group['km_distributed'].sum()
-                            if abs(diff_final_km) > 0.01:
-                                idx_max = driver_group['km_distributed'].idxmax()
-                                driver_group.at[idx_max, 'km_distributed'] += diff_final_km
-                        else:
-                            # Se não há distribuição, distribuir igualmente
-                            driver_group['km_distributed'] = total_km / len(driver_group)
-                    
-                    # Ajuste liters_distributed
-                    if abs(total_liters - liters_distributed_sum) > 0.01:
-                        diff_liters = total_liters - liters_distributed_sum
-                        if liters_distributed_sum > 0:
-                            # Ajuste proporcional
-                            proporcoes_liters = driver_group['liters_distributed'] / liters_distributed_sum
-                            ajuste_liters = proporcoes_liters * diff_liters
-                            driver_group['liters_distributed'] += ajuste_liters
-                            driver_group['liters_distributed'] = driver_group['liters_distributed'].round(2)
-                            
-                            # Ajuste final para garantir soma exata
-                            diff_final_liters = total_liters - driver_group['liters_distributed'].sum()
-                            if abs(diff_final_liters) > 0.01:
-                                idx_max = driver_group['liters_distributed'].idxmax()
-                                driver_group.at[idx_max, 'liters_distributed'] += diff_final_liters
-                        else:
-                            # Se não há distribuição, distribuir igualmente
-                            driver_group['liters_distributed'] = total_liters / len(driver_group)
-                else:
-                    driver_group['km_distributed'] = 0
-                    driver_group['liters_distributed'] = 0
+                next_day_mask = driver_group['largada'] < driver_group['pegada']
+                driver_group.loc[next_day_mask, 'largada'] = \
+                    driver_group.loc[next_day_mask, 'largada'] + pd.Timedelta(days=1)
                 
-                results.append(driver_group)
-            
-            if not results:
-                logging.warning(f"[LOG] No valid results for {company}!")
-                return False
-            
-            df_final = pd.concat(results, ignore_index=True)
-            
-            for col in ['pegada', 'largada']:
-                if col in df_final.columns:
-                    df_final[col] = df_final[col].apply(
-                        lambda x: x.strftime('%d/%m/%Y %H:%M') if isinstance(x, datetime) and pd.notna(x) else str(x) if pd.notna(x) else '')
+                driver_group['duration'] = (driver_group['largada'] - driver_group['pegada']).dt.total_seconds() / 60
+                total_duration = driver_group['duration'].sum()
+                
+                invalid_durations = driver_group[driver_group['duration'] < 0]
+                if not invalid_durations.empty:
+                    logging.warning(f"\nATTENTION: Negative durations found for plate {plate} on {date}:")
+                    cols_to_display = [col for col in ['motorista', 'matricula', 'placa', 'Date', 'pegada', 'largada'] if col in invalid_durations.columns]
+                    if cols_to_display:
+                        logging.warning(invalid_durations[cols_to_display].to_string())
+                    
+            except Exception as e:
+                logging.error(f"\nError processing times for plate {plate} on {date}: {str(e)}")
+                continue
             
-            # Extrai mês e ano do month_year para uso no caminho de saída
-            month, year = month_year.split('_')
-            # Define o diretório de saída com base na empresa, ano e mês
-            output_folder_path = os.path.join(self.OUTPUT_BASE_DIR, 'Abst_Mot_Por_empresa', company, year, month.zfill(2))
-            os.makedirs(output_folder_path, exist_ok=True)
+            total_km = supply_totals_group['_total_km'] if supply_totals_group else 0
+            total_liters = supply_totals_group['_total_liters'] if supply_totals_group else 0
 
-            detailed_filename = f"Detalhado_{company}_{month_year}{self.version_suffix}.xlsx"
-            consolidated_filename = f"Abst_Mot_Por_empresa_{company}_{month_year}{self.version_suffix}.xlsx"
-            
-            detailed_filepath = os.path.join(output_folder_path, detailed_filename)
-            
-            # Verificar e corrigir distribuição antes de salvar
-            logging.info(f"🔍 Verificando qualidade da distribuição para {company} {month_year}...")
-            self.verificar_e_corrigir_distribuicao(df_final, supply_file, detailed_filepath)
-            
-            # Otimizado: engine explícito para melhor performance
-            df_final.to_excel(detailed_filepath, index=False, engine='openpyxl')
-            
-            self.create_consolidated_file(df_final, consolidated_filename, output_folder_path)
-            
-            total_time = tm.time() - start_time
-            logging.info(f"Processing finished in {total_time:.2f} seconds")
-            logging.info(f"Files generated:")
-            logging.info(f"- {detailed_filepath}")
-            logging.info(f"- {os.path.join(output_folder_path, consolidated_filename)}")
-            
-            return True
+            if supply_totals_group and total_duration > 0:
+                # Distribuição proporcional baseada na duração, exata ao centavo
+                driver_group['km_distributed'] = allocate_cents(driver_group['duration'], total_km)
+                driver_group['liters_distributed'] = allocate_cents(driver_group['duration'], total_liters)
+            else:
+                driver_group['km_distributed'] = 0
+                driver_group['liters_distributed'] = 0
             
-        except Exception as e:
-            logging.error(f"Error processing files for {company}: {str(e)}")
-            return False
+            results.append(driver_group)
+        
+        if not results:
+            return None
+        
+        return pd.concat(results, ignore_index=True)
     
     def verificar_e_corrigir_distribuicao(self, df_final, supply_file, detailed_filepath):
         """
@@ -578,7 +2150,7 @@ class CompanyProcessor:
         """
         try:
             # Carregar dados de abastecimento originais
-            df_supply = pd.read_excel(supply_file)
+            df_supply = read_supply_file(supply_file, self.OUTPUT_BASE_DIR)
             
             # Calcular totais originais
             total_km_original = df_supply['km'].sum() if 'km' in df_supply.columns else 0
@@ -598,34 +2170,16 @@ class CompanyProcessor:
             if abs(diff_km) > tolerancia or abs(diff_litros) > tolerancia:
                 logging.info(f"🔧 Corrigindo distribuição - Diferença KM: {diff_km:.2f}, Litros: {diff_litros:.2f}")
                 
-                # Correção km_distributed
+                # Correção km_distributed (redistribuição exata ao centavo, em uma passada)
                 if abs(diff_km) > tolerancia and total_km_distributed > 0:
-                    proporcoes_km = df_final['km_distributed'] / total_km_distributed
-                    ajuste_km = proporcoes_km * diff_km
-                    df_final['km_distributed'] += ajuste_km
-                    df_final['km_distributed'] = df_final['km_distributed'].round(2)
-                    
-                    # Ajuste final para garantir soma exata
+                    df_final['km_distributed'] = allocate_cents(df_final['km_distributed'], total_km_original)
                     diff_final_km = total_km_original - df_final['km_distributed'].sum()
-                    if abs(diff_final_km) > tolerancia:
-                        idx_max = df_final['km_distributed'].idxmax()
-                        df_final.at[idx_max, 'km_distributed'] += diff_final_km
-                    
                     logging.info(f"✅ KM corrigido - Diferença final: {diff_final_km:.2f}")
                 
                 # Correção liters_distributed
                 if abs(diff_litros) > tolerancia and total_litros_distributed > 0:
-                    proporcoes_litros = df_final['liters_distributed'] / total_litros_distributed
-                    ajuste_litros = proporcoes_litros * diff_litros
-                    df_final['liters_distributed'] += ajuste_litros
-                    df_final['liters_distributed'] = df_final['liters_distributed'].round(2)
-                    
-                    # Ajuste final para garantir soma exata
+                    df_final['liters_distributed'] = allocate_cents(df_final['liters_distributed'], total_litros_original)
                     diff_final_litros = total_litros_original - df_final['liters_distributed'].sum()
-                    if abs(diff_final_litros) > tolerancia:
-                        idx_max = df_final['liters_distributed'].idxmax()
-                        df_final.at[idx_max, 'liters_distributed'] += diff_final_litros
-                    
                     logging.info(f"✅ Litros corrigido - Diferença final: {diff_final_litros:.2f}")
                 
                 # Verificar se a correção funcionou
@@ -673,6 +2227,7 @@ class CompanyProcessor:
         consolidated_filepath = os.path.join(output_folder_path, filename)
         # Otimizado: engine explícito
         consolidated.to_excel(consolidated_filepath, index=False, engine='openpyxl')
+        store_period_artifact(consolidated_filepath, consolidated)
         
         return consolidated
 
@@ -714,46 +2269,36 @@ class RankingProcessor:
         self.TURNOS_DIR = os.path.join(base_dir, "Turnos_128")
         self.OUTPUT_BASE_DIR = output_base_dir # Novo diretório base para saída
         self.version_suffix = version_suffix
+        self.catalog = get_file_catalog(base_dir, output_base_dir)
         
     def find_available_companies(self):
         logging.info("Searching for available companies for Ranking_Por_Empresa...")
-        companies = set()
         
         if not os.path.exists(self.RANKING_DIR):
             logging.error(f"Ranking folder not found: {self.RANKING_DIR}")
             return []
-
-        for ranking_file in os.listdir(self.RANKING_DIR):
-            if ranking_file.startswith('Ranking_') and ranking_file.endswith('.xlsx'):
-                parts = ranking_file.replace('.xlsx', '').split('_')
-                if len(parts) >= 3:
-                    company = parts[1] if parts[1] != 'Consolidado' else parts[2]
-                    companies.add(company)
         
-        return sorted(list(companies))
+        return sorted({record['company'] for record in self.catalog.records('Ranking') if record.get('company')})
     
     def find_available_periods(self, company):
-        periods = set()
-        
         if not os.path.exists(self.RANKING_DIR):
             logging.error(f"Ranking folder not found: {self.RANKING_DIR}")
             return []
-
-        for ranking_file in os.listdir(self.RANKING_DIR):
-            if ranking_file.startswith(f'Ranking_{company}_') and ranking_file.endswith('.xlsx'):
-                parts = ranking_file.replace('.xlsx', '').split('_')
-                if len(parts) >= 4:
-                    month = parts[-2]
-                    year = parts[-1]
-                    periods.add(f"{month}_{year}")
         
-        return sorted(list(periods))
+        return sorted({f"{record['month']}_{record['year']}" for record in self.catalog.records('Ranking')
+                       if record.get('company') == company and record['year'] and not record['consolidated']})
     
-    def converter_formato_brasileiro(self, df, colunas):
-        for coluna in colunas:
-            if coluna in df.columns:
-                df[coluna] = pd.to_numeric(df[coluna].astype(str).str.replace(' , ', '.'), errors='coerce')
-        return df
+    def get_output_files(self, company, month_year):
+        """Arquivos que o relatório do período grava"""
+        month, year = month_year.split('_')
+        return [os.path.join(self.OUTPUT_BASE_DIR, 'Ranking_Por_Empresa', company, year, month.zfill(2),
+                             f'Ranking_Por_Empresa_{company}_{month}_{year}{self.version_suffix}.xlsx')]
+    
+    def get_input_files(self, company, month_year):
+        """Entradas lidas no processamento do período, como (caminho, esquema) para a leitura antecipada"""
+        month, year = month_year.split('_')
+        return [(os.path.join(self.RANKING_DIR, f"Ranking_{company}_{month}_{year}.xlsx"), 'ranking'),
+                (os.path.join(self.TURNOS_DIR, f"Turnos_128_{company}_{month}_{year}.xlsx"), MOST_DRIVEN_KIND)]
     
     def process_company_period(self, company, month_year):
         try:
@@ -774,38 +2319,21 @@ class RankingProcessor:
             
             logging.info(f"Processando {company} - {month_year}")
             
-            # Otimizado: engine explícito para melhor performance
-            df_ranking = pd.read_excel(os.path.join(self.RANKING_DIR, ranking_file), dtype=str, engine='openpyxl')
-            df_turnos = pd.read_excel(os.path.join(self.TURNOS_DIR, turnos_file), dtype=str, engine='openpyxl')
-            
-            df_turnos = self.converter_formato_brasileiro(df_turnos, ['km'])
-            if 'km/l' in df_ranking.columns:
-                df_ranking = self.converter_formato_brasileiro(df_ranking, ['km/l'])
-            if 'ponto acumulado' in df_ranking.columns:
-                df_ranking = self.converter_formato_brasileiro(df_ranking, ['ponto acumulado'])
-            if 'km' in df_ranking.columns:
-                df_ranking = self.converter_formato_brasileiro(df_ranking, ['km'])
+            # Otimizado: esquema de entrada, colunas e números (km, km/l, ponto acumulado) já convertidos na leitura
+            df_ranking = read_input_with_schema(os.path.join(self.RANKING_DIR, ranking_file), self.OUTPUT_BASE_DIR, 'ranking')
+            # Otimizado: turno, linha e veículo mais rodados num único resumo, compartilhado com o Ranking_Integração
+            mais_rodou = get_most_driven(os.path.join(self.TURNOS_DIR, turnos_file), self.OUTPUT_BASE_DIR)
 
             # Otimizado: usar função auxiliar vetorizada
             df_ranking['matricula'] = normalize_matricula(df_ranking['matricula'])
-            df_turnos['matricula'] = normalize_matricula(df_turnos['matricula'])
 
-            turno_mais_rodou = df_turnos.groupby(['matricula', 'turno'])['km'].sum().reset_index()
-            turno_mais_rodou = turno_mais_rodou.loc[turno_mais_rodou.groupby('matricula')['km'].idxmax()]
-            turno_mais_rodou = turno_mais_rodou[['matricula', 'turno']]
-            turno_mais_rodou.columns = ['matricula', 'Turno_Mais_Rodou']
+            turno_mais_rodou = select_most_driven(mais_rodou, 'turno', 'Turno_Mais_Rodou')
             
             # Verifica se a coluna 'nm_linha' existe, senão usa 'linha'
-            linha_col = 'nm_linha' if 'nm_linha' in df_turnos.columns else 'linha'
-            linha_mais_rodou = df_turnos.groupby(['matricula', linha_col])['km'].sum().reset_index()
-            linha_mais_rodou = linha_mais_rodou.loc[linha_mais_rodou.groupby('matricula')['km'].idxmax()]
-            linha_mais_rodou = linha_mais_rodou[['matricula', linha_col, 'km']]
-            linha_mais_rodou.columns = ['matricula', 'Linha_Mais_Rodou', 'KM_Linha']
+            linha_col = 'nm_linha' if 'nm_linha' in mais_rodou.attrs['dimensions'] else 'linha'
+            linha_mais_rodou = select_most_driven(mais_rodou, linha_col, 'Linha_Mais_Rodou', 'KM_Linha')
 
-            veiculo_mais_rodou = df_turnos.groupby(['matricula', 'placa'])['km'].sum().reset_index()
-            veiculo_mais_rodou = veiculo_mais_rodou.loc[veiculo_mais_rodou.groupby('matricula')['km'].idxmax()]
-            veiculo_mais_rodou = veiculo_mais_rodou[['matricula', 'placa', 'km']]
-            veiculo_mais_rodou.columns = ['matricula', 'Veiculo_Mais_Rodou', 'KM_Veiculo']
+            veiculo_mais_rodou = select_most_driven(mais_rodou, 'placa', 'Veiculo_Mais_Rodou', 'KM_Veiculo')
 
             df_final = df_ranking.merge(turno_mais_rodou, on='matricula', how='left')
             df_final = df_final.merge(linha_mais_rodou, on='matricula', how='left')
@@ -832,24 +2360,21 @@ class RankingProcessor:
     def create_report(self, df_final, company, month_year):
         try:
             month, year = month_year.split('_')
-            output_folder_path = os.path.join(self.OUTPUT_BASE_DIR, 'Ranking_Por_Empresa', company, year, month.zfill(2))
-            os.makedirs(output_folder_path, exist_ok=True)
-            output_file = os.path.join(output_folder_path, f'Ranking_Por_Empresa_{company}_{month}_{year}{self.version_suffix}.xlsx')
+            output_file = self.get_output_files(company, month_year)[0]
+            os.makedirs(os.path.dirname(output_file), exist_ok=True)
             # Caminho do arquivo Abst_Mot_Por_empresa
             abst_mot_file = os.path.join(self.OUTPUT_BASE_DIR, 'Abst_Mot_Por_empresa', company, year, month.zfill(2), f"Abst_Mot_Por_empresa_{company}_{month}_{year}{self.version_suffix}.xlsx")
             # Caminho do arquivo Consolidado do Ranking_Km_Proporcional
             consolidado_km_prop_file = os.path.join(self.OUTPUT_BASE_DIR, 'Rankig_Km_Proporcional', company, year, month.zfill(2), f'Consolidado_{company}_{month}_{year}{self.version_suffix}.xlsx')
-            # Carregar dados de Abst_Mot_Por_empresa se existir
+            # Carregar dados de Abst_Mot_Por_empresa se existir (cache de consolidados do período)
             df_abst_mot = None
             if os.path.exists(abst_mot_file):
-                df_abst_mot = pd.read_excel(abst_mot_file, engine='openpyxl')
-                df_abst_mot['matricula'] = normalize_matricula(df_abst_mot['matricula'])
+                df_abst_mot = load_period_artifact(abst_mot_file)
             # Carregar dados do consolidado do Ranking_Km_Proporcional se existir
             df_km_prop = None
             if os.path.exists(consolidado_km_prop_file):
-                df_km_prop = pd.read_excel(consolidado_km_prop_file, engine='openpyxl')
-                df_km_prop['matricula'] = normalize_matricula(df_km_prop['matricula'])
-            # Função para adicionar e formatar colunas em cada aba
+                df_km_prop = load_period_artifact(consolidado_km_prop_file)
+            # Função para adicionar e formatar colunas (aplicada uma vez ao ranking inteiro)
             def add_and_format_columns(df_sheet):
                 df_sheet['matricula'] = normalize_matricula(df_sheet['matricula'])
                 # Merge com Abst_Mot_Por_empresa
@@ -896,36 +2421,8 @@ class RankingProcessor:
                     df_sheet = df_sheet[colunas]
                 return df_sheet
             
-            # Verificar se o arquivo está em uso e tentar alternativas
-            max_attempts = 10
-            original_output_file = output_file
-            
-            for attempt in range(max_attempts):
-                try:
-                    # Verificar se o arquivo está em uso
-                    if is_file_in_use(output_file):
-                        if attempt < max_attempts - 1:
-                            output_file = get_alternative_filename(original_output_file, attempt + 1)
-                            logging.warning(f"Tentativa {attempt + 1}/{max_attempts}: Arquivo {original_output_file} está em uso. Tentando: {output_file}")
-                            tm.sleep(1)
-                            continue
-                        else:
-                            raise PermissionError(f"Arquivo {original_output_file} está em uso após {max_attempts} tentativas.")
-                    
-                    # Se chegou aqui, o arquivo não está em uso
-                    break
-                    
-                except PermissionError as e:
-                    if attempt < max_attempts - 1:
-                        output_file = get_alternative_filename(original_output_file, attempt + 1)
-                        logging.warning(f"Tentativa {attempt + 1}/{max_attempts}: Erro de permissão. Tentando: {output_file}")
-                        tm.sleep(2)
-                    else:
-                        logging.error(f"Erro de permissão após {max_attempts} tentativas: {str(e)}")
-                        raise Exception(f"Não foi possível criar o arquivo. Verifique se o arquivo está aberto no Excel: {original_output_file}")
-            
             logging.info(f"Criando relatório: {output_file}")
-            with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+            with AtomicOutputFile(output_file) as output, pd.ExcelWriter(output.temp_path, engine='openpyxl') as writer:
                 # Todas as abas a serem criadas
                 abas = {}
                 # Aba principal
@@ -933,190 +2430,56 @@ class RankingProcessor:
                     by=['Linha_Mais_Rodou', 'Turno_Mais_Rodou', 'km/l', 'motorista'],
                     ascending=[True, True, False, True]
                 )
-                abas['Todos'] = add_and_format_columns(df_ordenado)
+                # Otimizado: merges e reordenação de colunas feitos uma única vez no ranking inteiro; cada aba é
+                # uma seleção de linhas (por posição em df_ordenado) do frame enriquecido
+                df_ordenado = df_ordenado.reset_index(drop=True)
+                enriquecido = add_and_format_columns(df_ordenado.assign(_posicao=np.arange(len(df_ordenado))))
+                enriquecido = enriquecido.set_index('_posicao')
+                def selecionar(posicoes):
+                    return enriquecido.loc[posicoes].reset_index(drop=True)
+                abas['Todos'] = enriquecido.reset_index(drop=True)
                 # Superior_Mediano
-                abas['Superior_Mediano'] = add_and_format_columns(
-                    df_ordenado[(df_ordenado['status'].isin(['Superior', 'Mediano'])) & (df_ordenado['km'] >= 1000)]
+                abas['Superior_Mediano'] = selecionar(
+                    df_ordenado.index[(df_ordenado['status'].isin(['Superior', 'Mediano'])) & (df_ordenado['km'] >= 1000)]
                 )
                 # Insuficiente
-                abas['Insuficiente'] = add_and_format_columns(df_ordenado[df_ordenado['status'] == 'Insuficiente'])
+                abas['Insuficiente'] = selecionar(df_ordenado.index[df_ordenado['status'] == 'Insuficiente'])
                 # Pontuacao_Baixa
-                abas['Pontuacao_Baixa'] = add_and_format_columns(df_ordenado[df_ordenado['ponto acumulado'] <= 2])
+                abas['Pontuacao_Baixa'] = selecionar(df_ordenado.index[df_ordenado['ponto acumulado'] <= 2])
                 # Abas por linha
-                for linha in df_ordenado['Linha_Mais_Rodou'].unique():
-                    if pd.notna(linha):
-                        df_linha = df_ordenado[
-                            (df_ordenado['Linha_Mais_Rodou'] == linha) &
-                            (df_ordenado['status'] != 'Insuficiente') &
-                            (df_ordenado['km'] >= 1000) &
-                            (df_ordenado['Turno_Mais_Rodou'].isin(['Manha', 'Manhã', 'Tarde']))
-                        ].copy()
-                        if not df_linha.empty:
-                            sheet_name = f'Linha_{linha}'[:31]
-                            df_manha = df_linha[df_linha['Turno_Mais_Rodou'].isin(['Manha', 'Manhã'])].copy()
-                            df_tarde = df_linha[df_linha['Turno_Mais_Rodou'] == 'Tarde'].copy()
-                            frames = []
-                            if not df_manha.empty:
-                                frames.append(df_manha)
-                            if not df_manha.empty and not df_tarde.empty:
-                                linha_branca = pd.DataFrame([[''] * len(df_linha.columns)], columns=df_linha.columns)
-                                frames.append(linha_branca)
-                                header_df = pd.DataFrame([df_linha.columns], columns=df_linha.columns)
-                                frames.append(header_df)
-                            if not df_tarde.empty:
-                                frames.append(df_tarde)
-                            if frames:
-                                df_final_linha = pd.concat(frames, ignore_index=True)
-                                abas[sheet_name] = add_and_format_columns(df_final_linha)
+                # Otimizado: linhas elegíveis particionadas uma única vez por (linha, Manhã/Tarde), em vez de
+                # filtrar df_ordenado inteiro para cada linha
+                elegiveis = df_ordenado[
+                    df_ordenado['Linha_Mais_Rodou'].notna() &
+                    (df_ordenado['status'] != 'Insuficiente') &
+                    (df_ordenado['km'] >= 1000) &
+                    (df_ordenado['Turno_Mais_Rodou'].isin(['Manha', 'Manhã', 'Tarde']))
+                ]
+                periodo = pd.Series(np.where(elegiveis['Turno_Mais_Rodou'] == 'Tarde', 'Tarde', 'Manha'), index=elegiveis.index)
+                partes = dict(iter(elegiveis.groupby([elegiveis['Linha_Mais_Rodou'], periodo], sort=False)))
+                # Linha em branco e cabeçalho repetido entre Manhã e Tarde, enriquecidos como as demais linhas
+                separadores = add_and_format_columns(
+                    pd.DataFrame([[''] * len(df_ordenado.columns), list(df_ordenado.columns)], columns=df_ordenado.columns)
+                )
+                for linha in elegiveis['Linha_Mais_Rodou'].unique():
+                    sheet_name = f'Linha_{linha}'[:31]
+                    df_manha = partes.get((linha, 'Manha'))
+                    df_tarde = partes.get((linha, 'Tarde'))
+                    frames = []
+                    if df_manha is not None:
+                        frames.append(selecionar(df_manha.index))
+                    if df_manha is not None and df_tarde is not None:
+                        frames.append(separadores)
+                    if df_tarde is not None:
+                        frames.append(selecionar(df_tarde.index))
+                    abas[sheet_name] = pd.concat(frames, ignore_index=True)
                 # Escrever todas as abas
                 for nome_aba, df_aba in abas.items():
                     df_aba.to_excel(writer, sheet_name=nome_aba, index=False, header=True)
-                # Aplicar formatação condicional em todas as abas
+                # Formatação condicional nativa do Excel: custo constante por aba, sem percorrer as células
                 for nome_aba in abas.keys():
-                    worksheet = writer.sheets[nome_aba]
-                    header = [cell.value for cell in next(worksheet.iter_rows(min_row=1, max_row=1))]
-                    def idx(col):
-                        try:
-                            return header.index(col)
-                        except ValueError:
-                            return None
-                    idx_km = idx('km')
-                    idx_dias = idx('dias')
-                    idx_fase = idx('fase')
-                    idx_status = idx('status')
-                    idx_ponto = idx('ponto acumulado')
-                    idx_km_veiculo = idx('KM_Veiculo')
-                    idx_km_distributed = idx('km_distributed')
-                    idx_total_km = idx('total_km')
-                    idx_km = idx('km')
-                    idx_days_worked = idx('days_worked')
-                    idx_giro = idx('giro')
-                    idx_freio = idx('freio')
-                    idx_pedal = idx('pedal')
-                    # Estilos
-                    vermelho_fill = PatternFill(start_color='FF0000', end_color='FF0000', fill_type='solid')
-                    branco_bold = Font(color='FFFFFF', bold=True)
-                    amarelo_claro = PatternFill(start_color='FFFFE0', end_color='FFFFE0', fill_type='solid')
-                    preto_negrito = Font(color='000000', bold=True)
-                    verde_claro = PatternFill(start_color='90EE90', end_color='90EE90', fill_type='solid')
-                    verde = PatternFill(start_color='00FF00', end_color='00FF00', fill_type='solid')
-                    azul = PatternFill(start_color='ADD8E6', end_color='ADD8E6', fill_type='solid')
-                    azul_escuro_negrito = Font(color='000080', bold=True)
-                    amarelo = PatternFill(start_color='FFFF00', end_color='FFFF00', fill_type='solid')
-                    vermelho = Font(color='FF0000', bold=True)
-                    # Medium border for header
-                    medium_border = Border(left=Side(style='medium', color='000000'),
-                                          right=Side(style='medium', color='000000'),
-                                          top=Side(style='medium', color='000000'),
-                                          bottom=Side(style='medium', color='000000'))
-                    thin_border = Border(left=Side(style='thin', color='000000'),
-                                        right=Side(style='thin', color='000000'),
-                                        top=Side(style='thin', color='000000'),
-                                        bottom=Side(style='thin', color='000000'))
-                    # 2. Header formatting
-                    header_targets = [
-                        'matricula', 'motorista', 'km/l', 'Litros', 'giro', 'freio', 'pedal', 'fase', 'km', 'fechamento',
-                        'ponto acumulado', 'status', 'empresa', 'dias', 'Turno_Mais_Rodou', 'Linha_Mais_Rodou', 'KM_Linha',
-                        'Veiculo_Mais_Rodou', 'KM_Veiculo', 'total_km', 'total_liters', 'Km/l_Int.', 'days_worked',
-                        'km_distributed', 'liters_distributed', 'Km/l_Média'
-                    ]
-                    for col_idx, cell in enumerate(next(worksheet.iter_rows(min_row=1, max_row=1))):
-                        if header[col_idx] in header_targets:
-                            cell.font = Font(bold=True)
-                            cell.border = medium_border
-                        else:
-                            cell.border = thin_border
-                    # 1, 3, 4, 5. Row formatting
-                    for row in worksheet.iter_rows(min_row=2, max_row=worksheet.max_row):
-                        # 1. km, total_km, km_distributed < 900 (REMOVED KM_Veiculo)
-                        for idx_col in [idx_km, idx_total_km, idx_km_distributed]:
-                            if idx_col is not None and row[idx_col].value is not None:
-                                try:
-                                    val = float(str(row[idx_col].value).replace(',', '.'))
-                                    if val < 900:
-                                        cell = row[idx_col]
-                                        cell.fill = vermelho_fill
-                                        cell.font = branco_bold
-                                except (ValueError, TypeError):
-                                    pass
-                        # 3. days_worked
-                        if idx_days_worked is not None and row[idx_days_worked].value is not None:
-                            try:
-                                dias_val = int(float(str(row[idx_days_worked].value).replace(',', '.')))
-                                cell = row[idx_days_worked]
-                                if dias_val == 0:
-                                    cell.fill = vermelho_fill
-                                    cell.font = branco_bold
-                                elif 1 <= dias_val <= 10:
-                                    cell.fill = amarelo_claro
-                                    cell.font = preto_negrito
-                                elif 11 <= dias_val <= 15:
-                                    cell.fill = verde_claro
-                                    cell.font = preto_negrito
-                                elif 16 <= dias_val <= 20:
-                                    cell.fill = verde
-                                    cell.font = preto_negrito
-                                elif 21 <= dias_val <= 31:
-                                    cell.fill = azul
-                                    cell.font = azul_escuro_negrito
-                            except (ValueError, TypeError):
-                                pass
-                        # 4. giro and freio >= 8
-                        for idx_col in [idx_giro, idx_freio]:
-                            if idx_col is not None and row[idx_col].value is not None:
-                                try:
-                                    val = float(str(row[idx_col].value).replace(',', '.'))
-                                    if val >= 8:
-                                        cell = row[idx_col]
-                                        cell.font = vermelho
-                                except (ValueError, TypeError):
-                                    pass
-                        # 5. pedal >= 16
-                        if idx_pedal is not None and row[idx_pedal].value is not None:
-                            try:
-                                val = float(str(row[idx_pedal].value).replace(',', '.'))
-                                if val >= 16:
-                                    cell = row[idx_pedal]
-                                    cell.font = vermelho
-                            except (ValueError, TypeError):
-                                pass
-                        # ponto acumulado (condicional)
-                        if idx_ponto is not None and idx_fase is not None and idx_status is not None and row[idx_ponto].value is not None:
-                            try:
-                                fase = row[idx_fase].value
-                                status = row[idx_status].value
-                                ponto = float(str(row[idx_ponto].value).replace(',', '.'))
-                                if fase in ['Ouro', 'Ouro C'] and status == 'Mediano' and 3.97 <= ponto <= 3.99:
-                                    cell = row[idx_ponto]
-                                    cell.fill = amarelo
-                                    cell.font = vermelho
-                            except (ValueError, TypeError):
-                                pass
-                        # Bordas para todas as células da linha
-                        for cell in row:
-                            cell.border = thin_border
-                        # dias column formatting (reapplied)
-                        if idx_dias is not None and row[idx_dias].value is not None:
-                            try:
-                                dias_val = int(float(str(row[idx_dias].value).replace(',', '.')))
-                                cell = row[idx_dias]
-                                if dias_val == 0:
-                                    cell.fill = vermelho_fill
-                                    cell.font = branco_bold
-                                elif 1 <= dias_val <= 10:
-                                    cell.fill = amarelo_claro
-                                    cell.font = preto_negrito
-                                elif 11 <= dias_val <= 15:
-                                    cell.fill = verde_claro
-                                    cell.font = preto_negrito
-                                elif 16 <= dias_val <= 20:
-                                    cell.fill = verde
-                                    cell.font = preto_negrito
-                                elif 21 <= dias_val <= 31:
-                                    cell.fill = azul
-                                    cell.font = azul_escuro_negrito
-                            except (ValueError, TypeError):
-                                pass
+                    self.aplicar_formatacao_ranking(writer.sheets[nome_aba])
+            output_file = output.path
             logging.info(f"Relatório gerado com sucesso: {output_file}")
             return output_file
         except PermissionError as e:
@@ -1141,6 +2504,96 @@ class RankingProcessor:
             logging.error(f"Traceback completo: {traceback.format_exc()}")
             return None
 
+
+    def aplicar_formatacao_ranking(self, worksheet):
+        """
+        Cabeçalho formatado célula a célula (uma linha); as regras das linhas de dados (km < 900, faixas de
+        dias/days_worked, giro/freio >= 8, pedal >= 16, Ouro/Mediano com ponto entre 3,97 e 3,99 e bordas finas)
+        viram regras de formatação condicional por coluna, avaliadas pelo Excel.
+        """
+        header = [cell.value for cell in next(worksheet.iter_rows(min_row=1, max_row=1))]
+        def col(name):
+            return get_column_letter(header.index(name) + 1) if name in header else None
+        
+        # Estilos
+        vermelho_fill = PatternFill(start_color='FF0000', end_color='FF0000', fill_type='solid')
+        branco_bold = Font(color='FFFFFF', bold=True)
+        amarelo_claro = PatternFill(start_color='FFFFE0', end_color='FFFFE0', fill_type='solid')
+        preto_negrito = Font(color='000000', bold=True)
+        verde_claro = PatternFill(start_color='90EE90', end_color='90EE90', fill_type='solid')
+        verde = PatternFill(start_color='00FF00', end_color='00FF00', fill_type='solid')
+        azul = PatternFill(start_color='ADD8E6', end_color='ADD8E6', fill_type='solid')
+        azul_escuro_negrito = Font(color='000080', bold=True)
+        amarelo = PatternFill(start_color='FFFF00', end_color='FFFF00', fill_type='solid')
+        vermelho = Font(color='FF0000', bold=True)
+        # Medium border for header
+        medium_border = Border(left=Side(style='medium', color='000000'),
+                              right=Side(style='medium', color='000000'),
+                              top=Side(style='medium', color='000000'),
+                              bottom=Side(style='medium', color='000000'))
+        thin_border = Border(left=Side(style='thin', color='000000'),
+                            right=Side(style='thin', color='000000'),
+                            top=Side(style='thin', color='000000'),
+                            bottom=Side(style='thin', color='000000'))
+        # Header formatting
+        header_targets = [
+            'matricula', 'motorista', 'km/l', 'Litros', 'giro', 'freio', 'pedal', 'fase', 'km', 'fechamento',
+            'ponto acumulado', 'status', 'empresa', 'dias', 'Turno_Mais_Rodou', 'Linha_Mais_Rodou', 'KM_Linha',
+            'Veiculo_Mais_Rodou', 'KM_Veiculo', 'total_km', 'total_liters', 'Km/l_Int.', 'days_worked',
+            'km_distributed', 'liters_distributed', 'Km/l_Média'
+        ]
+        for col_idx, cell in enumerate(next(worksheet.iter_rows(min_row=1, max_row=1))):
+            if header[col_idx] in header_targets:
+                cell.font = Font(bold=True)
+                cell.border = medium_border
+            else:
+                cell.border = thin_border
+        
+        last_row = worksheet.max_row
+        if last_row < 2:
+            return
+        
+        def add_rule(letter, condition, fill=None, font=None):
+            # Toda regra leva a borda fina: leitores que aplicam só a primeira regra verdadeira mantêm a borda
+            worksheet.conditional_formatting.add(
+                f'{letter}2:{letter}{last_row}',
+                FormulaRule(formula=[condition(f'{letter}2')], fill=fill, font=font, border=thin_border))
+        
+        # 1. km, total_km, km_distributed < 900 (REMOVED KM_Veiculo)
+        for name in ['km', 'total_km', 'km_distributed']:
+            if col(name):
+                add_rule(col(name), lambda ref: excel_number_condition(ref, '{} < 900'), vermelho_fill, branco_bold)
+        # 3. days_worked e dias: faixas pela parte inteira
+        bandas_dias = [
+            ('TRUNC({0}) = 0', vermelho_fill, branco_bold),
+            ('AND(TRUNC({0}) >= 1, TRUNC({0}) <= 10)', amarelo_claro, preto_negrito),
+            ('AND(TRUNC({0}) >= 11, TRUNC({0}) <= 15)', verde_claro, preto_negrito),
+            ('AND(TRUNC({0}) >= 16, TRUNC({0}) <= 20)', verde, preto_negrito),
+            ('AND(TRUNC({0}) >= 21, TRUNC({0}) <= 31)', azul, azul_escuro_negrito),
+        ]
+        for name in ['days_worked', 'dias']:
+            if col(name):
+                for test, fill, font in bandas_dias:
+                    add_rule(col(name), lambda ref, test=test: excel_number_condition(ref, test), fill, font)
+        # 4. giro and freio >= 8
+        for name in ['giro', 'freio']:
+            if col(name):
+                add_rule(col(name), lambda ref: excel_number_condition(ref, '{} >= 8'), font=vermelho)
+        # 5. pedal >= 16
+        if col('pedal'):
+            add_rule(col('pedal'), lambda ref: excel_number_condition(ref, '{} >= 16'), font=vermelho)
+        # ponto acumulado (condicional): Ouro/Ouro C Mediano entre 3,97 e 3,99
+        if col('ponto acumulado') and col('fase') and col('status'):
+            fase, status = f"${col('fase')}2", f"${col('status')}2"
+            add_rule(col('ponto acumulado'),
+                     lambda ref: f'AND(OR(EXACT({fase}, "Ouro"), EXACT({fase}, "Ouro C")), EXACT({status}, "Mediano"), '
+                                 + excel_number_condition(ref, 'AND({0} >= 3.97, {0} <= 3.99)') + ')',
+                     amarelo, vermelho)
+        # Bordas para todas as células das linhas de dados
+        worksheet.conditional_formatting.add(
+            f'A2:{get_column_letter(worksheet.max_column)}{last_row}',
+            FormulaRule(formula=['TRUE'], border=thin_border))
+
 class RankingIntegracaoProcessor:
     def __init__(self, base_dir, output_base_dir, version_suffix=""):
         self.BASE_DIR = base_dir
@@ -1148,48 +2601,37 @@ class RankingIntegracaoProcessor:
         self.TURNOS_DIR = os.path.join(base_dir, "Turnos_128")
         self.OUTPUT_BASE_DIR = output_base_dir # Novo diretório base para saída
         self.version_suffix = version_suffix
+        self.catalog = get_file_catalog(base_dir, output_base_dir)
 
     def find_available_companies(self):
         logging.info("Searching for available companies for Ranking_Integração...")
-        companies = set()
-        
+    
         # Busca empresas nos arquivos de Ranking
-        if os.path.exists(self.RANKING_DIR):
-            for ranking_file in os.listdir(self.RANKING_DIR):
-                if ranking_file.startswith('Ranking_') and ranking_file.endswith('.xlsx'):
-                    parts = ranking_file.replace('.xlsx', '').split('_')
-                    if len(parts) >= 3:
-                        company = parts[1] if parts[1] != 'Consolidado' else parts[2]
-                        companies.add(company)
-        
-        return sorted(list(companies))
+        return sorted({record['company'] for record in self.catalog.records('Ranking') if record.get('company')})
 
     def find_available_periods(self, company):
-        periods = set()
-        
         if not os.path.exists(self.RANKING_DIR):
             logging.error(f"Ranking folder not found: {self.RANKING_DIR}")
             return []
+    
+        return sorted({f"{record['month']}_{record['year']}" for record in self.catalog.records('Ranking')
+                       if record.get('company') == company and record['year'] and not record['consolidated']})
 
-        for ranking_file in os.listdir(self.RANKING_DIR):
-            if ranking_file.startswith(f'Ranking_{company}_') and ranking_file.endswith('.xlsx'):
-                parts = ranking_file.replace('.xlsx', '').split('_')
-                if len(parts) >= 4:
-                    month = parts[-2]
-                    year = parts[-1]
-                    periods.add(f"{month}_{year}")
-        
-        return sorted(list(periods))
+    def get_output_files(self, company, month_year):
+        """Arquivos que o relatório do período grava"""
+        month, year = month_year.split('_')
+        return [os.path.join(self.OUTPUT_BASE_DIR, 'Ranking_Integração', company, year, month.zfill(2),
+                             f'Ranking_Integração_{company}_{month}_{year}{self.version_suffix}.xlsx')]
 
-    def converter_formato_brasileiro(self, df, colunas):
-        for coluna in colunas:
-            if coluna in df.columns:
-                df[coluna] = pd.to_numeric(df[coluna].astype(str).str.replace(' , ', '.'), errors='coerce')
-        return df
+    def get_input_files(self, company, month_year):
+        """Entradas lidas no processamento do período, como (caminho, esquema) para a leitura antecipada"""
+        month, year = month_year.split('_')
+        return [(os.path.join(self.RANKING_DIR, f"Ranking_{company}_{month}_{year}.xlsx"), 'ranking'),
+                (os.path.join(self.TURNOS_DIR, f"Turnos_128_{company}_{month}_{year}.xlsx"), MOST_DRIVEN_KIND)]
 
-    def encontrar_coluna_linha(self, df):
+    def encontrar_coluna_linha(self, columns):
         for nome in ['linha', 'nm_linha', 'nome_linha', 'linha_nome']:
-            if nome in df.columns:
+            if nome in columns:
                 return nome
         return None
 
@@ -1219,42 +2661,24 @@ class RankingIntegracaoProcessor:
                 raise FileNotFoundError(f"Arquivo de turnos não encontrado: {turnos_file}")
 
             # Carregar arquivos principais
-            # Otimizado: engine explícito para melhor performance
-            df_ranking = pd.read_excel(os.path.join(self.RANKING_DIR, ranking_file), dtype=str, engine='openpyxl')
-            df_turnos = pd.read_excel(os.path.join(self.TURNOS_DIR, turnos_file), dtype=str, engine='openpyxl')
+            # Otimizado: esquema de entrada, colunas e números (km, km/l, ponto acumulado) já convertidos na leitura
+            df_ranking = read_input_with_schema(os.path.join(self.RANKING_DIR, ranking_file), self.OUTPUT_BASE_DIR, 'ranking')
+            # Otimizado: resumo "mais rodou" compartilhado com o Ranking (os turnos são reduzidos uma única vez)
+            mais_rodou = get_most_driven(os.path.join(self.TURNOS_DIR, turnos_file), self.OUTPUT_BASE_DIR)
 
             # Padronizar campo matricula
             # Otimizado: usar função auxiliar vetorizada
             df_ranking['matricula'] = normalize_matricula(df_ranking['matricula'])
-            df_turnos['matricula'] = normalize_matricula(df_turnos['matricula'])
-
-            # Converter colunas numéricas
-            df_turnos = self.converter_formato_brasileiro(df_turnos, ['km'])
-            if 'km/l' in df_ranking.columns:
-                df_ranking = self.converter_formato_brasileiro(df_ranking, ['km/l'])
-            if 'ponto acumulado' in df_ranking.columns:
-                df_ranking = self.converter_formato_brasileiro(df_ranking, ['ponto acumulado'])
-            if 'km' in df_ranking.columns:
-                df_ranking = self.converter_formato_brasileiro(df_ranking, ['km'])
 
             # Agrupamentos baseados no script de referência
-            turno_mais_rodou = df_turnos.groupby(['matricula', 'turno'])['km'].sum().reset_index()
-            turno_mais_rodou = turno_mais_rodou.loc[turno_mais_rodou.groupby('matricula')['km'].idxmax()]
-            turno_mais_rodou = turno_mais_rodou[['matricula', 'turno']]
-            turno_mais_rodou.columns = ['matricula', 'Turno_Mais_Rodou']
+            turno_mais_rodou = select_most_driven(mais_rodou, 'turno', 'Turno_Mais_Rodou')
 
-            col_linha_turnos = self.encontrar_coluna_linha(df_turnos)
+            col_linha_turnos = self.encontrar_coluna_linha(mais_rodou.attrs['dimensions'])
             if not col_linha_turnos:
                 raise Exception('Nenhuma coluna de linha encontrada em df_turnos!')
-            linha_mais_rodou = df_turnos.groupby(['matricula', col_linha_turnos])['km'].sum().reset_index()
-            linha_mais_rodou = linha_mais_rodou.loc[linha_mais_rodou.groupby('matricula')['km'].idxmax()]
-            linha_mais_rodou = linha_mais_rodou[['matricula', col_linha_turnos, 'km']]
-            linha_mais_rodou.columns = ['matricula', 'Linha_Mais_Rodou', 'KM_Linha']
+            linha_mais_rodou = select_most_driven(mais_rodou, col_linha_turnos, 'Linha_Mais_Rodou', 'KM_Linha')
 
-            veiculo_mais_rodou = df_turnos.groupby(['matricula', 'placa'])['km'].sum().reset_index()
-            veiculo_mais_rodou = veiculo_mais_rodou.loc[veiculo_mais_rodou.groupby('matricula')['km'].idxmax()]
-            veiculo_mais_rodou = veiculo_mais_rodou[['matricula', 'placa', 'km']]
-            veiculo_mais_rodou.columns = ['matricula', 'Veiculo_Mais_Rodou', 'KM_Veiculo']
+            veiculo_mais_rodou = select_most_driven(mais_rodou, 'placa', 'Veiculo_Mais_Rodou', 'KM_Veiculo')
 
             # Merge principal
             df_final = df_ranking.merge(turno_mais_rodou, on='matricula', how='left')
@@ -1276,8 +2700,7 @@ class RankingIntegracaoProcessor:
 
             # Adicionar informações de Abst_Mot_Por_empresa
             if os.path.exists(abst_mot_file):
-                df_abst_mot = pd.read_excel(abst_mot_file, engine='openpyxl')
-                df_abst_mot['matricula'] = normalize_matricula(df_abst_mot['matricula'])
+                df_abst_mot = load_period_artifact(abst_mot_file)
                 # Adicionar as colunas total_km, total_liters, days_worked
                 cols_to_merge = ['matricula']
                 if 'total_km' in df_abst_mot.columns:
@@ -1323,30 +2746,11 @@ class RankingIntegracaoProcessor:
     
     def create_report(self, df_final, company, month_year):
         try:
-            month, year = month_year.split('_')
-            output_folder_path = os.path.join(self.OUTPUT_BASE_DIR, 'Ranking_Integração', company, year, month.zfill(2))
-            os.makedirs(output_folder_path, exist_ok=True)
-            output_file = os.path.join(output_folder_path, f'Ranking_Integração_{company}_{month}_{year}{self.version_suffix}.xlsx')
+            output_file = self.get_output_files(company, month_year)[0]
+            os.makedirs(os.path.dirname(output_file), exist_ok=True)
             logging.info(f"Iniciando criação do relatório: {output_file}")
-            # Verificar se o arquivo está em uso e tentar alternativas
-            max_attempts = 5
-            for attempt in range(max_attempts):
-                try:
-                    if os.path.exists(output_file):
-                        with open(output_file, 'r+b') as f:
-                            pass
-                    break
-                except PermissionError:
-                    if attempt < max_attempts - 1:
-                        logging.warning(f"Tentativa {attempt + 1}/{max_attempts}: Arquivo {output_file} está em uso. Aguardando...")
-                        tm.sleep(2)
-                        base_name = output_file.replace('.xlsx', '')
-                        output_file = f"{base_name}_{attempt + 1}.xlsx"
-                    else:
-                        logging.error(f"Arquivo {output_file} está em uso após {max_attempts} tentativas. Verifique se o arquivo está aberto no Excel.")
-                        raise Exception(f"Arquivo em uso: {output_file}. Feche o arquivo no Excel e tente novamente.")
             logging.info(f"Criando relatório: {output_file}")
-            with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+            with AtomicOutputFile(output_file) as output, pd.ExcelWriter(output.temp_path, engine='openpyxl') as writer:
                 df_ordenado = df_final.sort_values(
                     by=['Linha_Mais_Rodou', 'Turno_Mais_Rodou', 'km/l', 'motorista'],
                     ascending=[True, True, False, True]
@@ -1454,8 +2858,9 @@ class RankingIntegracaoProcessor:
                         except (ValueError, TypeError):
                             continue
                 logging.info(f"Formatação aplicada em {formatted_count} células")
-                logging.info(f"Relatório gerado com sucesso: {output_file}")
-                return output_file
+            output_file = output.path
+            logging.info(f"Relatório gerado com sucesso: {output_file}")
+            return output_file
         except Exception as e:
             logging.error(f"Erro ao criar relatório: {str(e)}")
             logging.error(f"Traceback completo: {traceback.format_exc()}")
@@ -1466,62 +2871,38 @@ class RankingOuroMedianoProcessor:
         self.BASE_DIR = base_dir
         self.OUTPUT_BASE_DIR = output_base_dir
         self.version_suffix = version_suffix
+        self.catalog = get_file_catalog(base_dir, output_base_dir)
         
     def find_available_companies(self):
         """Encontra empresas que têm relatórios Ranking_Por_Empresa gerados"""
         logging.info("Procurando empresas com relatórios Ranking_Por_Empresa para consolidação Ouro Mediano...")
-        companies = set()
         
         ranking_por_empresa_dir = os.path.join(self.OUTPUT_BASE_DIR, 'Ranking_Por_Empresa')
         if not os.path.exists(ranking_por_empresa_dir):
             logging.warning(f"Diretório Ranking_Por_Empresa não encontrado: {ranking_por_empresa_dir}")
             return []
         
-        for company_dir in os.listdir(ranking_por_empresa_dir):
-            company_path = os.path.join(ranking_por_empresa_dir, company_dir)
-            if os.path.isdir(company_path):
-                # Verificar se há arquivos de relatório nesta empresa
-                for year_dir in os.listdir(company_path):
-                    year_path = os.path.join(company_path, year_dir)
-                    if os.path.isdir(year_path):
-                        for month_dir in os.listdir(year_path):
-                            month_path = os.path.join(year_path, month_dir)
-                            if os.path.isdir(month_path):
-                                for file in os.listdir(month_path):
-                                    if file.startswith('Ranking_Por_Empresa_') and file.endswith('.xlsx'):
-                                        companies.add(company_dir)
-                                        break
-                            if company_dir in companies:
-                                break
-                    if company_dir in companies:
-                        break
-        
-        return sorted(list(companies))
+        return sorted({record['folder'] for record in self.catalog.records('Ranking_Por_Empresa') if record.get('company')})
     
     def find_available_periods(self, company):
         """Encontra períodos disponíveis para uma empresa específica"""
-        periods = set()
-        
-        ranking_por_empresa_dir = os.path.join(self.OUTPUT_BASE_DIR, 'Ranking_Por_Empresa', company)
-        if not os.path.exists(ranking_por_empresa_dir):
-            return []
-        
-        for year_dir in os.listdir(ranking_por_empresa_dir):
-            year_path = os.path.join(ranking_por_empresa_dir, year_dir)
-            if os.path.isdir(year_path):
-                for month_dir in os.listdir(year_path):
-                    month_path = os.path.join(year_path, month_dir)
-                    if os.path.isdir(month_path):
-                        for file in os.listdir(month_path):
-                            if file.startswith('Ranking_Por_Empresa_') and file.endswith('.xlsx'):
-                                # Extrair mês e ano do nome do arquivo
-                                parts = file.replace('.xlsx', '').split('_')
-                                if len(parts) >= 4:
-                                    month = parts[-2]
-                                    year = parts[-1]
-                                    periods.add(f"{month}_{year}")
-        
-        return sorted(list(periods))
+        return sorted({f"{record['month']}_{record['year']}" for record in self.catalog.records('Ranking_Por_Empresa')
+                       if record['folder'] == company and record.get('year')})
+    
+    def get_output_files(self, selected_periods=None, selected_companies=None):
+        """Arquivo do relatório consolidado, nomeado pelos períodos (e pela empresa, quando só uma)"""
+        if selected_periods:
+            periods_sorted = sorted(selected_periods)
+            first_period = periods_sorted[0]
+            last_period = periods_sorted[-1]
+            if selected_companies and len(selected_companies) == 1:
+                filename = f"Ranking_Ouro_Mediano_{selected_companies[0]}_{first_period}_a_{last_period}{self.version_suffix}.xlsx"
+            else:
+                filename = f"Ranking_Ouro_Mediano_{first_period}_a_{last_period}{self.version_suffix}.xlsx"
+        else:
+            current_date = datetime.now().strftime("%Y%m%d")
+            filename = f"Ranking_Ouro_Mediano_Consolidado_{current_date}{self.version_suffix}.xlsx"
+        return [os.path.join(self.OUTPUT_BASE_DIR, 'Ranking_Ouro_Mediano', filename)]
     
     def process_consolidation(self, selected_companies=None, selected_periods=None):
         """Processa a consolidação dos relatórios Ouro Mediano"""
@@ -1557,7 +2938,7 @@ class RankingOuroMedianoProcessor:
                             logging.info(f"Processando arquivo: {file_path}")
                             
                             # Ler a aba 'Todos' do arquivo
-                            df = pd.read_excel(file_path, sheet_name='Todos')
+                            df = read_excel_file(file_path, sheet_name='Todos')
                             
                             # Adicionar colunas de identificação
                             df['Empresa'] = company
@@ -1643,46 +3024,14 @@ class RankingOuroMedianoProcessor:
                 logging.warning("Nenhum dado para criar relatório consolidado")
                 return False
             
-            # Criar diretório de saída
-            output_folder = os.path.join(self.OUTPUT_BASE_DIR, 'Ranking_Ouro_Mediano')
-            os.makedirs(output_folder, exist_ok=True)
-            
-            # Gerar nome do arquivo baseado nos períodos e empresas
-            if selected_periods:
-                periods_sorted = sorted(selected_periods)
-                first_period = periods_sorted[0]
-                last_period = periods_sorted[-1]
-                if selected_companies and len(selected_companies) == 1:
-                    filename = f"Ranking_Ouro_Mediano_{selected_companies[0]}_{first_period}_a_{last_period}{self.version_suffix}.xlsx"
-                else:
-                    filename = f"Ranking_Ouro_Mediano_{first_period}_a_{last_period}{self.version_suffix}.xlsx"
-            else:
-                current_date = datetime.now().strftime("%Y%m%d")
-                filename = f"Ranking_Ouro_Mediano_Consolidado_{current_date}{self.version_suffix}.xlsx"
-            
-            output_file = os.path.join(output_folder, filename)
+            # Nome do arquivo baseado nos períodos e empresas
+            output_file = self.get_output_files(selected_periods, selected_companies)[0]
+            os.makedirs(os.path.dirname(output_file), exist_ok=True)
             
             logging.info(f"Criando relatório consolidado: {output_file}")
             
-            # Verificar se o arquivo está em uso
-            max_attempts = 5
-            for attempt in range(max_attempts):
-                try:
-                    if os.path.exists(output_file):
-                        with open(output_file, 'r+b') as f:
-                            pass
-                    break
-                except PermissionError:
-                    if attempt < max_attempts - 1:
-                        logging.warning(f"Tentativa {attempt + 1}/{max_attempts}: Arquivo {output_file} está em uso. Aguardando...")
-                        tm.sleep(2)
-                        base_name = output_file.replace('.xlsx', '')
-                        output_file = f"{base_name}_{attempt + 1}.xlsx"
-                    else:
-                        logging.error(f"Arquivo {output_file} está em uso após {max_attempts} tentativas.")
-                        raise Exception(f"Arquivo em uso: {output_file}. Feche o arquivo no Excel e tente novamente.")
-            
-            with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+            # Gravação em arquivo temporário + troca atômica (nome alternativo só se o destino estiver aberto)
+            with AtomicOutputFile(output_file) as output, pd.ExcelWriter(output.temp_path, engine='openpyxl') as writer:
                 # Salvar dados principais
                 df_consolidated.to_excel(writer, sheet_name='Todos', index=False)
                 
@@ -1779,8 +3128,9 @@ class RankingOuroMedianoProcessor:
                     df_periodo.to_excel(writer, sheet_name=sheet_name, index=False)
                 
                 logging.info(f"Formatação aplicada em {formatted_count} células")
-                logging.info(f"Relatório consolidado gerado com sucesso: {output_file}")
-                return output_file
+            output_file = output.path
+            logging.info(f"Relatório consolidado gerado com sucesso: {output_file}")
+            return output_file
             
         except Exception as e:
             logging.error(f"Erro ao criar relatório consolidado: {str(e)}")
@@ -1793,32 +3143,32 @@ class RankingKmProporcionalProcessor:
         self.SUPPLY_FOLDER = os.path.join(base_dir, 'Integração_Abast')
         self.OUTPUT_BASE_DIR = output_base_dir
         self.version_suffix = version_suffix
+        self.catalog = get_file_catalog(base_dir, output_base_dir)
 
     def find_available_companies(self):
         # Considera empresas a partir dos arquivos de abastecimento
-        companies = set()
         if not os.path.exists(self.SUPPLY_FOLDER):
             logging.error(f"Pasta de abastecimento não encontrada: {self.SUPPLY_FOLDER}")
             return []
-        for file in os.listdir(self.SUPPLY_FOLDER):
-            if file.startswith('Abastecimento_') and file.endswith('.xlsx'):
-                parts = file.replace('.xlsx', '').split('_')
-                if len(parts) >= 3:
-                    companies.add(parts[1])
-        return sorted(list(companies))
+        return sorted({record['company'] for record in self.catalog.records('Integração_Abast') if record.get('company')})
 
     def find_available_periods(self, company):
-        periods = set()
-        if not os.path.exists(self.SUPPLY_FOLDER):
-            return []
-        for file in os.listdir(self.SUPPLY_FOLDER):
-            if file.startswith(f'Abastecimento_{company}_') and file.endswith('.xlsx'):
-                parts = file.replace('.xlsx', '').split('_')
-                if len(parts) >= 4:
-                    month = parts[2]
-                    year = parts[3]
-                    periods.add(f"{month}_{year}")
-        return sorted(list(periods))
+        return sorted({f"{record['month']}_{record['year']}" for record in self.catalog.records('Integração_Abast')
+                       if record.get('company') == company and record['year']})
+
+    def get_output_files(self, company, month_year):
+        """Arquivos que o processamento do período grava"""
+        month, year = month_year.split('_')
+        output_folder = os.path.join(self.OUTPUT_BASE_DIR, 'Rankig_Km_Proporcional', company, year, month.zfill(2))
+        return [os.path.join(output_folder, filename) for filename in [
+            f'Detalhado_{company}_{month_year}{self.version_suffix}.xlsx',
+            f'Consolidado_{company}_{month}_{year}{self.version_suffix}.xlsx',
+            f'Ranking_Km_Proporcional_{company}_{month}_{year}{self.version_suffix}.xlsx'
+        ]]
+
+    def get_input_files(self, company, month_year):
+        """Entradas lidas no processamento do período, como (caminho, tipo de leitura) para a leitura antecipada"""
+        return [(os.path.join(self.SUPPLY_FOLDER, f"Abastecimento_{company}_{month_year}.xlsx"), 'supply')]
 
     def calcular_media_empresa(self, company, month_year):
         """Calcula o total de km, litros e km/l médio da empresa para o período."""
@@ -1826,7 +3176,7 @@ class RankingKmProporcionalProcessor:
         if not os.path.exists(supply_file):
             logging.error(f"Arquivo de abastecimento não encontrado: {supply_file}")
             return None, None, None
-        df = pd.read_excel(supply_file)
+        df = read_supply_file(supply_file, self.OUTPUT_BASE_DIR)
         total_km = df['km'].sum() if 'km' in df.columns else 0
         total_litros = df['litros'].sum() if 'litros' in df.columns else 0
         km_l_medio = total_km / total_litros if total_litros > 0 else 0
@@ -1837,7 +3187,7 @@ class RankingKmProporcionalProcessor:
         if not os.path.exists(detalhado_path):
             logging.error(f"Arquivo detalhado não encontrado: {detalhado_path}")
             return False
-        df = pd.read_excel(detalhado_path)
+        df = read_detalhado(detalhado_path)
         if 'km_distributed' not in df.columns:
             logging.error(f"Coluna 'km_distributed' não encontrada em {detalhado_path}")
             return False
@@ -1850,19 +3200,9 @@ class RankingKmProporcionalProcessor:
         if soma_atual == 0:
             logging.warning("Soma de km_distributed é zero, não é possível ajustar proporcionalmente.")
             return False
-        proporcoes = df['km_distributed'] / soma_atual
-        ajuste = proporcoes * diff
-        df['km_distributed'] += ajuste
-        # Corrigir possíveis arredondamentos
-        df['km_distributed'] = df['km_distributed'].round(2)
-        # Ajuste final para garantir soma exata
-        diff_final = total_km - df['km_distributed'].sum()
-        if abs(diff_final) > 0.01:
-            # Corrige o maior valor
-            idx_max = df['km_distributed'].idxmax()
-            df.at[idx_max, 'km_distributed'] += diff_final
+        df['km_distributed'] = allocate_cents(df['km_distributed'], total_km)
         # Salva o arquivo ajustado
-        df.to_excel(detalhado_path, index=False, engine='openpyxl')
+        write_detalhado(df, detalhado_path)
         logging.info(f"Ajuste proporcional realizado em {detalhado_path}. Diferença corrigida: {diff:.2f}")
         return True
 
@@ -1871,21 +3211,14 @@ class RankingKmProporcionalProcessor:
         if not os.path.exists(detalhado_path):
             logging.error(f"Arquivo detalhado não encontrado: {detalhado_path}")
             return False
-        df = pd.read_excel(detalhado_path)
+        df = read_detalhado(detalhado_path)
         alterou = False
         # Ajuste km_distributed
         if 'km_distributed' in df.columns:
             soma_atual_km = df['km_distributed'].sum()
             diff_km = total_km - soma_atual_km
             if abs(diff_km) >= 1e-6 and soma_atual_km != 0:
-                proporcoes_km = df['km_distributed'] / soma_atual_km
-                ajuste_km = proporcoes_km * diff_km
-                df['km_distributed'] += ajuste_km
-                df['km_distributed'] = df['km_distributed'].round(2)
-                diff_final_km = total_km - df['km_distributed'].sum()
-                if abs(diff_final_km) > 0.01:
-                    idx_max = df['km_distributed'].idxmax()
-                    df.at[idx_max, 'km_distributed'] += diff_final_km
+                df['km_distributed'] = allocate_cents(df['km_distributed'], total_km)
                 alterou = True
                 logging.info(f"Ajuste proporcional realizado em km_distributed. Diferença corrigida: {diff_km:.2f}")
         else:
@@ -1895,20 +3228,13 @@ class RankingKmProporcionalProcessor:
             soma_atual_litros = df['liters_distributed'].sum()
             diff_litros = total_litros - soma_atual_litros
             if abs(diff_litros) >= 1e-6 and soma_atual_litros != 0:
-                proporcoes_litros = df['liters_distributed'] / soma_atual_litros
-                ajuste_litros = proporcoes_litros * diff_litros
-                df['liters_distributed'] += ajuste_litros
-                df['liters_distributed'] = df['liters_distributed'].round(2)
-                diff_final_litros = total_litros - df['liters_distributed'].sum()
-                if abs(diff_final_litros) > 0.01:
-                    idx_max = df['liters_distributed'].idxmax()
-                    df.at[idx_max, 'liters_distributed'] += diff_final_litros
+                df['liters_distributed'] = allocate_cents(df['liters_distributed'], total_litros)
                 alterou = True
                 logging.info(f"Ajuste proporcional realizado em liters_distributed. Diferença corrigida: {diff_litros:.2f}")
         else:
             logging.warning(f"Coluna 'liters_distributed' não encontrada em {detalhado_path}")
         if alterou:
-            df.to_excel(detalhado_path, index=False, engine='openpyxl')
+            write_detalhado(df, detalhado_path)
         return alterou
 
     def process_company_period(self, company, month_year):
@@ -1933,6 +3259,12 @@ class RankingKmProporcionalProcessor:
         if os.path.exists(detalhado_origem):
             import shutil
             shutil.copyfile(detalhado_origem, detalhado_path)
+            # A cópia tipada válida vai junto (copiada depois do .xlsx, continua válida no destino)
+            for extension in ('.parquet', '.pkl'):
+                sidecar_origem = os.path.splitext(detalhado_origem)[0] + extension
+                if os.path.exists(sidecar_origem) and \
+                        os.stat(sidecar_origem).st_mtime_ns >= os.stat(detalhado_origem).st_mtime_ns:
+                    shutil.copyfile(sidecar_origem, os.path.splitext(detalhado_path)[0] + extension)
         else:
             logging.error(f"Arquivo detalhado de origem não encontrado: {detalhado_origem}")
             return None
@@ -1940,7 +3272,7 @@ class RankingKmProporcionalProcessor:
         self.ajustar_km_e_litros_distributed(detalhado_path, total_km, total_litros)
         # Gerar consolidado por motorista
         try:
-            df = pd.read_excel(detalhado_path)
+            df = read_detalhado(detalhado_path)
             if 'motorista' not in df.columns:
                 df['motorista'] = 'Desconhecido'
             if 'matricula' not in df.columns:
@@ -1954,6 +3286,7 @@ class RankingKmProporcionalProcessor:
             agrupado['Km/l_Média'] = agrupado['km_distributed'] / agrupado['liters_distributed']
             consolidado_path = os.path.join(output_folder, f'Consolidado_{company}_{month}_{year}{self.version_suffix}.xlsx')
             agrupado.to_excel(consolidado_path, index=False)
+            store_period_artifact(consolidado_path, agrupado)
             logging.info(f"Consolidado por motorista salvo em: {consolidado_path}")
         except Exception as e:
             logging.error(f"Erro ao gerar consolidado por motorista: {e}")
@@ -1976,6 +3309,7 @@ class TurnosIntegracaoProcessor:
         self.BASE_DIR = base_dir
         self.OUTPUT_BASE_DIR = output_base_dir
         self.version_suffix = version_suffix
+        self.catalog = get_file_catalog(base_dir, output_base_dir)
         
         # Definição dos turnos conforme especificado
         self.turnos_definicao = {
@@ -1989,58 +3323,29 @@ class TurnosIntegracaoProcessor:
     def find_available_companies(self):
         """Encontra empresas que têm arquivos Detalhado disponíveis"""
         logging.info("Procurando empresas com arquivos Detalhado para processamento de Turnos Integração...")
-        companies = set()
         
         abst_mot_dir = os.path.join(self.OUTPUT_BASE_DIR, 'Abst_Mot_Por_empresa')
         if not os.path.exists(abst_mot_dir):
             logging.warning(f"Diretório Abst_Mot_Por_empresa não encontrado: {abst_mot_dir}")
             return []
         
-        for company_dir in os.listdir(abst_mot_dir):
-            company_path = os.path.join(abst_mot_dir, company_dir)
-            if os.path.isdir(company_path):
-                # Verificar se há arquivos Detalhado nesta empresa
-                for year_dir in os.listdir(company_path):
-                    year_path = os.path.join(company_path, year_dir)
-                    if os.path.isdir(year_path):
-                        for month_dir in os.listdir(year_path):
-                            month_path = os.path.join(year_path, month_dir)
-                            if os.path.isdir(month_path):
-                                for file in os.listdir(month_path):
-                                    if file.startswith('Detalhado_') and file.endswith('.xlsx'):
-                                        companies.add(company_dir)
-                                        break
-                            if company_dir in companies:
-                                break
-                    if company_dir in companies:
-                        break
-        
-        return sorted(list(companies))
+        return sorted({record['folder'] for record in self.catalog.records('Abst_Mot_Por_empresa') if record.get('company')})
     
     def find_available_periods(self, company):
         """Encontra períodos disponíveis para uma empresa específica"""
-        periods = set()
-        
-        abst_mot_dir = os.path.join(self.OUTPUT_BASE_DIR, 'Abst_Mot_Por_empresa', company)
-        if not os.path.exists(abst_mot_dir):
-            return []
-        
-        for year_dir in os.listdir(abst_mot_dir):
-            year_path = os.path.join(abst_mot_dir, year_dir)
-            if os.path.isdir(year_path):
-                for month_dir in os.listdir(year_path):
-                    month_path = os.path.join(year_path, month_dir)
-                    if os.path.isdir(month_path):
-                        for file in os.listdir(month_path):
-                            if file.startswith('Detalhado_') and file.endswith('.xlsx'):
-                                # Extrair mês e ano do nome do arquivo
-                                parts = file.replace('.xlsx', '').split('_')
-                                if len(parts) >= 3:
-                                    month = parts[1]
-                                    year = parts[2]
-                                    periods.add(f"{month}_{year}")
-        
-        return sorted(list(periods))
+        # Detalhado_{empresa}_{mês}_{ano}[_{versão}].xlsx
+        return sorted({f"{record['month']}_{record['year']}" for record in self.catalog.records('Abst_Mot_Por_empresa')
+                       if record['folder'] == company and record.get('year')})
+    
+    def get_output_files(self, company, month_year):
+        """Arquivos que o relatório do período grava"""
+        month, year = month_year.split('_')
+        return [os.path.join(self.OUTPUT_BASE_DIR, 'Turnos Integração', company, year, month.zfill(2),
+                             f'Turnos_Integração_{company}_{month_year}{self.version_suffix}.xlsx')]
+    
+    def get_input_files(self, company, month_year):
+        """Só lê o Detalhado gerado pelo Abst_Mot_Por_empresa; não há entradas para ler antecipadamente"""
+        return []
     
     def determinar_turno(self, hora):
         """Determina o turno baseado na hora"""
@@ -2137,8 +3442,8 @@ class TurnosIntegracaoProcessor:
             
             logging.info(f"Processando Turnos Integração para {company} - {month_year}")
             
-            # Carregar dados detalhados
-            df_detalhado = pd.read_excel(detalhado_path)
+            # Carregar dados detalhados (cópia tipada quando existir; pegada/largada já vêm como datetime)
+            df_detalhado = read_detalhado(detalhado_path)
             
             # Verificar colunas necessárias
             colunas_necessarias = ['motorista', 'matricula', 'placa', 'dia', 'pegada', 'largada', 'km_distributed', 'liters_distributed']
@@ -2151,9 +3456,8 @@ class TurnosIntegracaoProcessor:
             # Converter colunas de data/hora
             df_detalhado['dia'] = pd.to_datetime(df_detalhado['dia'], format='%d/%m/%Y', errors='coerce')
             
-            # Converter pegada e largada para datetime
-            df_detalhado['pegada_dt'] = pd.to_datetime(df_detalhado['pegada'], format='%d/%m/%Y %H:%M', errors='coerce')
-            df_detalhado['largada_dt'] = pd.to_datetime(df_detalhado['largada'], format='%d/%m/%Y %H:%M', errors='coerce')
+            df_detalhado['pegada_dt'] = df_detalhado['pegada']
+            df_detalhado['largada_dt'] = df_detalhado['largada']
             
             # Filtrar registros com horários válidos
             df_valido = df_detalhado[
@@ -2277,36 +3581,14 @@ class TurnosIntegracaoProcessor:
                 logging.warning("Nenhum dado para criar relatório de turnos integração")
                 return False
             
-            month, year = month_year.split('_')
-            
             # Criar diretório de saída
-            output_folder = os.path.join(self.OUTPUT_BASE_DIR, 'Turnos Integração', company, year, month.zfill(2))
-            os.makedirs(output_folder, exist_ok=True)
-            
-            # Nome do arquivo
-            output_file = os.path.join(output_folder, f'Turnos_Integração_{company}_{month_year}{self.version_suffix}.xlsx')
+            output_file = self.get_output_files(company, month_year)[0]
+            os.makedirs(os.path.dirname(output_file), exist_ok=True)
             
             logging.info(f"Criando relatório de turnos integração: {output_file}")
             
-            # Verificar se o arquivo está em uso
-            max_attempts = 5
-            for attempt in range(max_attempts):
-                try:
-                    if os.path.exists(output_file):
-                        with open(output_file, 'r+b') as f:
-                            pass
-                    break
-                except PermissionError:
-                    if attempt < max_attempts - 1:
-                        logging.warning(f"Tentativa {attempt + 1}/{max_attempts}: Arquivo {output_file} está em uso. Aguardando...")
-                        tm.sleep(2)
-                        base_name = output_file.replace('.xlsx', '')
-                        output_file = f"{base_name}_{attempt + 1}.xlsx"
-                    else:
-                        logging.error(f"Arquivo {output_file} está em uso após {max_attempts} tentativas.")
-                        raise Exception(f"Arquivo em uso: {output_file}. Feche o arquivo no Excel e tente novamente.")
-            
-            with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+            # Gravação em arquivo temporário + troca atômica (nome alternativo só se o destino estiver aberto)
+            with AtomicOutputFile(output_file) as output, pd.ExcelWriter(output.temp_path, engine='openpyxl') as writer:
                 # Aba principal com todos os dados
                 df_resultado.to_excel(writer, sheet_name='Todos_Turnos', index=False)
                 
@@ -2346,6 +3628,7 @@ class TurnosIntegracaoProcessor:
                 # Aplicar formatação condicional
                 self.aplicar_formatacao_turnos(writer)
             
+            output_file = output.path
             logging.info(f"Relatório de turnos integração gerado com sucesso: {output_file}")
             return output_file
             
@@ -2444,6 +3727,7 @@ class ResumoMotoristaClienteProcessor:
         self.RESUMO_FOLDER = os.path.join(base_dir, 'Resumo_Motorista_Cliente')
         self.OUTPUT_BASE_DIR = output_base_dir
         self.version_suffix = version_suffix
+        self.catalog = get_file_catalog(base_dir, output_base_dir)
         
     def find_available_companies(self):
         """Encontra empresas disponíveis baseado nos arquivos de resumo"""
@@ -2453,18 +3737,12 @@ class ResumoMotoristaClienteProcessor:
             logging.error(f"Pasta de resumo não encontrada: {self.RESUMO_FOLDER}")
             return []
         
-        resumo_files = [f for f in os.listdir(self.RESUMO_FOLDER) if f.endswith('.xlsx')]
         companies = set()
-        
-        for file in resumo_files:
-            # Extrai o nome da empresa do arquivo (ex: RMC_Amparo_Agosto_2025.xlsx -> Amparo)
-            parts = file.split('_')
-            if len(parts) >= 3 and parts[0] == 'RMC':  # Formato: RMC_Empresa_Periodo.xlsx
-                company = parts[1]
-                companies.add(company)
-            elif len(parts) >= 2:  # Formato alternativo: Empresa_Periodo.xlsx
-                company = parts[0]
-                companies.add(company)
+        for record in self.catalog.records('Resumo_Motorista_Cliente'):
+            if record.get('company'):  # Formato: RMC_Empresa_Periodo.xlsx
+                companies.add(record['company'])
+            elif len(record['filename'].split('_')) >= 2:  # Formato alternativo: Empresa_Periodo.xlsx
+                companies.add(record['filename'].split('_')[0])
         
         return sorted(list(companies))
     
@@ -2473,22 +3751,23 @@ class ResumoMotoristaClienteProcessor:
         if not os.path.exists(self.RESUMO_FOLDER):
             return []
         
-        # Procura por arquivos com formato RMC_Empresa_Periodo.xlsx
-        resumo_files = [f for f in os.listdir(self.RESUMO_FOLDER) if f.startswith(f'RMC_{company}_') and f.endswith('.xlsx')]
-        periods = []
-        
-        for file in resumo_files:
-            # Extrai o período do arquivo (ex: RMC_Amparo_Agosto_2025.xlsx -> Agosto_2025)
-            parts = file.replace('.xlsx', '').split('_')
-            if len(parts) >= 4 and parts[0] == 'RMC':  # Formato: RMC_Empresa_Periodo.xlsx
-                period = '_'.join(parts[2:])
-                periods.append(period)
-            elif len(parts) >= 3:  # Formato alternativo: Empresa_Periodo.xlsx
-                period = '_'.join(parts[1:])
-                periods.append(period)
+        # Extrai o período do arquivo (ex: RMC_Amparo_Agosto_2025.xlsx -> Agosto_2025)
+        periods = ['_'.join(part for part in [record['month'], record['year'], record['version']] if part)
+                   for record in self.catalog.records('Resumo_Motorista_Cliente')
+                   if record.get('company') == company and record['year']]
         
         return sorted(periods)
     
+    def get_output_files(self, company, month_year):
+        """Arquivos que o relatório do período grava"""
+        return [os.path.join(self.OUTPUT_BASE_DIR, "RMC_Destribuida", company, "2025", month_year.split('_')[0],
+                             f"RMC_Km_l_Distribuida_{company}_{month_year}{self.version_suffix}.xlsx")]
+    
+    def get_input_files(self, company, month_year):
+        """Entradas lidas no processamento do período, como (caminho, tipo de leitura) para a leitura antecipada"""
+        return [(os.path.join(self.RESUMO_FOLDER, f"RMC_{company}_{month_year}.xlsx"), 'resumo'),
+                (os.path.join(self.SUPPLY_FOLDER, f"Abastecimento_{company}_{month_year}.xlsx"), 'supply')]
+    
     def extract_plate_number(self, plate):
         """Extrai o número da placa, removendo letras MAR, A e RJ"""
         if pd.isna(plate):
@@ -2549,7 +3828,7 @@ class ResumoMotoristaClienteProcessor:
         
         try:
             # Lê o arquivo de abastecimento
-            df_abast = pd.read_excel(abastecimento_path, engine='openpyxl')
+            df_abast = read_supply_file(abastecimento_path, self.OUTPUT_BASE_DIR)
             logging.info(f"Arquivo de abastecimento carregado: {len(df_abast)} registros")
             
             # Identifica colunas relevantes
@@ -2621,7 +3900,7 @@ class ResumoMotoristaClienteProcessor:
             return None
         
         try:
-            df_resumo = pd.read_excel(resumo_path, engine='openpyxl')
+            df_resumo = read_input_with_schema(resumo_path, self.OUTPUT_BASE_DIR, 'resumo')
             logging.info(f"Arquivo de resumo carregado: {len(df_resumo)} registros")
             logging.info(f"Estrutura original do arquivo: {list(df_resumo.columns)}")
             
@@ -2633,7 +3912,7 @@ class ResumoMotoristaClienteProcessor:
                 logging.error(f"Arquivo de abastecimento não encontrado: {abast_path}")
                 return None
             
-            df_abast = pd.read_excel(abast_path, engine='openpyxl')
+            df_abast = read_supply_file(abast_path, self.OUTPUT_BASE_DIR)
             logging.info(f"Arquivo de abastecimento carregado: {len(df_abast)} registros")
             
             # Limpar placas e filtrar abastecimento
@@ -2736,12 +4015,8 @@ class ResumoMotoristaClienteProcessor:
         
         try:
             # Cria diretório de saída no local correto
-            output_folder = os.path.join(self.OUTPUT_BASE_DIR, "RMC_Destribuida", company, "2025", month_year.split('_')[0])
-            os.makedirs(output_folder, exist_ok=True)
-            
-            # Nome do arquivo de saída
-            filename = f"RMC_Km_l_Distribuida_{company}_{month_year}{self.version_suffix}.xlsx"
-            filepath = os.path.join(output_folder, filename)
+            filepath = self.get_output_files(company, month_year)[0]
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
             
             # Cria o arquivo Excel
             with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
@@ -2808,6 +4083,7 @@ class UnifiedProcessorGUI:
         self.company_periods_ranking_km_proporcional = {} # Períodos disponíveis para Ranking_Km_Proporcional
         self.company_periods_turnos_integracao = {} # Períodos disponíveis para Turnos Integração
         self.company_periods_resumo_motorista_cliente = {} # Períodos disponíveis para Resumo_Motorista_Cliente
+        self.prefetch_depth = PREFETCH_DEPTH # Períodos lidos antecipadamente em run_processing (0 desativa)
         
         # Variáveis para controle de progresso
         self.total_tasks = 0
@@ -2902,6 +4178,13 @@ class UnifiedProcessorGUI:
         self.version_combobox.set("---")  # Valor inicial
         self.version_combobox.grid(row=0, column=1, padx=(0, 10), sticky="w")
         self.version_combobox.bind('<<ComboboxSelected>>', self.on_version_dropdown_select)
+        
+        # Leitor de planilhas (auto = calamine se instalado, senão openpyxl)
+        ttk.Label(version_frame, text="Leitor XLSX:").grid(row=0, column=2, padx=(10, 5), sticky="w")
+        self.reader_engine_combobox = ttk.Combobox(version_frame, values=XLSX_READER_ENGINES, state="readonly", width=10)
+        self.reader_engine_combobox.set(xlsx_reader_engine)
+        self.reader_engine_combobox.grid(row=0, column=3, sticky="w")
+        self.reader_engine_combobox.bind('<<ComboboxSelected>>', self.on_reader_engine_select)
 
         # Seleção do Tipo de Relatório
         report_type_frame = ttk.LabelFrame(scrollable_frame, text="Tipo de Relatório", padding=10)
@@ -3338,6 +4621,12 @@ class UnifiedProcessorGUI:
             self.initialize_processors()
             self.update_company_list()
 
+    def on_reader_engine_select(self, event=None):
+        """Troca o leitor de .xlsx usado por todos os processadores"""
+        selected = self.reader_engine_combobox.get()
+        set_xlsx_reader_engine(selected)
+        self.add_log_entry(f"📖 Leitor XLSX: {selected} (em uso: {get_xlsx_reader_engine()})", "info")
+    
     def on_version_dropdown_select(self, event=None):
         """Atualiza o campo de versão quando uma opção é selecionada no dropdown"""
         selected = self.version_combobox.get()
@@ -3427,6 +4716,79 @@ class UnifiedProcessorGUI:
         selected_months = [self.month_listbox.get(i) for i in self.month_listbox.curselection()]
         return selected_years, selected_months
 
+    def get_report_periods(self, report_type):
+        """Empresas e períodos disponíveis para o tipo de relatório"""
+        return {
+            "Abst_Mot_Por_empresa": self.company_months_abst,
+            "Ranking_Por_Empresa": self.company_periods_ranking,
+            "Ranking_Integração": self.company_periods_ranking_integracao,
+            "Ranking_Ouro_Mediano": self.company_periods_ranking_ouro_mediano,
+            "Ranking_Km_Proporcional": self.company_periods_ranking_km_proporcional,
+            "Turnos_Integração": self.company_periods_turnos_integracao,
+            "Resumo_Motorista_Cliente": self.company_periods_resumo_motorista_cliente
+        }.get(report_type, {})
+
+    def plan_tasks(self, report_types, companies=None, selected_years=None, selected_months=None):
+        """Lista (tipo de relatório, empresa, períodos) que o processamento vai executar"""
+        tasks = []
+        for report_type in report_types:
+            periods_dict = self.get_report_periods(report_type)
+            for company in (companies if companies is not None else list(periods_dict.keys())):
+                periods = periods_dict.get(company, [])
+                if selected_years and selected_months:
+                    periods = [p for p in periods if any(p == f"{m}_{y}" for y in selected_years for m in selected_months)]
+                if periods:
+                    tasks.append((report_type, company, periods))
+        return tasks
+
+    def get_planned_output_files(self, report_type, company, periods):
+        """Arquivos que run_processing vai gravar para a empresa e os períodos"""
+        if report_type == "Ranking_Ouro_Mediano":
+            if self.ranking_ouro_mediano_processor is None:
+                return []
+            return self.ranking_ouro_mediano_processor.get_output_files(selected_periods=periods)
+        processor = {
+            "Abst_Mot_Por_empresa": self.company_processor,
+            "Ranking_Por_Empresa": self.ranking_processor,
+            "Ranking_Integração": self.ranking_integracao_processor,
+            "Ranking_Km_Proporcional": self.ranking_km_proporcional_processor,
+            "Turnos_Integração": self.turnos_integracao_processor,
+            "Resumo_Motorista_Cliente": self.resumo_motorista_cliente_processor
+        }.get(report_type)
+        if processor is None:
+            return []
+        return [path for period in periods for path in processor.get_output_files(company, period)]
+
+    def get_planned_input_files(self, report_type, company, period):
+        """Entradas (caminho, tipo de leitura) que run_processing vai ler para o período, para a leitura antecipada"""
+        processor = {
+            "Abst_Mot_Por_empresa": self.company_processor,
+            "Ranking_Por_Empresa": self.ranking_processor,
+            "Ranking_Integração": self.ranking_integracao_processor,
+            "Ranking_Km_Proporcional": self.ranking_km_proporcional_processor,
+            "Turnos_Integração": self.turnos_integracao_processor,
+            "Resumo_Motorista_Cliente": self.resumo_motorista_cliente_processor
+        }.get(report_type)
+        if processor is None:
+            return []
+        return processor.get_input_files(company, period)
+
+    def confirm_files_in_use(self, tasks):
+        """
+        Confere apenas os arquivos que as tarefas vão gravar (em vez de abrir toda a pasta de saída).
+        Retorna False quando há arquivos em uso e o usuário decide não continuar.
+        """
+        planned_files = [path for report_type, company, periods in tasks
+                         for path in self.get_planned_output_files(report_type, company, periods)]
+        files_in_use = check_files_in_use(planned_files)
+        if files_in_use:
+            return messagebox.askyesno(
+                "Arquivos em Uso", 
+                f"Encontrados {len(files_in_use)} arquivo(s) Excel em uso.\n\n"
+                "Deseja continuar mesmo assim? (O script tentará criar arquivos com nomes alternativos)"
+            )
+        return True
+
     def process_selected(self):
         selected_company_indices = self.company_listbox.curselection()
         selected_companies = [self.company_listbox.get(i) for i in selected_company_indices]
@@ -3443,15 +4805,10 @@ class UnifiedProcessorGUI:
             return
         
         # Verificar arquivos em uso
-        files_in_use = check_excel_files_in_use(self.output_base_dir)
-        if files_in_use:
-            result = messagebox.askyesno(
-                "Arquivos em Uso", 
-                f"Encontrados {len(files_in_use)} arquivo(s) Excel em uso.\n\n"
-                "Deseja continuar mesmo assim? (O script tentará criar arquivos com nomes alternativos)"
-            )
-            if not result:
-                return
+        periods = [f"{m}_{y}" for y in selected_years for m in selected_months]
+        tasks = [(report_type, company, periods) for report_type in selected_report_types for company in selected_companies]
+        if not self.confirm_files_in_use(tasks):
+            return
         
         # Limpar log e iniciar processamento
         self.clear_log()
@@ -3461,7 +4818,6 @@ class UnifiedProcessorGUI:
         self.add_log_entry(f"Anos: {', '.join(selected_years)}", "info")
         self.add_log_entry(f"Meses: {', '.join(selected_months)}", "info")
         
-        periods = [f"{m}_{y}" for y in selected_years for m in selected_months]
         for report_type in selected_report_types:
             for company in selected_companies:
                 self.add_log_entry(f"Iniciando processamento: {company} [{report_type}]", "start")
@@ -3480,15 +4836,8 @@ class UnifiedProcessorGUI:
             return
         
         # Verificar arquivos em uso
-        files_in_use = check_excel_files_in_use(self.output_base_dir)
-        if files_in_use:
-            result = messagebox.askyesno(
-                "Arquivos em Uso", 
-                f"Encontrados {len(files_in_use)} arquivo(s) Excel em uso.\n\n"
-                "Deseja continuar mesmo assim? (O script tentará criar arquivos com nomes alternativos)"
-            )
-            if not result:
-                return
+        if not self.confirm_files_in_use(self.plan_tasks(selected_report_types, selected_companies, selected_years, selected_months)):
+            return
         
         # Calcular total de tarefas para progresso
         total_tasks = 0
@@ -3557,15 +4906,8 @@ class UnifiedProcessorGUI:
         selected_years, selected_months = self.get_selected_years_months()
         
         # Verificar arquivos em uso
-        files_in_use = check_excel_files_in_use(self.output_base_dir)
-        if files_in_use:
-            result = messagebox.askyesno(
-                "Arquivos em Uso", 
-                f"Encontrados {len(files_in_use)} arquivo(s) Excel em uso.\n\n"
-                "Deseja continuar mesmo assim? (O script tentará criar arquivos com nomes alternativos)"
-            )
-            if not result:
-                return
+        if not self.confirm_files_in_use(self.plan_tasks(selected_report_types, None, selected_years, selected_months)):
+            return
         
         # Calcular total de tarefas para progresso
         total_tasks = 0
@@ -3651,15 +4993,8 @@ class UnifiedProcessorGUI:
         selected_years, selected_months = self.get_selected_years_months()
         
         # Verificar arquivos em uso
-        files_in_use = check_excel_files_in_use(self.output_base_dir)
-        if files_in_use:
-            result = messagebox.askyesno(
-                "Arquivos em Uso", 
-                f"Encontrados {len(files_in_use)} arquivo(s) Excel em uso.\n\n"
-                "Deseja continuar mesmo assim? (O script tentará criar arquivos com nomes alternativos)"
-            )
-            if not result:
-                return
+        if not self.confirm_files_in_use(self.plan_tasks(selected_report_types, None, selected_years, selected_months)):
+            return
         
         # Calcular total de tarefas para progresso
         total_tasks = 0
@@ -3859,84 +5194,89 @@ class UnifiedProcessorGUI:
         
         start_time = tm.time()
         
-        for i, period in enumerate(periods_to_process):
-            current_task = f"{company} - {period} ({i+1}/{total_periods}) [{report_type}]"
-            # Atualizar progresso (update_idletasks agora é otimizado dentro de update_progress)
-            self.update_progress(current_task, i, total_periods)
+        # Entradas do próximo período são lidas em segundo plano enquanto o atual é processado
+        with InputPrefetcher(self.output_base_dir, self.prefetch_depth) as prefetcher:
+            planned_periods = prefetcher.iterate(
+                periods_to_process, lambda period: self.get_planned_input_files(report_type, company, period))
+        
+            for i, period in enumerate(planned_periods):
+                current_task = f"{company} - {period} ({i+1}/{total_periods}) [{report_type}]"
+                # Atualizar progresso (update_idletasks agora é otimizado dentro de update_progress)
+                self.update_progress(current_task, i, total_periods)
             
-            try:
-                if report_type == "Abst_Mot_Por_empresa":
-                    file_pairs = self.company_processor.get_company_files(company)
-                    pair = next((p for p in file_pairs if p['month_year'] == period), None)
-                    if pair:
-                        success = self.company_processor.process_company_files(pair['supply'], pair['drivers'], company, pair['month_year'])
-                    else:
-                        logging.error(f"Par de arquivos não encontrado para {company} em {period}.")
-                        success = False
-                elif report_type == "Ranking_Por_Empresa":
-                    df_result = self.ranking_processor.process_company_period(company, period)
-                    if df_result is not None:
-                        success = self.ranking_processor.create_report(df_result, company, period)
-                    else:
-                        success = False
-                elif report_type == "Ranking_Integração":
-                    df_result = self.ranking_integracao_processor.process_company_period(company, period)
-                    if df_result is not None:
-                        success = self.ranking_integracao_processor.create_report(df_result, company, period)
-                    else:
-                        success = False
-                elif report_type == "Ranking_Ouro_Mediano":
-                    # Para Ranking_Ouro_Mediano, processar consolidação de todos os períodos
-                    df_result = self.ranking_ouro_mediano_processor.process_consolidation(
-                        selected_companies=[company], 
-                        selected_periods=periods_to_process
-                    )
-                    if df_result is not None:
-                        success = self.ranking_ouro_mediano_processor.create_consolidated_report(df_result, selected_periods=periods_to_process)
-                    else:
-                        success = False
-                elif report_type == "Ranking_Km_Proporcional":
-                    result = self.ranking_km_proporcional_processor.process_company_period(company, period)
-                    if result is not None:
-                        success = True
-                    else:
-                        success = False
-                elif report_type == "Turnos_Integração":
-                    df_result = self.turnos_integracao_processor.process_company_period(company, period)
-                    if df_result is not None:
-                        success = self.turnos_integracao_processor.create_report(df_result, company, period)
-                    else:
-                        success = False
-                elif report_type == "Resumo_Motorista_Cliente":
-                    logging.info(f"Iniciando processamento Resumo_Motorista_Cliente para {company} - {period}")
-                    if self.resumo_motorista_cliente_processor:
-                        df_result = self.resumo_motorista_cliente_processor.process_company_period(company, period)
+                try:
+                    if report_type == "Abst_Mot_Por_empresa":
+                        file_pairs = self.company_processor.get_company_files(company)
+                        pair = next((p for p in file_pairs if p['month_year'] == period), None)
+                        if pair:
+                            success = self.company_processor.process_company_files(pair['supply'], pair['drivers'], company, pair['month_year'])
+                        else:
+                            logging.error(f"Par de arquivos não encontrado para {company} em {period}.")
+                            success = False
+                    elif report_type == "Ranking_Por_Empresa":
+                        df_result = self.ranking_processor.process_company_period(company, period)
                         if df_result is not None:
-                            logging.info(f"Processamento bem-sucedido, criando relatório para {company} - {period}")
-                            success = self.resumo_motorista_cliente_processor.create_report(df_result, company, period)
+                            success = self.ranking_processor.create_report(df_result, company, period)
                         else:
-                            logging.error(f"Processamento retornou None para {company} - {period}")
                             success = False
-                    else:
-                        logging.error("Processador Resumo_Motorista_Cliente não foi inicializado!")
-                        success = False
+                    elif report_type == "Ranking_Integração":
+                        df_result = self.ranking_integracao_processor.process_company_period(company, period)
+                        if df_result is not None:
+                            success = self.ranking_integracao_processor.create_report(df_result, company, period)
+                        else:
+                            success = False
+                    elif report_type == "Ranking_Ouro_Mediano":
+                        # Para Ranking_Ouro_Mediano, processar consolidação de todos os períodos
+                        df_result = self.ranking_ouro_mediano_processor.process_consolidation(
+                            selected_companies=[company], 
+                            selected_periods=periods_to_process
+                        )
+                        if df_result is not None:
+                            success = self.ranking_ouro_mediano_processor.create_consolidated_report(df_result, selected_periods=periods_to_process)
+                        else:
+                            success = False
+                    elif report_type == "Ranking_Km_Proporcional":
+                        result = self.ranking_km_proporcional_processor.process_company_period(company, period)
+                        if result is not None:
+                            success = True
+                        else:
+                            success = False
+                    elif report_type == "Turnos_Integração":
+                        df_result = self.turnos_integracao_processor.process_company_period(company, period)
+                        if df_result is not None:
+                            success = self.turnos_integracao_processor.create_report(df_result, company, period)
+                        else:
+                            success = False
+                    elif report_type == "Resumo_Motorista_Cliente":
+                        logging.info(f"Iniciando processamento Resumo_Motorista_Cliente para {company} - {period}")
+                        if self.resumo_motorista_cliente_processor:
+                            df_result = self.resumo_motorista_cliente_processor.process_company_period(company, period)
+                            if df_result is not None:
+                                logging.info(f"Processamento bem-sucedido, criando relatório para {company} - {period}")
+                                success = self.resumo_motorista_cliente_processor.create_report(df_result, company, period)
+                            else:
+                                logging.error(f"Processamento retornou None para {company} - {period}")
+                                success = False
+                        else:
+                            logging.error("Processador Resumo_Motorista_Cliente não foi inicializado!")
+                            success = False
                 
-                if success:
-                    success_count += 1
-                    self.add_log_entry(f"✅ {company} - {period} processado com sucesso", "success")
-                else:
-                    self.add_log_entry(f"❌ Falha ao processar {company} - {period}", "error")
+                    if success:
+                        success_count += 1
+                        self.add_log_entry(f"✅ {company} - {period} processado com sucesso", "success")
+                    else:
+                        self.add_log_entry(f"❌ Falha ao processar {company} - {period}", "error")
                     
-            except Exception as e:
-                logging.error(f"Erro crítico ao processar {company} - {period}: {traceback.format_exc()}")
-                self.add_log_entry(f"❌ Erro crítico em {company} - {period}: {str(e)}", "error")
+                except Exception as e:
+                    logging.error(f"Erro crítico ao processar {company} - {period}: {traceback.format_exc()}")
+                    self.add_log_entry(f"❌ Erro crítico em {company} - {period}: {str(e)}", "error")
             
-            # Pequeno delay para visualização da animação da barra de progresso
-            tm.sleep(0.05)
+                # Pequeno delay para visualização da animação da barra de progresso
+                tm.sleep(0.05)
             
-            # Atualiza progresso após cada período
-            self.update_progress(f"{company} - {period} [{report_type}]", i+1, total_periods)
-            self.root.update_idletasks()
+                # Atualiza progresso após cada período
+                self.update_progress(f"{company} - {period} [{report_type}]", i+1, total_periods)
+                self.root.update_idletasks()
         
         # Registrar tempo de processamento
         processing_time = tm.time() - start_time
@@ -3984,15 +5324,8 @@ class UnifiedProcessorGUI:
             selected_periods = [f"{m}_{y}" for y in selected_years for m in selected_months]
         
         # Verificar arquivos em uso
-        files_in_use = check_excel_files_in_use(self.output_base_dir)
-        if files_in_use:
-            result = messagebox.askyesno(
-                "Arquivos em Uso", 
-                f"Encontrados {len(files_in_use)} arquivo(s) Excel em uso.\n\n"
-                "Deseja continuar mesmo assim? (O script tentará criar arquivos com nomes alternativos)"
-            )
-            if not result:
-                return
+        if not self.confirm_files_in_use([("Ranking_Ouro_Mediano", None, selected_periods)]):
+            return
         
         try:
             # Atualizar progresso
@@ -4052,15 +5385,9 @@ class UnifiedProcessorGUI:
             selected_periods = [f"{m}_{y}" for y in selected_years for m in selected_months]
         
         # Verificar arquivos em uso
-        files_in_use = check_excel_files_in_use(self.output_base_dir)
-        if files_in_use:
-            result = messagebox.askyesno(
-                "Arquivos em Uso", 
-                f"Encontrados {len(files_in_use)} arquivo(s) Excel em uso.\n\n"
-                "Deseja continuar mesmo assim? (O script tentará criar arquivos com nomes alternativos)"
-            )
-            if not result:
-                return
+        if not self.confirm_files_in_use([("Ranking_Km_Proporcional", company, selected_periods or [])
+                                          for company in selected_companies]):
+            return
         
         try:
             # Atualizar progresso
@@ -4295,7 +5622,7 @@ class UnifiedProcessorGUI:
                     self.add_log_entry(f"📖 Lendo arquivo: {os.path.basename(arquivo_encontrado)}", "info")
                     logging.info(f"Lendo arquivo Excel: {arquivo_encontrado}")
                     
-                    df = pd.read_excel(arquivo_encontrado)
+                    df = read_excel_file(arquivo_encontrado)
                     
                     if df.empty:
                         self.add_log_entry(f"⚠️ Arquivo vazio para {empresa}: {os.path.basename(arquivo_encontrado)}", "warning")
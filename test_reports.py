@@ -22,6 +22,11 @@ from datetime import datetime
 from dataclasses import dataclass, field
 from typing import Dict, List, Optional, Tuple
 import traceback
+import io
+import pickle
+import shutil
+import subprocess
+import tempfile
 
 # Configurar logging para o teste
 logging.basicConfig(
@@ -470,6 +475,550 @@ class ReportTester:
         return "\n".join(summary)
 
 
+class CacheEquivalenceTester:
+    """
+    Confere que cada camada de cache do main.py devolve o mesmo que o caminho sem cache e que os
+    relatorios Ranking continuam iguais aos dos scripts originais. Usa dados sinteticos gerados em uma pasta temporaria (nao depende das pastas de producao).
+    """
+    
+    COMPANY = "Teste"
+    PERIOD = "Janeiro_2025"
+    SECOND_PERIOD = "Fevereiro_2025"
+    
+    def __init__(self, work_dir: str):
+        self.work_dir = work_dir
+        self.base_dir = os.path.join(work_dir, "Entrada")
+        self.output_dir = os.path.join(work_dir, "Saida")
+        self.results: List[TestResult] = []
+    
+    def build_inputs(self):
+        """
+        Abastecimento e Motorista sinteticos de dois periodos. Em PERIOD a matricula vazia deixa a coluna
+        float (123.0); SECOND_PERIOD tem matriculas inteiras e uma coluna a mais (layouts diferentes).
+        """
+        import numpy as np
+        import pandas as pd
+        
+        os.makedirs(os.path.join(self.base_dir, "Integração_Abast"), exist_ok=True)
+        os.makedirs(os.path.join(self.base_dir, "Integração_Mot"), exist_ok=True)
+        os.makedirs(self.output_dir, exist_ok=True)
+        
+        for period, month_number, matriculas, extra_column in [
+            (self.PERIOD, "01", [123, 456, np.nan, 789], False),
+            (self.SECOND_PERIOD, "02", [123, 456, 321, 789], True),
+        ]:
+            month, year = period.split("_")
+            dias = [f"01/{month_number}/{year}", f"02/{month_number}/{year}"]
+            pd.DataFrame({
+                "placa": ["1001", "1001", "1002"],
+                "dia": [dias[0], dias[1], dias[0]],
+                "km": [100.5, 200.25, 50.0],
+                "litros": [40.1, 70.3, 20.0],
+            }).to_excel(os.path.join(self.base_dir, "Integração_Abast", f"Abastecimento_{self.COMPANY}_{month}_{year}.xlsx"), index=False)
+            df_drivers = pd.DataFrame({
+                "Matricula": matriculas,
+                "Motorista": ["A", "B", "C", "D"],
+                "Placa": ["1001", "1001", "1002", "1001"],
+                "Dia": [dias[0], dias[0], dias[0], dias[1]],
+                "Pegada": ["06:00", "12:00", "07:00", "05:00"],
+                "Largada": ["11:00", "18:30", "09:00", "13:00"],
+            })
+            if extra_column:
+                df_drivers["Codigo"] = [1, 2, 3, 4]
+            df_drivers.to_excel(os.path.join(self.base_dir, "Integração_Mot", f"Motorista_{self.COMPANY}_{month}_{year}.xlsx"), index=False)
+    
+    def copy_inputs(self, name: str) -> str:
+        """Copia as entradas para uma pasta propria do check (que pode altera-las sem afetar os outros)"""
+        base_dir = os.path.join(self.work_dir, f"Entrada_{name}")
+        shutil.copytree(self.base_dir, base_dir)
+        return base_dir
+    
+    def input_file(self, base_dir: str, source: str, period: str) -> str:
+        """Abastecimento (source='Integração_Abast') ou Motorista (source='Integração_Mot') do periodo"""
+        prefix = "Abastecimento" if source == "Integração_Abast" else "Motorista"
+        return os.path.join(base_dir, source, f"{prefix}_{self.COMPANY}_{period}.xlsx")
+    
+    def rewrite_input(self, path: str, change):
+        """Regrava a planilha com change(df) aplicado e mtime garantidamente diferente do anterior"""
+        import pandas as pd
+        old_mtime_ns = os.stat(path).st_mtime_ns
+        change(pd.read_excel(path)).to_excel(path, index=False)
+        new_mtime_ns = max(os.stat(path).st_mtime_ns, old_mtime_ns + 1_000_000_000)
+        os.utime(path, ns=(new_mtime_ns, new_mtime_ns))
+    
+    def company_pair(self, processor, period: str) -> dict:
+        """Par de arquivos de entrada do periodo"""
+        return next(p for p in processor.get_company_files(self.COMPANY) if p['month_year'] == period)
+    
+    def clear_session_caches(self):
+        """Esvazia os caches de sessao, como em um processo novo"""
+        import main
+        main.INPUT_CACHE.clear()
+        main.PERIOD_ARTIFACTS.clear()
+    
+    def read_outputs(self, processor, periods: List[str]) -> dict:
+        """Detalhado (copia tipada, que guarda os dtypes) e consolidado de cada periodo, lidos sem cache"""
+        import pandas as pd
+        import main
+        outputs = {}
+        for period in periods:
+            detailed_file, consolidated_file, _ = processor.get_output_files(self.COMPANY, period)
+            outputs[f"Detalhado {period}"] = main.read_detalhado(detailed_file)
+            outputs[f"Consolidado {period}"] = pd.read_excel(consolidated_file)
+        return outputs
+    
+    def assert_outputs_equal(self, expected: dict, actual: dict):
+        import pandas as pd
+        for name, df in expected.items():
+            pd.testing.assert_frame_equal(df, actual[name], obj=name)
+    
+    def load_in_new_process(self, expression: str):
+        """Avalia expression (com o modulo main importado) em outro processo, sem nenhum cache de sessao"""
+        result_path = os.path.join(self.work_dir, "resultado_processo.pkl")
+        code = f"import pickle, main; pickle.dump({expression}, open({result_path!r}, 'wb'))"
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in sys.path if p))
+        subprocess.run([sys.executable, "-c", code], cwd=self.work_dir, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        with open(result_path, "rb") as f:
+            return pickle.load(f)
+    
+    def check(self, name: str, check_function):
+        """Executa um check (levanta AssertionError quando o caminho otimizado diverge do de referencia)"""
+        result = TestResult(report_type=name, company=self.COMPANY, period=self.PERIOD, success=False)
+        try:
+            check_function()
+            result.success = True
+            result.error_message = "Resultados iguais"
+        except AssertionError as e:
+            result.error_message = f"Divergencia: {str(e).splitlines()[0] if str(e) else 'valores diferentes'}"
+            result.suggested_solutions = [str(e)]
+        except Exception as e:
+            result.error_message = f"Erro durante validacao: {str(e)}"
+            result.suggested_solutions = [f"[!] Erro: {traceback.format_exc()}"]
+        self.results.append(result)
+        
+        status = "[OK]" if result.success else "[ERRO]"
+        logging.info(f"  {status} {result.report_type}: {result.error_message}")
+        if not result.success:
+            for solution in result.suggested_solutions:
+                logging.info(f"      {solution}")
+    
+    def check_session_cache(self):
+        """Abastecimento pelo cache de sessao (leitura e acertos) = lido direto do .xlsx, inclusive depois de alterado"""
+        import pandas as pd
+        import main
+        
+        supply_file = self.input_file(self.copy_inputs("sessao"), "Integração_Abast", self.PERIOD)
+        self.clear_session_caches()
+        expected = main.read_excel_file(supply_file)
+        pd.testing.assert_frame_equal(expected, main.read_supply_file(supply_file), obj="1a leitura")
+        cached = main.read_supply_file(supply_file)
+        pd.testing.assert_frame_equal(expected, cached, obj="2a leitura (cache)")
+        
+        # Quem altera o frame recebido nao altera o que o cache devolve depois
+        cached['km'] = 0
+        pd.testing.assert_frame_equal(expected, main.read_supply_file(supply_file), obj="leitura apos alterar a copia")
+        
+        # Arquivo alterado em disco nunca vem do cache
+        self.rewrite_input(supply_file, lambda df: df.assign(km=df['km'] * 2))
+        pd.testing.assert_frame_equal(main.read_excel_file(supply_file), main.read_supply_file(supply_file),
+                                      obj="leitura apos alterar o arquivo")
+    
+    def check_ingest_cache(self):
+        """Entradas pela copia em _cache/entradas (mesmo processo e processo novo) = lidas direto do .xlsx"""
+        import pandas as pd
+        import main
+        
+        base_dir = self.copy_inputs("disco")
+        output_dir = os.path.join(self.work_dir, "Saida_disco")
+        for source, kind in [("Integração_Abast", "supply"), ("Integração_Mot", "drivers")]:
+            path = self.input_file(base_dir, source, self.PERIOD)
+            expected = main.read_excel_file(path)
+            
+            self.clear_session_caches()
+            pd.testing.assert_frame_equal(expected, main.read_input_workbook(path, output_dir, kind=kind),
+                                          obj=f"{kind}: 1a leitura")
+            self.clear_session_caches()
+            pd.testing.assert_frame_equal(expected, main.read_input_workbook(path, output_dir, kind=kind),
+                                          obj=f"{kind}: copia em disco")
+            from_new_process = self.load_in_new_process(
+                f"main.read_input_workbook({path!r}, {output_dir!r}, kind={kind!r})")
+            pd.testing.assert_frame_equal(expected, from_new_process, obj=f"{kind}: copia em disco (processo novo)")
+            
+            # Mesmo conteudo com mtime novo (sha1 confere) e conteudo alterado (copia descartada)
+            os.utime(path, ns=(os.stat(path).st_mtime_ns + 1_000_000_000,) * 2)
+            self.clear_session_caches()
+            pd.testing.assert_frame_equal(expected, main.read_input_workbook(path, output_dir, kind=kind),
+                                          obj=f"{kind}: mtime novo, mesmo conteudo")
+            self.rewrite_input(path, lambda df: df.iloc[::-1])
+            self.clear_session_caches()
+            pd.testing.assert_frame_equal(main.read_excel_file(path), main.read_input_workbook(path, output_dir, kind=kind),
+                                          obj=f"{kind}: arquivo alterado")
+        assert os.path.exists(main.get_ingest_cache(output_dir).index_path), "Indice do cache de entradas nao foi gravado"
+    
+    def check_incremental_state(self):
+        """Reprocessamento com o estado .grupos.pkl (so os grupos alterados) = processamento completo"""
+        import main
+        
+        base_dir = self.copy_inputs("incremental")
+        outputs = {}
+        for mode, incremental in [("incremental", True), ("completo", False)]:
+            output_dir = os.path.join(self.work_dir, f"Saida_{mode}")
+            if incremental:
+                # 1a execucao grava o estado; a Largada alterada muda so o grupo (1001, dia 1)
+                processor = main.CompanyProcessor(base_dir, output_dir, incremental=True)
+                pair = self.company_pair(processor, self.PERIOD)
+                assert processor.process_company_files(pair['supply'], pair['drivers'], self.COMPANY, self.PERIOD), \
+                    "1a execucao falhou"
+                assert os.path.exists(processor.incremental_state_path(self.COMPANY, self.PERIOD)), \
+                    "Estado incremental nao foi gravado"
+                self.rewrite_input(self.input_file(base_dir, "Integração_Mot", self.PERIOD),
+                                   lambda df: df.assign(Largada=df['Largada'].where(df['Motorista'] != "A", "10:30")))
+            self.clear_session_caches()
+            processor = main.CompanyProcessor(base_dir, output_dir, incremental=incremental)
+            pair = self.company_pair(processor, self.PERIOD)
+            assert processor.process_company_files(pair['supply'], pair['drivers'], self.COMPANY, self.PERIOD), \
+                f"Processamento {mode} falhou"
+            outputs[mode] = self.read_outputs(processor, [self.PERIOD])
+        self.assert_outputs_equal(outputs["completo"], outputs["incremental"])
+    
+    def check_file_catalog(self):
+        """Catalogo em memoria e o relido de catalogo_arquivos.json = varredura nova, antes e depois de criar arquivos"""
+        import main
+        
+        base_dir = self.copy_inputs("catalogo")
+        output_dir = os.path.join(self.work_dir, "Saida_catalogo")
+        processor = main.CompanyProcessor(base_dir, output_dir)
+        
+        def compare_with_fresh_scan(step: str):
+            cached = {source: processor.catalog.records(source) for source in main.FileCatalog.SOURCES}
+            from_snapshot = main.FileCatalog(base_dir, output_dir)
+            from_snapshot = {source: from_snapshot.records(source) for source in main.FileCatalog.SOURCES}
+            os.remove(processor.catalog.snapshot_path)
+            fresh = main.FileCatalog(base_dir, output_dir)
+            fresh = {source: fresh.records(source) for source in main.FileCatalog.SOURCES}
+            for source, records in fresh.items():
+                assert cached[source] == records, f"{step} - {source} em memoria: {cached[source]} != {records}"
+                assert from_snapshot[source] == records, \
+                    f"{step} - {source} do catalogo gravado: {from_snapshot[source]} != {records}"
+        
+        for period in [self.PERIOD, self.SECOND_PERIOD]:
+            pair = self.company_pair(processor, period)
+            assert processor.process_company_files(pair['supply'], pair['drivers'], self.COMPANY, period), \
+                f"Processamento de {period} falhou"
+            compare_with_fresh_scan(f"apos {period}")
+        
+        shutil.copy2(self.input_file(base_dir, "Integração_Abast", self.PERIOD),
+                     os.path.join(base_dir, "Integração_Abast", f"Abastecimento_Outra_{self.PERIOD}.xlsx"))
+        os.remove(self.input_file(base_dir, "Integração_Mot", self.SECOND_PERIOD))
+        compare_with_fresh_scan("apos criar e remover entradas")
+    
+    def check_detalhado_sidecar(self):
+        """Ranking_Km_Proporcional lendo a copia tipada do Detalhado = lendo so o .xlsx"""
+        import pandas as pd
+        import main
+        
+        outputs = {}
+        for mode in ["com_copia", "sem_copia"]:
+            self.clear_session_caches()
+            output_dir = os.path.join(self.work_dir, f"Saida_{mode}")
+            processor = main.CompanyProcessor(self.base_dir, output_dir, incremental=False)
+            pair = self.company_pair(processor, self.PERIOD)
+            assert processor.process_company_files(pair['supply'], pair['drivers'], self.COMPANY, self.PERIOD), \
+                "Abst_Mot_Por_empresa nao foi gerado"
+            detailed_base = os.path.splitext(processor.get_output_files(self.COMPANY, self.PERIOD)[0])[0]
+            sidecars = [detailed_base + ext for ext in ('.parquet', '.pkl') if os.path.exists(detailed_base + ext)]
+            if mode == "com_copia":
+                assert sidecars, "Copia tipada do Detalhado nao foi gravada"
+            else:
+                for sidecar in sidecars:
+                    os.remove(sidecar)
+            
+            km_prop = main.RankingKmProporcionalProcessor(self.base_dir, output_dir)
+            assert km_prop.process_company_period(self.COMPANY, self.PERIOD), "Ranking_Km_Proporcional nao foi gerado"
+            outputs[mode] = {os.path.basename(path): pd.read_excel(path)
+                             for path in km_prop.get_output_files(self.COMPANY, self.PERIOD)}
+        self.assert_outputs_equal(outputs["sem_copia"], outputs["com_copia"])
+    
+    def check_combined_period_failure(self):
+        """Periodos combinados com um mes que falha (gravacao bloqueada ou arquivo ilegivel): os outros meses saem iguais"""
+        import main
+        
+        reference = main.CompanyProcessor(self.base_dir, os.path.join(self.work_dir, "Saida_falha_referencia"), incremental=False)
+        # Falha no primeiro mes da passada, para que os seguintes dependam do tratamento por mes
+        periods = [p['month_year'] for p in reference.get_company_files(self.COMPANY)
+                   if p['month_year'] in (self.PERIOD, self.SECOND_PERIOD)]
+        failing, other = periods
+        pair = self.company_pair(reference, other)
+        assert reference.process_company_files(pair['supply'], pair['drivers'], self.COMPANY, other), \
+            f"Processamento de {other} falhou"
+        expected = self.read_outputs(reference, [other])
+        
+        unreadable_dir = self.copy_inputs("ilegivel")
+        with open(self.input_file(unreadable_dir, "Integração_Mot", failing), "wb") as f:
+            f.write(b"nao e um xlsx")
+        
+        for scenario, base_dir in [("gravacao", self.base_dir), ("ilegivel", unreadable_dir)]:
+            self.clear_session_caches()
+            processor = main.CompanyProcessor(base_dir, os.path.join(self.work_dir, f"Saida_falha_{scenario}"), incremental=False)
+            if scenario == "gravacao":
+                # Como um Detalhado do mes aberto no Excel
+                write_company_outputs = processor.write_company_outputs
+                def locked_write(df_final, supply_file, company, month_year, *args):
+                    if month_year == failing:
+                        raise PermissionError(f"Arquivo de {month_year} aberto no Excel")
+                    return write_company_outputs(df_final, supply_file, company, month_year, *args)
+                processor.write_company_outputs = locked_write
+            
+            results = processor.process_company_all_periods(self.COMPANY, periods)
+            assert results == {failing: False, other: True}, f"{scenario}: resultados {results}"
+            self.assert_outputs_equal(expected, self.read_outputs(processor, [other]))
+    
+    def build_ranking_inputs(self, base_dir: str):
+        """Ranking e Turnos_128 sinteticos com numeros como celula numerica e como texto ' , ' das exportacoes"""
+        import pandas as pd
+        
+        month, year = self.PERIOD.split("_")
+        os.makedirs(os.path.join(base_dir, "Ranking"), exist_ok=True)
+        os.makedirs(os.path.join(base_dir, "Turnos_128"), exist_ok=True)
+        pd.DataFrame({
+            "matricula": ["123", "456", "789", "321", "654"],
+            "motorista": ["A", "B", "C", "D", "E"],
+            "km/l": ["2 , 85", 3.1, "10 , 2", 2.4, "3"],
+            "giro": [1, 0, 2, 1, 0],
+            "freio": [0, 1, 0, 3, 1],
+            "pedal": [2, 0, 1, 0, 0],
+            "fase": ["Ouro", "Prata", "Ouro", "Bronze", "Prata"],
+            "km": ["1500 , 5", 980, 2100, "1200", 1750.25],
+            "fechamento": ["x"] * 5,
+            "ponto acumulado": ["1 , 5", 4.2, "3", None, 2],
+            "status": ["Superior", "Mediano", "Superior", "Insuficiente", "Mediano"],
+            "dias": [20, 18, 22, 15, 21],
+        }).to_excel(os.path.join(base_dir, "Ranking", f"Ranking_{self.COMPANY}_{month}_{year}.xlsx"), index=False)
+        pd.DataFrame({
+            "matricula": ["123", "123", "123", "456", "456", "789", "789", "321", "654", "654"],
+            "turno": ["Manha", "Tarde", "Manha", "Tarde", "Tarde", "Manha", "Noite", "Manha", "Tarde", "Manha"],
+            "placa": ["1001", "1002", "1002", "1001", "1003", "1003", "1003", "1004", "1001", "1002"],
+            # Somados como texto, "9 , 5" e "60" dariam "9.560", que ganharia de 80 (Manha no lugar de Tarde)
+            "km": ["9 , 5", 80, "60", 120.25, "30 , 75", 200, 15, "77", "40", 55.5],
+            "linha": ["L1", "L2", "L2", "L1", "L3", "L3", "L1", "L2", "L1", "L2"],
+        }).to_excel(os.path.join(base_dir, "Turnos_128", f"Turnos_128_{self.COMPANY}_{month}_{year}.xlsx"), index=False)
+    
+    def pre_series_ranking(self, base_dir: str) -> "pd.DataFrame":
+        """Ranking com turno, linha e veiculo mais rodados calculado como nos scripts originais (referencia)"""
+        import pandas as pd
+        import main
+        
+        month, year = self.PERIOD.split("_")
+        df_ranking = pd.read_excel(os.path.join(base_dir, "Ranking", f"Ranking_{self.COMPANY}_{month}_{year}.xlsx"), dtype=str)
+        df_turnos = pd.read_excel(os.path.join(base_dir, "Turnos_128", f"Turnos_128_{self.COMPANY}_{month}_{year}.xlsx"), dtype=str)
+        for df, columns in [(df_turnos, ["km"]), (df_ranking, ["km/l", "ponto acumulado", "km"])]:
+            for col in columns:
+                df[col] = pd.to_numeric(df[col].astype(str).str.replace(" , ", "."), errors="coerce")
+        df_ranking["matricula"] = main.normalize_matricula(df_ranking["matricula"])
+        df_turnos["matricula"] = main.normalize_matricula(df_turnos["matricula"])
+        
+        df_final = df_ranking
+        for col, names in [("turno", ["Turno_Mais_Rodou"]), ("linha", ["Linha_Mais_Rodou", "KM_Linha"]),
+                           ("placa", ["Veiculo_Mais_Rodou", "KM_Veiculo"])]:
+            mais_rodou = df_turnos.groupby(["matricula", col])["km"].sum().reset_index()
+            mais_rodou = mais_rodou.loc[mais_rodou.groupby("matricula")["km"].idxmax()]
+            mais_rodou = mais_rodou[["matricula", col] + (["km"] if len(names) > 1 else [])]
+            mais_rodou.columns = ["matricula"] + names
+            df_final = df_final.merge(mais_rodou, on="matricula", how="left")
+        df_final["Litros"] = df_final["km"] / df_final["km/l"]
+        cols = list(df_final.columns)
+        cols.insert(cols.index("km/l") + 1, cols.pop(cols.index("Litros")))
+        return df_final[cols]
+    
+    def as_written(self, df) -> "pd.DataFrame":
+        """df como volta de uma aba .xlsx (para comparar com o que o relatorio gravou)"""
+        import pandas as pd
+        buffer = io.BytesIO()
+        df.to_excel(buffer, index=False)
+        buffer.seek(0)
+        return pd.read_excel(buffer)
+    
+    def check_ranking_reports(self):
+        """Ranking_Por_Empresa e Ranking_Integracao = resultado dos scripts originais (numeros, ordem e abas)"""
+        import pandas as pd
+        import main
+        
+        base_dir = os.path.join(self.work_dir, "Entrada_ranking")
+        output_dir = os.path.join(self.work_dir, "Saida_ranking")
+        self.build_ranking_inputs(base_dir)
+        expected = self.pre_series_ranking(base_dir)
+        expected_sorted = expected.sort_values(by=['Linha_Mais_Rodou', 'Turno_Mais_Rodou', 'km/l', 'motorista'],
+                                               ascending=[True, True, False, True])
+        
+        self.clear_session_caches()
+        for processor_class, sheets in [
+            (main.RankingProcessor, {"Todos": expected_sorted,
+                                     "Pontuacao_Baixa": expected_sorted[expected_sorted['ponto acumulado'] <= 2]}),
+            (main.RankingIntegracaoProcessor, {"Todos": expected_sorted}),
+        ]:
+            name = processor_class.__name__
+            processor = processor_class(base_dir, output_dir)
+            df_final = processor.process_company_period(self.COMPANY, self.PERIOD)
+            assert df_final is not None, f"{name}: processamento falhou"
+            pd.testing.assert_frame_equal(expected, df_final[expected.columns], obj=name)
+            output_file = processor.create_report(df_final, self.COMPANY, self.PERIOD)
+            assert output_file and os.path.exists(output_file), f"{name}: relatorio nao foi gravado"
+            written = pd.read_excel(output_file, sheet_name=None)
+            for sheet, df_expected in sheets.items():
+                pd.testing.assert_frame_equal(self.as_written(df_expected), written[sheet][expected.columns],
+                                              obj=f"{name} aba {sheet}")
+    
+    def check_most_driven_summary(self):
+        """Resumo "mais rodou" com as somas numericas esperadas; so o resumo fica no cache de sessao"""
+        import pandas as pd
+        import main
+        
+        base_dir = os.path.join(self.work_dir, "Entrada_mais_rodou")
+        self.build_ranking_inputs(base_dir)
+        month, year = self.PERIOD.split("_")
+        turnos_file = os.path.join(base_dir, "Turnos_128", f"Turnos_128_{self.COMPANY}_{month}_{year}.xlsx")
+        # matricula: (turno, linha, km da linha, veiculo, km do veiculo), somados a mao a partir de build_ranking_inputs
+        expected = {
+            "123": ("Tarde", "L2", 140.0, "1002", 140.0),
+            "321": ("Manha", "L2", 77.0, "1004", 77.0),
+            "456": ("Tarde", "L1", 120.25, "1001", 120.25),
+            "654": ("Manha", "L2", 55.5, "1002", 55.5),
+            "789": ("Manha", "L3", 200.0, "1003", 215.0),
+        }
+        
+        def summary_values(summary):
+            columns = [main.select_most_driven(summary, 'turno', 'turno'),
+                       main.select_most_driven(summary, 'linha', 'linha', 'km_linha'),
+                       main.select_most_driven(summary, 'placa', 'placa', 'km_placa')]
+            merged = columns[0].merge(columns[1], on='matricula').merge(columns[2], on='matricula')
+            return {row[0].lstrip("0"): tuple(row[1:]) for row in merged.itertuples(index=False)}
+        
+        self.clear_session_caches()
+        actual = summary_values(main.get_most_driven(turnos_file, os.path.join(self.work_dir, "Saida_mais_rodou")))
+        assert actual == expected, f"get_most_driven: {actual} != {expected}"
+        # Turnos lidos como texto (dtype=str): most_driven_by soma os numeros, nao concatena o texto
+        raw = pd.read_excel(turnos_file, dtype=str)
+        actual = summary_values(main.most_driven_by(raw, main.MOST_DRIVEN_DIMENSIONS))
+        assert actual == expected, f"most_driven_by com km em texto: {actual} != {expected}"
+        
+        cached_kinds = [key[1] for key in main.INPUT_CACHE.entries if key[0] == os.path.abspath(turnos_file)]
+        assert all(kind.startswith(main.MOST_DRIVEN_KIND) for kind in cached_kinds), \
+            f"Turnos completo no cache de sessao junto do resumo: {cached_kinds}"
+    
+    def check_block_reads(self):
+        """Turnos_128 lido em blocos (somas por bloco) = lido inteiro e somado; a leitura inteira nunca recebe o reduzido"""
+        import pandas as pd
+        import main
+        
+        base_dir = os.path.join(self.work_dir, "Entrada_blocos")
+        output_dir = os.path.join(self.work_dir, "Saida_blocos")
+        self.build_ranking_inputs(base_dir)
+        month, year = self.PERIOD.split("_")
+        turnos_file = os.path.join(base_dir, "Turnos_128", f"Turnos_128_{self.COMPANY}_{month}_{year}.xlsx")
+        
+        self.clear_session_caches()
+        full = main.read_input_with_schema(turnos_file, output_dir, 'turnos')
+        summary = main.get_most_driven(turnos_file, output_dir)
+        keys = [col for col in full.columns if col != 'km']
+        expected = full.groupby(keys, dropna=False, sort=False)['km'].sum().reset_index()
+        
+        saved = (main.BLOCK_READ_MIN_ROWS, main.BLOCK_READ_ROWS)
+        try:
+            # Todo arquivo lido em blocos de 3 linhas
+            main.set_block_read_thresholds(min_rows=1)
+            main.BLOCK_READ_ROWS = 3
+            self.clear_session_caches()
+            pd.testing.assert_frame_equal(expected, main.read_input_with_schema(turnos_file, output_dir, 'turnos'),
+                                          obj="leitura em blocos")
+            self.clear_session_caches()
+            pd.testing.assert_frame_equal(summary, main.get_most_driven(turnos_file, output_dir), obj="resumo em blocos")
+        finally:
+            main.set_block_read_thresholds(min_rows=saved[0])
+            main.BLOCK_READ_ROWS = saved[1]
+        
+        # Com as copias reduzidas em memoria e em disco, a leitura inteira continua devolvendo todas as linhas
+        pd.testing.assert_frame_equal(full, main.read_input_with_schema(turnos_file, output_dir, 'turnos'),
+                                      obj="leitura inteira (cache de sessao)")
+        self.clear_session_caches()
+        pd.testing.assert_frame_equal(full, main.read_input_with_schema(turnos_file, output_dir, 'turnos'),
+                                      obj="leitura inteira (cache em disco)")
+    
+    def check_period_artifacts(self):
+        """Consolidados guardados ao gravar (mesmo processo) = consolidados relidos do .xlsx (outro processo)"""
+        import pandas as pd
+        import main
+        
+        processor = main.CompanyProcessor(self.base_dir, self.output_dir)
+        pair = self.company_pair(processor, self.PERIOD)
+        assert processor.process_company_files(pair['supply'], pair['drivers'], self.COMPANY, self.PERIOD), \
+            "Abst_Mot_Por_empresa nao foi gerado"
+        km_prop = main.RankingKmProporcionalProcessor(self.base_dir, self.output_dir)
+        assert km_prop.process_company_period(self.COMPANY, self.PERIOD), "Ranking_Km_Proporcional nao foi gerado"
+        
+        month, year = self.PERIOD.split("_")
+        artifacts = [
+            processor.get_output_files(self.COMPANY, self.PERIOD)[1],
+            os.path.join(self.output_dir, "Rankig_Km_Proporcional", self.COMPANY, year, month.zfill(2),
+                         f"Consolidado_{self.COMPANY}_{self.PERIOD}.xlsx"),
+        ]
+        for path in artifacts:
+            same_process = main.load_period_artifact(path)
+            new_process = self.load_in_new_process(f"main.load_period_artifact({path!r})")
+            pd.testing.assert_frame_equal(same_process, new_process, obj=os.path.basename(path))
+    
+    def check_combined_periods(self):
+        """Todos os periodos em uma passada (layouts diferentes) = um par de arquivos por vez"""
+        import main
+        
+        periods = [self.PERIOD, self.SECOND_PERIOD]
+        outputs = {}
+        for mode in ["por_par", "combinado"]:
+            self.clear_session_caches()
+            processor = main.CompanyProcessor(self.base_dir, os.path.join(self.work_dir, f"Saida_{mode}"), incremental=False)
+            if mode == "combinado":
+                results = processor.process_company_all_periods(self.COMPANY, periods)
+                assert all(results.values()), f"Processamento combinado falhou: {results}"
+            else:
+                for period in periods:
+                    pair = self.company_pair(processor, period)
+                    assert processor.process_company_files(pair['supply'], pair['drivers'], self.COMPANY, period), \
+                        f"Processamento de {period} falhou"
+            outputs[mode] = self.read_outputs(processor, periods)
+        self.assert_outputs_equal(outputs["por_par"], outputs["combinado"])
+    
+    def run_all_checks(self):
+        """Gera as entradas sinteticas e executa os checks de cada camada de cache"""
+        logging.info("=" * 80)
+        logging.info("VALIDACAO DOS CACHES (com cache x sem cache)")
+        logging.info("=" * 80)
+        self.build_inputs()
+        self.check("Cache de sessao (INPUT_CACHE)", self.check_session_cache)
+        self.check("Cache de entradas em disco", self.check_ingest_cache)
+        self.check("Estado incremental (.grupos.pkl)", self.check_incremental_state)
+        self.check("Catalogo de arquivos", self.check_file_catalog)
+        self.check("Copia tipada do Detalhado", self.check_detalhado_sidecar)
+        self.check("Cache Consolidados por periodo", self.check_period_artifacts)
+        self.check("Periodos combinados", self.check_combined_periods)
+        self.check("Periodos combinados com falha em um mes", self.check_combined_period_failure)
+        self.check("Ranking x scripts originais", self.check_ranking_reports)
+        self.check("Resumo mais rodou", self.check_most_driven_summary)
+        self.check("Leitura em blocos", self.check_block_reads)
+    
+    def generate_summary(self) -> str:
+        """Gera um resumo dos checks de cache"""
+        total = len(self.results)
+        success = len([r for r in self.results if r.success])
+        summary = ["", "=" * 80, "RESUMO DOS CHECKS DE CACHE", "=" * 80]
+        summary.append(f"\nTotal de checks: {total}")
+        summary.append(f"[OK] Sucesso: {success}")
+        summary.append(f"[ERRO] Falha: {total - success}")
+        for r in self.results:
+            if not r.success:
+                summary.append(f"  [X] {r.report_type}: {r.error_message}")
+        return "\n".join(summary)
+
+
 def main():
     """Funcao principal"""
     import argparse
@@ -480,9 +1029,20 @@ def main():
     parser.add_argument('--empresa', '-c', type=str, help='Empresas (separadas por virgula)')
     parser.add_argument('--periodo', '-p', type=str, help='Periodos (separados por virgula)')
     parser.add_argument('--auto', '-a', action='store_true', help='Executar automaticamente sem interacao')
+    parser.add_argument('--caches', action='store_true',
+                        help='Confere se os caches devolvem o mesmo que o processamento sem cache (dados sinteticos)')
     
     args = parser.parse_args()
     
+    if args.caches:
+        with tempfile.TemporaryDirectory(prefix="teste_caches_") as work_dir:
+            cache_tester = CacheEquivalenceTester(work_dir)
+            cache_tester.run_all_checks()
+            summary = cache_tester.generate_summary()
+        print(summary)
+        logging.info(summary)
+        sys.exit(0 if all(r.success for r in cache_tester.results) else 1)
+    
     print("=" * 80)
     print("SCRIPT DE VALIDACAO DE RELATORIOS")
     print("=" * 80)